@@ -17,27 +17,55 @@
 # main.py
 import os
 import sys
-import tkinter as tk
-import traceback
+
+def _show_splash(tk):
+    try:
+        splash = tk.Tk()
+        splash.overrideredirect(True)
+        label = tk.Label(splash, text="RJ Auto Metadata\nLoading...", padx=40, pady=25, font=("Arial", 13))
+        label.pack()
+        splash.update_idletasks()
+        x = (splash.winfo_screenwidth() - splash.winfo_reqwidth()) // 2
+        y = (splash.winfo_screenheight() - splash.winfo_reqheight()) // 2
+        splash.geometry(f"+{x}+{y}")
+        splash.update()
+        return splash
+    except Exception:
+        return None
 
 def main():
+    splash = None
     try:
         sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-        from src.utils.file_utils import IS_NUITKA_EXECUTABLE 
-        if getattr(sys, 'frozen', False):
-            print("Detected running as executable.")
-            IS_NUITKA_EXECUTABLE = True
+        import tkinter as tk
+        splash = _show_splash(tk)
         from src.ui.app import MetadataApp
+        # The splash is its own Tk root; it must be gone before the app is
+        # built so the app's variables bind to the app's interpreter.
+        if splash is not None:
+            splash.destroy()
+            splash = None
         app = MetadataApp()
         app.mainloop()
     except Exception as e:
-        print(f"FATAL ERROR: {e}")
-        traceback.print_exc()
-        try:
-            tk.messagebox.showerror("Fatal Error", 
-                f"Fatal error occurred:\n{e}\nApplication will close.")
-        except:
-            pass
+        import traceback
+        if sys.stderr is not None:
+            sys.stderr.write(f"FATAL ERROR: {e}\n")
+            traceback.print_exc(file=sys.stderr)
+        tk_module = sys.modules.get("tkinter")
+        parent = splash if splash is not None else getattr(tk_module, "_default_root", None)
+        if parent is not None:
+            try:
+                import tkinter.messagebox
+                tkinter.messagebox.showerror("Fatal Error",
+                    f"Fatal error occurred:\n{e}\nApplication will close.", parent=parent)
+            except Exception:
+                pass
+        if splash is not None:
+            try:
+                splash.destroy()
+            except Exception:
+                pass
         sys.exit(1)
 if __name__ == "__main__":
     main()
@@ -21,23 +21,23 @@ import sys
 import random
 import requests
 import base64
+import mmap
 import json
 import time
-import re
 import threading
+import atexit
 from collections import defaultdict
 from src.utils.logging import log_message
+from src.utils.rate_limiter import wait_interruptible, parse_retry_after, note_retry_after
+from src.api import response_cache
+from src.api.gemini_parser import parse_legacy_text, split_keywords
 try:
     from google import genai
     from google.genai import types
     GENAI_SDK_AVAILABLE = True
 except ImportError:
     GENAI_SDK_AVAILABLE = False
-from src.api.prompts import (
-    PROMPT_TEXT, PROMPT_TEXT_PNG, PROMPT_TEXT_VIDEO,
-    PROMPT_TEXT_BALANCED, PROMPT_TEXT_PNG_BALANCED, PROMPT_TEXT_VIDEO_BALANCED,
-    PROMPT_TEXT_FAST, PROMPT_TEXT_PNG_FAST, PROMPT_TEXT_VIDEO_FAST
-)
+from src.api.prompts import select_prompt, parse_prompt_skeleton
 GEMINI_MODELS = [
     "gemini-2.0-flash",
     "gemini-2.0-flash-lite",  
@@ -97,6 +97,45 @@ def get_sdk_client(api_key: str):
         log_message(f"Failed to create SDK client: {e}", "error")
         return None
     
+# One pooled HTTP session for all REST calls so keep-alive connections (and
+# their TLS handshakes) are reused across files and worker threads.
+HTTP_POOL_SIZE = 32
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+def get_http_session():
+    global _HTTP_SESSION
+    if _HTTP_SESSION is not None:
+        return _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            session = requests.Session()
+            session.mount('https://', requests.adapters.HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=requests.adapters.Retry(total=1, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504], allowed_methods=["POST"], respect_retry_after_header=True)
+            ))
+            _HTTP_SESSION = session
+            atexit.register(session.close)
+    return _HTTP_SESSION
+
+# Built once; every request (SDK and REST) shares the same schema object.
+_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "maxLength": 180},
+        "description": {"type": "string", "maxLength": 500},
+        "keywords": {
+            "type": "array",
+            "items": {"type": "string"},
+            "maxItems": 60
+        },
+        "adobe_stock_category": {"type": "string"},
+        "shutterstock_category": {"type": "string"}
+    },
+    "required": ["title", "description", "keywords", "adobe_stock_category", "shutterstock_category"]
+}
+
 DEBUG_FORCE_FAILURE = False 
 DEBUG_FAILURE_RATE = 0.3  
 API_TIMEOUT = 60
@@ -104,6 +143,23 @@ API_MAX_RETRIES = 1
 API_RETRY_DELAY = 5  # Reduced from 10s — with sliding window, other workers continue while this one waits
 FORCE_STOP_FLAG = False
 
+_RANDOM_LOCAL = threading.local()
+
+def _thread_random() -> random.Random:
+    """Per-thread generator for retry jitter, so workers do not share one state."""
+    rng = getattr(_RANDOM_LOCAL, "rng", None)
+    if rng is None:
+        rng = _RANDOM_LOCAL.rng = random.Random()
+    return rng
+
+def _retry_delay_hint(response_data):
+    """Seconds from the google.rpc.RetryInfo detail of a 429 error body, if any."""
+    error = (response_data or {}).get("error") if isinstance(response_data, dict) else None
+    for detail in (error or {}).get("details") or []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            return parse_retry_after(detail["retryDelay"])
+    return None
+
 def calculate_smart_delay(api_keys_list: list, user_delay: float) -> tuple[float, str]:
     if not api_keys_list:
         return user_delay, "No API keys available"
@@ -113,7 +169,7 @@ def select_smart_api_key(api_keys_list: list):
     if not api_keys_list:
         return None
     with API_KEY_LOCK:
-        now = time.time()
+        now = time.monotonic()
         key_statuses = []
         for key in api_keys_list:
             last_used_time = API_KEY_LAST_USED.get(key, 0)
@@ -175,39 +231,106 @@ def select_next_model():
     with MODEL_LOCK:
         sorted_models = sorted(GEMINI_MODELS, key=lambda m: MODEL_LAST_USED.get(m, 0))
         selected_model = sorted_models[0]
-        MODEL_LAST_USED[selected_model] = time.time()
+        MODEL_LAST_USED[selected_model] = time.monotonic()
         return selected_model
 
 def wait_for_model_cooldown(model_name, stop_event=None):
     try:
         min_interval = 0.75
         last_used = MODEL_LAST_USED.get(model_name, 0)
-        now = time.time()
+        now = time.monotonic()
         remaining = last_used + min_interval - now
-        while remaining > 0:
-            if check_stop_event(stop_event):
-                return
-            time.sleep(min(remaining, 0.05))
-            now = time.time()
-            remaining = last_used + min_interval - now
+        if remaining > 0:
+            wait_interruptible(remaining, stop_event, lambda: check_stop_event(stop_event))
     except Exception:
         return
 
 def wait_for_api_key_cooldown(api_key, stop_event=None):
     try:
         last_used = API_KEY_LAST_USED.get(api_key, 0)
-        now = time.time()
+        now = time.monotonic()
         remaining = last_used + API_KEY_MIN_INTERVAL - now
-        while remaining > 0:
-            if check_stop_event(stop_event):
-                return
-            time.sleep(min(remaining, 0.05))
-            now = time.time()
-            remaining = last_used + API_KEY_MIN_INTERVAL - now
-        API_KEY_LAST_USED[api_key] = time.time()
+        if remaining > 0 and wait_interruptible(remaining, stop_event, lambda: check_stop_event(stop_event)):
+            return
+        API_KEY_LAST_USED[api_key] = time.monotonic()
     except Exception:
         return
 
+def encode_image_base64(image_path: str) -> str:
+    """Base64-encode a file straight from a read-only mmap, without an extra bytes copy."""
+    with open(image_path, "rb") as image_file:
+        try:
+            with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return base64.b64encode(mapped).decode("ascii")
+        except ValueError:
+            # Empty files cannot be mapped
+            return base64.b64encode(image_file.read()).decode("ascii")
+
+PROMPT_CACHE_TTL_SECONDS = 3600
+PROMPT_CACHE_REFRESH_MARGIN = 300
+CACHED_PROMPT_SUFFIX = "Generate the JSON metadata for the image(s) above."
+_PROMPT_CACHE_NAMES = {}
+_PROMPT_CACHE_UNSUPPORTED = set()
+_PROMPT_CACHE_CREATING = set()
+_PROMPT_CACHE_LOCK = threading.Lock()
+_PROMPT_CACHE_UNSUPPORTED_MARKERS = ("too small", "min_total_token_count", "minimum", "not supported", "does not support")
+
+def _is_prompt_cache_unsupported(error) -> bool:
+    """True for caches.create errors that will repeat for this key/model (prompt below the
+    model's minimum size, or a model without context caching); False for 429, 5xx and network errors."""
+    if getattr(error, "code", None) not in (400, 404):
+        return False
+    text = str(error).lower()
+    return any(marker in text for marker in _PROMPT_CACHE_UNSUPPORTED_MARKERS)
+
+def get_cached_prompt_name(client, api_key: str, model_name: str, prompt_text: str):
+    """Return a server-side cached-content name holding prompt_text, creating or refreshing it as needed.
+
+    Returns None when context caching is unavailable for this key/model (e.g. the
+    prompt is below the model's minimum cacheable size), when creating the cache
+    failed transiently, or while another thread is creating it; the caller then
+    sends the prompt inline.
+    """
+    if client is None or (api_key, model_name) in _PROMPT_CACHE_UNSUPPORTED:
+        return None
+    cache_key = (api_key, model_name, hash(prompt_text))
+    now = time.monotonic()
+    entry = _PROMPT_CACHE_NAMES.get(cache_key)
+    if entry and entry[1] - now > PROMPT_CACHE_REFRESH_MARGIN:
+        return entry[0]
+    with _PROMPT_CACHE_LOCK:
+        entry = _PROMPT_CACHE_NAMES.get(cache_key)
+        if entry and entry[1] - now > PROMPT_CACHE_REFRESH_MARGIN:
+            return entry[0]
+        if (api_key, model_name) in _PROMPT_CACHE_UNSUPPORTED or cache_key in _PROMPT_CACHE_CREATING:
+            return None
+        _PROMPT_CACHE_CREATING.add(cache_key)
+    try:
+        cached = client.caches.create(
+            model=model_name,
+            config=types.CreateCachedContentConfig(
+                contents=[types.Content(role="user", parts=[types.Part.from_text(text=prompt_text)])],
+                ttl=f"{PROMPT_CACHE_TTL_SECONDS}s",
+                display_name="rj-auto-metadata-prompt",
+            ),
+        )
+    except Exception as e:
+        unsupported = _is_prompt_cache_unsupported(e)
+        with _PROMPT_CACHE_LOCK:
+            _PROMPT_CACHE_CREATING.discard(cache_key)
+            if unsupported:
+                _PROMPT_CACHE_UNSUPPORTED.add((api_key, model_name))
+        if unsupported:
+            log_message(f"Context caching not available for {model_name}, sending prompt inline: {e}", "info")
+        else:
+            log_message(f"Could not cache prompt for {model_name}, sending it inline this time: {e}", "warning")
+        return None
+    with _PROMPT_CACHE_LOCK:
+        _PROMPT_CACHE_NAMES[cache_key] = (cached.name, now + PROMPT_CACHE_TTL_SECONDS)
+        _PROMPT_CACHE_CREATING.discard(cache_key)
+    log_message(f"Prompt cached on server for {model_name} ({cached.name})", "info")
+    return cached.name
+
 def _attempt_gemini_sdk_request(
     image_paths,
     current_api_key: str,
@@ -244,20 +367,12 @@ def _attempt_gemini_sdk_request(
         log_message(f"Sending {len(image_paths)} frame(s) from {image_basename} to model {model_to_use} via SDK (API Key: ...{current_api_key[-5:]})", "info")
     final_is_vector_conversion = is_vector_conversion or "converted" in image_basename.lower()
     is_video_processing = isinstance(image_paths, list) and len(image_paths) > 1
-    selected_prompt_text = PROMPT_TEXT
-    if priority == "Less":
-        if use_video_prompt: selected_prompt_text = PROMPT_TEXT_VIDEO_FAST
-        elif use_png_prompt: selected_prompt_text = PROMPT_TEXT_PNG_FAST
-        else: selected_prompt_text = PROMPT_TEXT_FAST
-    elif priority == "Balanced":
-        if use_video_prompt: selected_prompt_text = PROMPT_TEXT_VIDEO_BALANCED
-        elif use_png_prompt: selected_prompt_text = PROMPT_TEXT_PNG_BALANCED
-        else: selected_prompt_text = PROMPT_TEXT_BALANCED
-    else:
-        if use_video_prompt: selected_prompt_text = PROMPT_TEXT_VIDEO
-        elif use_png_prompt: selected_prompt_text = PROMPT_TEXT_PNG
-        else: selected_prompt_text = PROMPT_TEXT
+    selected_prompt_text = select_prompt(priority, use_png_prompt, use_video_prompt, provider="gemini")
+    cached_prompt_name = get_cached_prompt_name(client, current_api_key, model_to_use, selected_prompt_text)
     parts = []
+    if not cached_prompt_name:
+        # Static prompt first so the shared prefix can hit implicit caching
+        parts.append(types.Part.from_text(text=selected_prompt_text))
     for img_path in image_paths:
         try:
             with open(img_path, "rb") as image_file:
@@ -272,7 +387,8 @@ def _attempt_gemini_sdk_request(
                 image_paths, current_api_key, model_to_use, stop_event,
                 use_png_prompt, use_video_prompt, priority, image_basename, is_vector_conversion
             )
-    parts.append(types.Part.from_text(text=selected_prompt_text))
+    if cached_prompt_name:
+        parts.append(types.Part.from_text(text=CACHED_PROMPT_SUFFIX))
     max_output_tokens = 15000 if "2.5" in model_to_use else 800
     generation_config = types.GenerateContentConfig(
         temperature=0.2,
@@ -280,21 +396,7 @@ def _attempt_gemini_sdk_request(
         top_p=0.8,
         top_k=40,
         response_mime_type="application/json",
-        response_schema={
-            "type": "object",
-            "properties": {
-                "title": {"type": "string", "maxLength": 180},
-                "description": {"type": "string", "maxLength": 500},
-                "keywords": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "maxItems": 60
-                },
-                "adobe_stock_category": {"type": "string"},
-                "shutterstock_category": {"type": "string"}
-            },
-            "required": ["title", "description", "keywords", "adobe_stock_category", "shutterstock_category"]
-        }
+        response_schema=_RESPONSE_SCHEMA
     )
     thinking_config = get_thinking_config_for_model(model_to_use)
     if thinking_config:
@@ -302,6 +404,8 @@ def _attempt_gemini_sdk_request(
             thinking_budget=thinking_config["thinking_budget"]
         )
         generation_config.thinking_config = thinking_config_obj
+    if cached_prompt_name:
+        generation_config.cached_content = cached_prompt_name
     if check_stop_event(stop_event, f"SDK request cancelled before generate: {image_basename}"):
         return -2, None, "stopped", "Process stopped before SDK generate"
     try:
@@ -404,41 +508,17 @@ def _attempt_gemini_rest_request(
         log_message(f"Sending {len(image_paths)} frame(s) from {image_basename} to model {model_to_use} via REST API (API Key: ...{current_api_key[-5:]})", "info")
     final_is_vector_conversion = is_vector_conversion or "converted" in image_basename.lower()
     is_video_processing = isinstance(image_paths, list) and len(image_paths) > 1
-    selected_prompt_text = PROMPT_TEXT
-    if priority == "Less":
-        if use_video_prompt: selected_prompt_text = PROMPT_TEXT_VIDEO_FAST
-        elif use_png_prompt: selected_prompt_text = PROMPT_TEXT_PNG_FAST
-        else: selected_prompt_text = PROMPT_TEXT_FAST
-    elif priority == "Balanced":
-        if use_video_prompt: selected_prompt_text = PROMPT_TEXT_VIDEO_BALANCED
-        elif use_png_prompt: selected_prompt_text = PROMPT_TEXT_PNG_BALANCED
-        else: selected_prompt_text = PROMPT_TEXT_BALANCED
-    else:
-        if use_video_prompt: selected_prompt_text = PROMPT_TEXT_VIDEO
-        elif use_png_prompt: selected_prompt_text = PROMPT_TEXT_PNG
-        else: selected_prompt_text = PROMPT_TEXT
-    prompt_name = "UNKNOWN"
-    if selected_prompt_text == PROMPT_TEXT: prompt_name = "PROMPT_TEXT (Detailed)"
-    elif selected_prompt_text == PROMPT_TEXT_PNG: prompt_name = "PROMPT_TEXT_PNG (Detailed)"
-    elif selected_prompt_text == PROMPT_TEXT_VIDEO: prompt_name = "PROMPT_TEXT_VIDEO (Detailed)"
-    elif selected_prompt_text == PROMPT_TEXT_BALANCED: prompt_name = "PROMPT_TEXT_BALANCED (Balanced)"
-    elif selected_prompt_text == PROMPT_TEXT_PNG_BALANCED: prompt_name = "PROMPT_TEXT_PNG_BALANCED (Balanced)"
-    elif selected_prompt_text == PROMPT_TEXT_VIDEO_BALANCED: prompt_name = "PROMPT_TEXT_VIDEO_BALANCED (Balanced)"
-    elif selected_prompt_text == PROMPT_TEXT_FAST: prompt_name = "PROMPT_TEXT_FAST (Less)"
-    elif selected_prompt_text == PROMPT_TEXT_PNG_FAST: prompt_name = "PROMPT_TEXT_PNG_FAST (Less)"
-    elif selected_prompt_text == PROMPT_TEXT_VIDEO_FAST: prompt_name = "PROMPT_TEXT_VIDEO_FAST (Less)"
-    parts = [] 
+    selected_prompt_text = select_prompt(priority, use_png_prompt, use_video_prompt, provider="gemini")
+    # Static prompt first so the shared prefix can hit implicit caching
+    parts = [{"text": selected_prompt_text}]
     for img_path in image_paths:
         try:
-            file_size = os.path.getsize(img_path)
-            with open(img_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode("utf-8")
+            image_data = encode_image_base64(img_path)
             mime_type = "image/jpeg" 
             parts.append({"inline_data": {"mime_type": mime_type, "data": image_data}})
         except Exception as e:
             log_message(f"Error reading image file ({os.path.basename(img_path)}): {e}", "error")
             return -3, None, "file_read", str(e)
-    parts.append({"text": selected_prompt_text})
     max_output_tokens = 800
     if "gemini-2.5-pro" in model_to_use:
         max_output_tokens = 15000  
@@ -454,21 +534,7 @@ def _attempt_gemini_rest_request(
             "topP": 0.8, 
             "topK": 40,
             "response_mime_type": "application/json",
-            "response_schema": {
-                "type": "object",
-                "properties": {
-                    "title": {"type": "string", "maxLength": 180},
-                    "description": {"type": "string", "maxLength": 500},
-                    "keywords": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "maxItems": 60
-                    },
-                    "adobe_stock_category": {"type": "string"},
-                    "shutterstock_category": {"type": "string"}
-                },
-                "required": ["title", "description", "keywords", "adobe_stock_category", "shutterstock_category"]
-            }
+            "response_schema": _RESPONSE_SCHEMA
         }
     }
     headers = {"Content-Type": "application/json"}
@@ -476,10 +542,7 @@ def _attempt_gemini_rest_request(
 
     if check_stop_event(stop_event, f"API request dibatalkan sebelum POST: {image_basename}"):
         return -2, None, "stopped", "Process stopped before API POST"
-    session = requests.Session()
-    session.mount('https://', requests.adapters.HTTPAdapter(
-        max_retries=requests.adapters.Retry(total=1, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504], allowed_methods=["POST"], respect_retry_after_header=True)
-    ))
+    session = get_http_session()
     response_event = threading.Event()
     response_container = {'response': None, 'error': None}
     def perform_api_request_in_thread():
@@ -522,11 +585,12 @@ def _attempt_gemini_rest_request(
                 usage_metadata = response_data.get("usageMetadata", {})
                 thoughts_token_count = usage_metadata.get("thoughtsTokenCount", 0)
                 api_method = "SDK" if should_use_sdk(model_to_use) else "REST"
-                log_message(f"Thinking model {model_to_use} ({api_method}) - parts count: {len(parts)}, thoughtsTokenCount: {thoughts_token_count}, candidate keys: {list(candidate.keys())}", "debug")
+                log_message("Thinking model %s (%s) - parts count: %d, thoughtsTokenCount: %s, candidate keys: %s", "debug",
+                            model_to_use, api_method, len(parts), thoughts_token_count, list(candidate))
                 if not parts and thoughts_token_count > 0:
-                    log_message(f"Thinking model has thoughts but no parts - content structure: {candidate.get('content', {})}", "debug")
+                    log_message("Thinking model has thoughts but no parts - content structure: %s", "debug", candidate.get("content", {}))
                 elif not parts:
-                    log_message(f"Full response structure for debugging: {response_data}", "debug")
+                    log_message("Full response structure for debugging: %s", "debug", response_data)
             return 200, response_data, None, None 
         elif "promptFeedback" in response_data and response_data.get("promptFeedback", {}).get("blockReason"):
             feedback = response_data["promptFeedback"]
@@ -562,8 +626,7 @@ def _extract_metadata_from_text(generated_text: str, keyword_count: str):
                     raw_keywords = [str(kw).strip() for kw in keywords if str(kw).strip()]
                     tags = list(raw_keywords)
                 elif isinstance(keywords, str):
-                    raw_keywords = [kw.strip() for kw in keywords.split(",") if kw.strip()]
-                    tags = list(raw_keywords)
+                    tags = split_keywords(keywords)
                 else:
                     tags = []
                 tags = list(dict.fromkeys(tags))[:60]
@@ -582,33 +645,10 @@ def _extract_metadata_from_text(generated_text: str, keyword_count: str):
                 }
         except (json.JSONDecodeError, TypeError) as json_error:
             pass
-        title_match = re.search(r"^Title:\s*(.*)", generated_text, re.MULTILINE | re.IGNORECASE)
-        if title_match: title = title_match.group(1).strip()
-        desc_match = re.search(r"^Description:\s*(.*)", generated_text, re.MULTILINE | re.IGNORECASE)
-        if desc_match: description = desc_match.group(1).strip()
-        keywords_match = re.search(r"^Keywords:\s*(.*)", generated_text, re.MULTILINE | re.IGNORECASE)
-        if keywords_match:
-            keywords_line = keywords_match.group(1).strip()
-            keywords_line = re.split(r"AdobeStockCategory:|ShutterstockCategory:", keywords_line)[0].strip()
-            tags = [k.strip() for k in keywords_line.split(",") if k.strip()]
-            tags = list(dict.fromkeys(tags))[:60]
-        as_cat_match = re.search(r"AdobeStockCategory:\s*([\d]+\.?\s*[^\n]*)", generated_text)
-        if as_cat_match:
-            as_category = as_cat_match.group(1).strip()
-        ss_cat_match = re.search(r"ShutterstockCategory:\s*([^\n]*)", generated_text)
-        if ss_cat_match:
-            ss_category = ss_cat_match.group(1).strip()
-        # log_message(f"Successfully parsed legacy text format with {len(tags)} keywords", "debug")
+        return parse_legacy_text(generated_text)
     except Exception as e:
         log_message(f"[ERROR] Failed to parse metadata from Gemini: {e}")
         return None
-    return {
-        "title": title,
-        "description": description,
-        "tags": tags,
-        "as_category": as_category,
-        "ss_category": ss_category
-    }
 
 def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, use_video_prompt=False, selected_model_input=None, keyword_count="49", priority="Detailed", is_vector_conversion=False):
     is_multi_image = isinstance(image_path, list)
@@ -619,8 +659,7 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
         image_basename = os.path.basename(image_path)
         log_message(f"Starting process {image_basename} with quality: {priority}, model input: {selected_model_input}")
     if DEBUG_FORCE_FAILURE:
-        import random
-        if random.random() < DEBUG_FAILURE_RATE:
+        if _thread_random().random() < DEBUG_FAILURE_RATE:
             log_message(f"Artificial failure triggered for {image_basename} (testing Auto Retry)", "warning")
             return {"error": "debug_artificial_failure", "message": "Simulated failure for Auto Retry testing"}
     allowed_api_ext = ('.jpg', '.jpeg', '.png', '.webp', '.heic', '.heif')
@@ -635,11 +674,6 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
         if not ext.lower() in allowed_api_ext:
             log_message(f"File type {ext.lower()} not supported for API call ({image_basename}).", "warning")
             return None
-    if check_stop_event(stop_event, f"get_gemini_metadata cancelled before loop retry: {image_basename}"):
-        return "stopped"
-    wait_for_api_key_cooldown(api_key, stop_event)
-    if check_stop_event(stop_event, f"get_gemini_metadata cancelled after API key cooldown: {image_basename}"):
-        return "stopped"
     current_retries = 0
     last_attempted_model = None
     model_to_use = DEFAULT_MODEL
@@ -650,6 +684,23 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
             model_to_use = DEFAULT_MODEL
         else:
             model_to_use = selected_model_input
+    prompt_text = select_prompt(priority, use_png_prompt, use_video_prompt, provider="gemini")
+    model_tag = "auto" if is_auto_rotate_mode else model_to_use
+    media_type = "video" if use_video_prompt else "png" if use_png_prompt else "image"
+    prompt_skeleton = parse_prompt_skeleton(prompt_text)
+    image_digest = response_cache.image_digest(image_path)
+    cache_key = response_cache.make_key(image_digest, response_cache.prompt_id(prompt_text, model_tag))
+    cached_metadata = response_cache.get_cached(cache_key)
+    if cached_metadata is None:
+        cached_metadata = response_cache.get_variant(image_digest, media_type, model_tag, prompt_skeleton)
+    if cached_metadata:
+        log_message(f"Metadata for {image_basename} served from response cache", "success")
+        return cached_metadata
+    if check_stop_event(stop_event, f"get_gemini_metadata cancelled before loop retry: {image_basename}"):
+        return "stopped"
+    wait_for_api_key_cooldown(api_key, stop_event)
+    if check_stop_event(stop_event, f"get_gemini_metadata cancelled after API key cooldown: {image_basename}"):
+        return "stopped"
     while current_retries < API_MAX_RETRIES:
         if check_stop_event(stop_event, f"get_gemini_metadata loop retry ({current_retries + 1}) cancelled: {image_basename}"):
             return "stopped"
@@ -711,8 +762,8 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
                                 log_message(f"Thinking model enhanced extraction succeeded for {model_for_this_attempt}", "info")
                             else:
                                 log_message(f"Thinking model enhanced extraction failed, full candidate structure: {list(candidate.keys())}", "debug")
-                                log_message(f"Content structure: {content}", "debug")
-                                log_message(f"Response keys: {list(response_data.keys())}", "debug")
+                                log_message("Content structure: %s", "debug", content)
+                                log_message("Response keys: %s", "debug", list(response_data))
                         except Exception as e:
                             log_message(f"Thinking model enhanced extraction exception: {e}", "debug")
                 if parts and not generated_text:
@@ -738,6 +789,8 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
                     extracted_metadata = _extract_metadata_from_text(generated_text, keyword_count)
                     if extracted_metadata:
                         log_message(f"Metadata successfully extracted from {model_for_this_attempt} for {image_basename}", "success")
+                        response_cache.store(cache_key, extracted_metadata)
+                        response_cache.store_variant(image_digest, media_type, model_tag, prompt_skeleton, extracted_metadata)
                         return extracted_metadata
                     else:
                         log_message(f"Failed to extract metadata structure (via helper) from Gemini text ({model_for_this_attempt}, {image_basename}).", "warning")
@@ -749,7 +802,7 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
                         
                         if thoughts_token_count > 0:
                             log_message(f"Thinking model {model_for_this_attempt} had thoughtsTokenCount: {thoughts_token_count} but failed text extraction", "warning")
-                            log_message(f"Full response for debugging: {response_data}", "debug")
+                            log_message("Full response for debugging: %s", "debug", response_data)
                         else:
                             log_message(f"Thinking model {model_for_this_attempt} response structure: {[list(part.keys()) for part in parts] if parts else 'No parts found'}", "debug")
                     
@@ -769,6 +822,7 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
             if response_data and "error" in response_data:
                 api_error_msg = response_data["error"].get("message", error_detail)
             if http_status == 429 or (response_data and response_data.get("error", {}).get("code") == 429):
+                note_retry_after(_retry_delay_hint(response_data))
                 log_message(f"Rate limit from API for model {model_for_this_attempt} / API key ...{api_key[-5:]} on {image_basename}: {api_error_msg}", "warning")
                 if not is_auto_rotate_mode:
                     log_message(f"Warning: The model you selected ({model_for_this_attempt}) is reaching the quota limit. Try using a different model.", "warning")
@@ -781,14 +835,11 @@ def get_gemini_metadata(image_path, api_key, stop_event, use_png_prompt=False, u
         current_retries += 1
         if current_retries < API_MAX_RETRIES:
             base_delay = API_RETRY_DELAY * (2 ** (current_retries -1 if current_retries > 0 else 0))
-            jitter = random.uniform(0, 0.5 * base_delay)
+            jitter = _thread_random().uniform(0, 0.5 * base_delay)
             actual_delay = base_delay + jitter
             log_message(f"Waiting {actual_delay:.1f} seconds before retry ({current_retries + 1}/{API_MAX_RETRIES}) for {image_basename} (Last model: {model_for_this_attempt}, Error: {error_type or 'N/A'}) ...")
-            wait_start_time = time.time()
-            while time.time() - wait_start_time < actual_delay:
-                if check_stop_event(stop_event, f"Retry delay stopped for {image_basename}"):
-                    return "stopped"
-                time.sleep(0.1)
+            if wait_interruptible(actual_delay, stop_event, lambda: check_stop_event(stop_event, f"Retry delay stopped for {image_basename}")):
+                return "stopped"
     final_error_msg = f"Maximum retries exceeded for {image_basename}. Last model: {last_attempted_model}"
     if last_attempted_model and error_detail:
         final_error_msg = f"All attempts failed for {image_basename}. Last error from {last_attempted_model}: {error_detail}"
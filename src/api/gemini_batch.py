@@ -0,0 +1,290 @@
+# RJ Auto Metadata
+# Copyright (C) 2025 Riiicil
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# src/api/gemini_batch.py
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.logging import log_message
+from src.api.gemini_api import (
+    GENAI_SDK_AVAILABLE, GEMINI_MODELS, DEFAULT_MODEL,
+    get_sdk_client, check_stop_event, encode_image_base64, _extract_metadata_from_text
+)
+from src.api.prompts import select_prompt
+try:
+    from google.genai import types
+except ImportError:
+    types = None
+
+BATCH_POLL_INTERVAL = 15
+BATCH_MAX_WAIT = 24 * 60 * 60
+BATCH_SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+_COMPLETED_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+# Metadata returned by a finished batch job, keyed by the original input
+# path (compressed copies live in per-run temp folders and are deleted).
+_PREFETCHED = {}
+_PREFETCHED_LOCK = threading.Lock()
+
+
+def _path_key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def take_prefetched_metadata(image_path):
+    """Pop batch-mode metadata for an input path, or None when not prefetched."""
+    if not _PREFETCHED or not isinstance(image_path, str):
+        return None
+    with _PREFETCHED_LOCK:
+        return _PREFETCHED.pop(_path_key(image_path), None)
+
+
+def clear_prefetched_metadata():
+    with _PREFETCHED_LOCK:
+        _PREFETCHED.clear()
+
+
+def _state_name(job) -> str:
+    state = getattr(job, "state", None)
+    return getattr(state, "name", None) or str(state or "")
+
+
+def _response_text(response: dict) -> str:
+    candidates = (response or {}).get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    for part in parts:
+        if part.get("text") and not part.get("thought"):
+            return part["text"]
+    return ""
+
+
+def _encode_one(entry, prompt_text: str):
+    key, api_path = entry
+    try:
+        image_data = encode_image_base64(api_path)
+    except Exception as e:
+        log_message(f"Batch: cannot read {os.path.basename(api_path)}: {e}", "warning")
+        return None
+    line = {
+        "key": key,
+        "request": {
+            "contents": [{
+                "role": "user",
+                "parts": [
+                    {"text": prompt_text},
+                    {"inline_data": {"mime_type": "image/jpeg", "data": image_data}},
+                ],
+            }],
+            "generation_config": {
+                "temperature": 0.2,
+                "top_p": 0.8,
+                "top_k": 40,
+                "response_mime_type": "application/json",
+            },
+        },
+    }
+    return json.dumps(line)
+
+
+def _write_requests_file(entries, prompt_text: str, jsonl_path: str) -> int:
+    # Reading and base64-encoding is spread over a small pool; map() keeps the
+    # output order so lines are streamed to disk as soon as they are ready.
+    written = 0
+    max_workers = min(len(entries), os.cpu_count() or 4) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            open(jsonl_path, "w", encoding="utf-8") as f:
+        for line in executor.map(lambda entry: _encode_one(entry, prompt_text), entries):
+            if line is None:
+                continue
+            f.write(line)
+            f.write("\n")
+            written += 1
+    return written
+
+
+def run_batch_job(api_paths, api_key, stop_event, selected_model=None, keyword_count="49", priority="Detailed", use_png_prompt=False):
+    """Submit api_paths as one Gemini Batch API job and return {path: metadata}."""
+    if not GENAI_SDK_AVAILABLE or types is None:
+        log_message("Batch mode requires the google-genai SDK; falling back to per-file requests.", "warning")
+        return {}
+    client = get_sdk_client(api_key)
+    if client is None:
+        return {}
+    model = selected_model if selected_model in GEMINI_MODELS else DEFAULT_MODEL
+    prompt_text = select_prompt(priority, use_png_prompt=use_png_prompt, provider="gemini")
+
+    key_to_path = {}
+    entries = []
+    for api_path in api_paths:
+        key = hashlib.sha1(_path_key(api_path).encode("utf-8")).hexdigest()
+        key_to_path[key] = api_path
+        entries.append((key, api_path))
+
+    fd, jsonl_path = tempfile.mkstemp(prefix="rj_batch_", suffix=".jsonl")
+    os.close(fd)
+    job = None
+    try:
+        written = _write_requests_file(entries, prompt_text, jsonl_path)
+        if written == 0 or check_stop_event(stop_event, "Batch job cancelled before upload."):
+            return {}
+        log_message(f"Batch: uploading {written} request(s) for model {model} (API Key: ...{api_key[-5:]})", "info")
+        uploaded = client.files.upload(
+            file=jsonl_path,
+            config=types.UploadFileConfig(display_name=os.path.basename(jsonl_path), mime_type="jsonl"),
+        )
+        job = client.batches.create(
+            model=model,
+            src=uploaded.name,
+            config={"display_name": f"rj-auto-metadata-{int(time.time())}"},
+        )
+        log_message(f"Batch job created: {job.name}", "info")
+
+        started = time.monotonic()
+        while _state_name(job) not in _COMPLETED_STATES:
+            if check_stop_event(stop_event, "Batch job stop requested, cancelling job."):
+                try:
+                    client.batches.cancel(name=job.name)
+                except Exception as e:
+                    log_message(f"Batch: failed to cancel job {job.name}: {e}", "warning")
+                return {}
+            if time.monotonic() - started > BATCH_MAX_WAIT:
+                log_message(f"Batch job {job.name} did not finish in time.", "error")
+                return {}
+            if stop_event is not None:
+                stop_event.wait(BATCH_POLL_INTERVAL)
+            else:
+                time.sleep(BATCH_POLL_INTERVAL)
+            job = client.batches.get(name=job.name)
+            log_message(f"Batch job {job.name}: {_state_name(job)}", "info")
+
+        if _state_name(job) != "JOB_STATE_SUCCEEDED":
+            log_message(f"Batch job {job.name} ended with {_state_name(job)}; falling back to per-file requests.", "warning")
+            return {}
+
+        result_name = getattr(getattr(job, "dest", None), "file_name", None)
+        if not result_name:
+            log_message(f"Batch job {job.name} has no result file.", "warning")
+            return {}
+        content = client.files.download(file=result_name)
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+
+        results = {}
+        for raw_line in content.splitlines():
+            if not raw_line.strip():
+                continue
+            try:
+                item = json.loads(raw_line)
+            except json.JSONDecodeError:
+                continue
+            api_path = key_to_path.get(item.get("key"))
+            if api_path is None or "error" in item:
+                continue
+            generated_text = _response_text(item.get("response"))
+            if not generated_text:
+                continue
+            metadata = _extract_metadata_from_text(generated_text, keyword_count)
+            if metadata:
+                results[api_path] = metadata
+        log_message(f"Batch job {job.name}: {len(results)}/{written} result(s) parsed.", "success")
+        return results
+    except Exception as e:
+        log_message(f"Batch job failed: {e}", "error")
+        return {}
+    finally:
+        try:
+            os.remove(jsonl_path)
+        except Exception:
+            pass
+
+
+def prefetch_batch_metadata(input_paths, output_dir, api_keys, stop_event, selected_model=None, keyword_count="49", priority="Detailed"):
+    """Run JPG/JPEG and PNG files through batch jobs ahead of the per-file pipeline.
+
+    Files are split round-robin over api_keys and every key's jobs run
+    concurrently. Results are stored under the original input path.
+    """
+    from src.utils.compression import compress_images, get_temp_compression_folder
+
+    if isinstance(api_keys, str):
+        api_keys = [api_keys]
+    supported = [p for p in input_paths if os.path.splitext(p)[1].lower() in BATCH_SUPPORTED_EXTENSIONS]
+    if not supported or not api_keys or check_stop_event(stop_event):
+        return 0
+    temp_folder = get_temp_compression_folder(output_dir)
+    compressed = compress_images(supported, temp_folder, stop_event=stop_event)
+    temp_files = [c for c, is_compressed in compressed if is_compressed and c]
+    try:
+        if check_stop_event(stop_event):
+            return 0
+        jobs = {}
+        for index, (input_path, (compressed_path, is_compressed)) in enumerate(zip(supported, compressed)):
+            api_path = compressed_path if is_compressed and compressed_path else input_path
+            use_png_prompt = input_path.lower().endswith(".png")
+            job_key = (api_keys[index % len(api_keys)], use_png_prompt)
+            jobs.setdefault(job_key, {})[api_path] = input_path
+
+        def run_one(job_key, path_map):
+            api_key, use_png_prompt = job_key
+            results = run_batch_job(list(path_map), api_key, stop_event, selected_model, keyword_count, priority, use_png_prompt)
+            if check_stop_event(stop_event):
+                return 0
+            with _PREFETCHED_LOCK:
+                for api_path, metadata in results.items():
+                    _PREFETCHED[_path_key(path_map[api_path])] = metadata
+            return len(results)
+
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="gemini-batch") as executor:
+            return sum(executor.map(lambda item: run_one(*item), jobs.items()))
+    finally:
+        for temp_file in temp_files:
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+
+def start_batch_prefetch(input_paths, output_dir, api_keys, stop_event, selected_model=None, keyword_count="49", priority="Detailed"):
+    """Run prefetch_batch_metadata on a background thread and return the thread.
+
+    Callers hold back the files in input_paths while the thread is alive;
+    everything else can be processed per file in the meantime.
+    """
+    def runner():
+        try:
+            prefetched = prefetch_batch_metadata(
+                input_paths, output_dir, api_keys, stop_event,
+                selected_model=selected_model, keyword_count=keyword_count, priority=priority
+            )
+            log_message(f"Batch mode: {prefetched} file(s) received metadata from batch job", "info")
+        except Exception as e:
+            log_message(f"Batch mode failed, falling back to per-file requests: {e}", "error")
+
+    thread = threading.Thread(target=runner, name="gemini-batch-prefetch", daemon=True)
+    thread.start()
+    return thread
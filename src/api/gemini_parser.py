@@ -0,0 +1,63 @@
+# RJ Auto Metadata
+# Copyright (C) 2025 Riiicil
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# src/api/gemini_parser.py
+import re
+
+# Legacy "Title: ... / Keywords: ..." responses, used when the model ignores
+# the JSON schema. Patterns are compiled once at import.
+TITLE_RE = re.compile(r"^Title:\s*(.*)", re.MULTILINE | re.IGNORECASE)
+DESCRIPTION_RE = re.compile(r"^Description:\s*(.*)", re.MULTILINE | re.IGNORECASE)
+KEYWORDS_RE = re.compile(r"^Keywords:\s*(.*)", re.MULTILINE | re.IGNORECASE)
+KEYWORDS_TAIL_RE = re.compile(r"AdobeStockCategory:|ShutterstockCategory:")
+ADOBE_CATEGORY_RE = re.compile(r"AdobeStockCategory:\s*([\d]+\.?\s*[^\n]*)")
+SHUTTERSTOCK_CATEGORY_RE = re.compile(r"ShutterstockCategory:\s*([^\n]*)")
+
+MAX_KEYWORDS = 60
+
+
+def split_keywords(keywords_line: str, limit: int = MAX_KEYWORDS) -> list:
+    """Split a comma separated keyword line, dropping blanks and duplicates."""
+    tags = dict.fromkeys(k for k in map(str.strip, keywords_line.split(",")) if k)
+    return list(tags)[:limit]
+
+
+def parse_legacy_text(generated_text: str) -> dict:
+    title = description = as_category = ss_category = ""
+    tags = []
+    match = TITLE_RE.search(generated_text)
+    if match:
+        title = match.group(1).strip()
+    match = DESCRIPTION_RE.search(generated_text)
+    if match:
+        description = match.group(1).strip()
+    match = KEYWORDS_RE.search(generated_text)
+    if match:
+        keywords_line = KEYWORDS_TAIL_RE.split(match.group(1).strip(), 1)[0].strip()
+        tags = split_keywords(keywords_line)
+    match = ADOBE_CATEGORY_RE.search(generated_text)
+    if match:
+        as_category = match.group(1).strip()
+    match = SHUTTERSTOCK_CATEGORY_RE.search(generated_text)
+    if match:
+        ss_category = match.group(1).strip()
+    return {
+        "title": title,
+        "description": description,
+        "tags": tags,
+        "as_category": as_category,
+        "ss_category": ss_category
+    }
@@ -21,7 +21,6 @@ import base64
 import json
 import os
 import threading
-import time
 from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import requests
@@ -29,6 +28,7 @@ import re
 
 from src.api.prompts import select_prompt
 from src.utils.logging import log_message
+from src.utils.rate_limiter import wait_interruptible, parse_retry_after, note_retry_after
 
 def _clean_json_text(text: str) -> str:
     if not text:
@@ -478,11 +478,8 @@ def get_koboillm_metadata(
 			if attempt >= API_MAX_RETRIES:
 				return {"error": str(exc)}
 			sleep_duration = RETRY_DELAY_SECONDS * attempt
-			sleep_start = time.time()
-			while time.time() - sleep_start < sleep_duration:
-				if check_stop_event(stop_event, "KoboiLLM retry sleep cancelled"):
-					return "stopped"
-				time.sleep(0.1)
+			if wait_interruptible(sleep_duration, stop_event, lambda: check_stop_event(stop_event, "KoboiLLM retry sleep cancelled")):
+				return "stopped"
 			continue
 
 		if response.status_code == 200:
@@ -508,13 +505,12 @@ def get_koboillm_metadata(
 			if check_stop_event(stop_event):
 				return "stopped"
 			log_message("KoboiLLM rate limit hit, backing off before retry", "warning")
+			retry_after = parse_retry_after(response.headers.get("Retry-After"))
+			note_retry_after(retry_after)
 			attempt += 1
-			sleep_duration = RETRY_DELAY_SECONDS * attempt
-			sleep_start = time.time()
-			while time.time() - sleep_start < sleep_duration:
-				if check_stop_event(stop_event, "KoboiLLM retry sleep cancelled"):
-					return "stopped"
-				time.sleep(0.1)
+			sleep_duration = max(RETRY_DELAY_SECONDS * attempt, retry_after or 0)
+			if wait_interruptible(sleep_duration, stop_event, lambda: check_stop_event(stop_event, "KoboiLLM retry sleep cancelled")):
+				return "stopped"
 			continue
 
 		if 500 <= response.status_code < 600:
@@ -523,11 +519,8 @@ def get_koboillm_metadata(
 			log_message(f"KoboiLLM server error {response.status_code}, retrying", "warning")
 			attempt += 1
 			sleep_duration = RETRY_DELAY_SECONDS * attempt
-			sleep_start = time.time()
-			while time.time() - sleep_start < sleep_duration:
-				if check_stop_event(stop_event, "KoboiLLM retry sleep cancelled"):
-					return "stopped"
-				time.sleep(0.1)
+			if wait_interruptible(sleep_duration, stop_event, lambda: check_stop_event(stop_event, "KoboiLLM retry sleep cancelled")):
+				return "stopped"
 			continue
 
 		try:
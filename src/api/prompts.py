@@ -15,51 +15,144 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 # src/api/prompts.py
-PROMPT_TEXT = '''Analyze image, generate JSON metadata:
-{"title": ["minimum 6 words, max 180 chars, descriptive, unique, dont use special characters"], "description": ["detailed, max 180 chars, unique, dont use special characters"], "keywords": ["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick: 'Abstract', 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Beauty/Fashion', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}'''
-
-PROMPT_TEXT_PNG = '''Analyze main subject only (ignore background), generate JSON:
-{"title": ["focused on main subject, minimum 6 words, max 180 chars, unique, dont use special characters"], "description": ["focused on main subject details only, max 180 chars, unique, dont use special characters"], "keywords": ["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick: 'Abstract', 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Beauty/Fashion', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}'''
-
-PROMPT_TEXT_VIDEO = '''
-Analyze these video frames comprehensively and generate detailed JSON video metadata:
-{"title": ["video title, minimum 6 words, max 180 chars, unique, dont use special characters"], "description": ["video description, max 180 chars, unique, dont use special characters"], "keywords": ["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick one: 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Holidays', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}
-'''
+import re
+from functools import lru_cache
+from typing import Final, NamedTuple, Optional
+
+from src.metadata.categories.for_adobestock import ADOBE_STOCK_CATEGORIES
+from src.metadata.categories.for_shutterstock import SHUTTERSTOCK_CATEGORIES_IMAGE, SHUTTERSTOCK_CATEGORIES_VIDEO
+
+_ADOBE_STOCK_CATEGORY_LIST = ", ".join(f"{i}.{name}" for i, name in enumerate(ADOBE_STOCK_CATEGORIES, 1))
+_SHUTTERSTOCK_CATEGORY_LIST_IMAGE = ", ".join(f"'{name}'" for name in SHUTTERSTOCK_CATEGORIES_IMAGE)
+_SHUTTERSTOCK_CATEGORY_LIST_VIDEO = ", ".join(f"'{name}'" for name in SHUTTERSTOCK_CATEGORIES_VIDEO)
+
+# Category text is the bulk of every prompt; it is built once here and the
+# same string objects are referenced by every variant's chunk list.
+_GEMINI_ADOBE_FIELD = f'"adobe_stock_category": ["pick number and name: {_ADOBE_STOCK_CATEGORY_LIST}"], '
+_OPENAI_CATEGORY_RULES = {
+    is_video: (
+        f"- Adobe Stock category: choose the number and name from: {_ADOBE_STOCK_CATEGORY_LIST}.\n"
+        f"- Shutterstock category: choose one from: {_SHUTTERSTOCK_CATEGORY_LIST_VIDEO if is_video else _SHUTTERSTOCK_CATEGORY_LIST_IMAGE}.\n\n"
+    )
+    for is_video in (False, True)
+}
 
+# Gemini prompts share one template. Each (mode, media) variant keeps its own
+# wording; only the word/char/keyword limits are filled in.
+_GEMINI_TIER_LIMITS = {
+    "Detailed": (6, 180),
+    "Balanced": (5, 165),
+    "Less": (4, 150),
+}
 
+_GEMINI_PROMPT_VARIANTS = {
+    # (mode, media): (header, footer, title_lead, title_tail, description_lead, compact, shutterstock_pick)
+    ("Detailed", "image"): ("Analyze image, generate JSON metadata:\n", "", "", "descriptive, ", "detailed, ", False, "pick"),
+    ("Detailed", "png"): ("Analyze main subject only (ignore background), generate JSON:\n", "", "focused on main subject, ", "", "focused on main subject details only, ", False, "pick"),
+    ("Detailed", "video"): ("\nAnalyze these video frames comprehensively and generate detailed JSON video metadata:\n", "\n", "video title, ", "", "video description, ", False, "pick one"),
+    ("Balanced", "image"): ("Generate balanced JSON metadata:\n", "", "focused, ", "", "clear info, ", False, "pick"),
+    ("Balanced", "png"): ("\nGenerate balanced JSON metadata:\n", "\n", "focused on main subject, ", "", "clear info, main subject only, ", False, "pick"),
+    ("Balanced", "video"): ("\nGenerate balanced JSON metadata:\n", "\n", "video title, ", "", "video description, ", False, "pick one"),
+    ("Less", "image"): ("Quick JSON: ", "", "", "", "brief, ", True, "pick one"),
+    ("Less", "png"): ("Subject JSON: ", "", "main subject, ", "", "subject details only, ", True, "pick"),
+    ("Less", "video"): ("Video JSON: ", "", "video action, ", "", "video summary, ", True, "pick one"),
+}
 
-PROMPT_TEXT_BALANCED = '''Generate balanced JSON metadata:
-{"title": ["focused, minimum 5 words, max 165 chars, unique, dont use special characters"], "description": ["clear info, max 165 chars, unique, dont use special characters"], "keywords": ["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick: 'Abstract', 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Beauty/Fashion', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}'''
+_DEFAULT_KEYWORD_REQUEST = 60
 
-PROMPT_TEXT_PNG_BALANCED = '''
-Generate balanced JSON metadata:
-{"title": ["focused on main subject, minimum 5 words, max 165 chars, unique, dont use special characters"], "description": ["clear info, main subject only, max 165 chars, unique, dont use special characters"], "keywords": ["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick: 'Abstract', 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Beauty/Fashion', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}
-'''
 
-PROMPT_TEXT_VIDEO_BALANCED = '''
-Generate balanced JSON metadata:
-{"title": ["video title, minimum 5 words, max 165 chars, unique, dont use special characters"], "description": ["video description, max 165 chars, unique, dont use special characters"], "keywords": ["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick one: 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Holidays', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}
-'''
+class PromptSkeleton(NamedTuple):
+    min_words: int
+    kw_count: int
+    focus_on_object: bool
+    max_chars: int
 
 
+@lru_cache(maxsize=None)
+def _prompt_chunks(mode: str, media: str) -> tuple:
+    """Static pieces of a Gemini prompt; None marks min_words, kw_count and the keyword floor."""
+    header, footer, title_lead, title_tail, description_lead, compact, ss_pick = _GEMINI_PROMPT_VARIANTS[(mode, media)]
+    max_chars = _GEMINI_TIER_LIMITS[mode][1]
+    sep = "" if compact else " "
+    shutterstock_list = _SHUTTERSTOCK_CATEGORY_LIST_VIDEO if media == "video" else _SHUTTERSTOCK_CATEGORY_LIST_IMAGE
+    return (
+        f'{header}{{"title": ["{title_lead}minimum ',
+        None,
+        f' words, max {max_chars} chars, {title_tail}unique, dont use special characters"], '
+        f'"description":{sep}["{description_lead}max {max_chars} chars, unique, dont use special characters"], '
+        f'"keywords":{sep}["Give me ',
+        None,
+        ' unique keywords, ensure at least ',
+        None,
+        ' unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], ',
+        _GEMINI_ADOBE_FIELD,
+        f'"shutterstock_category": ["{ss_pick}: ',
+        shutterstock_list,
+        f'"]}}{footer}',
+    )
 
-PROMPT_TEXT_FAST = '''Quick JSON: {"title": ["minimum 4 words, max 150 chars, unique, dont use special characters"], "description":["brief, max 150 chars, unique, dont use special characters"], "keywords":["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick one: 'Abstract', 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Beauty/Fashion', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}'''
 
-PROMPT_TEXT_PNG_FAST = '''Subject JSON: {"title": ["main subject, minimum 4 words, max 150 chars, unique, dont use special characters"], "description":["subject details only, max 150 chars, unique, dont use special characters"], "keywords":["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick: 'Abstract', 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Beauty/Fashion', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}'''
+@lru_cache(maxsize=32)
+def build_prompt(mode: str, media: str = "image", min_words: Optional[int] = None, kw_count: int = _DEFAULT_KEYWORD_REQUEST) -> str:
+    """Fill the Gemini JSON prompt template for a quality tier and media type."""
+    mode = mode if mode in _GEMINI_TIER_LIMITS else "Detailed"
+    media = media if media in ("image", "png", "video") else "image"
+    if min_words is None:
+        min_words = _GEMINI_TIER_LIMITS[mode][0]
+    chunks = list(_prompt_chunks(mode, media))
+    chunks[1] = str(min_words)
+    chunks[3] = str(kw_count)
+    chunks[5] = str(max(1, kw_count - 5))
+    return "".join(chunks)
+
+
+_SKELETON_MIN_WORDS_RE = re.compile(r"minimum\s+(\d+)\s+words", re.IGNORECASE)
+_SKELETON_MAX_CHARS_RE = re.compile(r"max\s+(\d+)\s+chars", re.IGNORECASE)
+_SKELETON_KEYWORDS_RE = re.compile(r"(\d+)\s+(?:unique\s+)?keywords", re.IGNORECASE)
+_SKELETON_FOCUS_RE = re.compile(r"main subject|ignore background|subject details", re.IGNORECASE)
+
+
+def parse_prompt_skeleton(prompt_text: str) -> PromptSkeleton:
+    """Extract the limits that matter for response reuse from any prompt text."""
+    text = prompt_text or ""
+    min_words = _SKELETON_MIN_WORDS_RE.search(text)
+    max_chars = _SKELETON_MAX_CHARS_RE.search(text)
+    kw_count = _SKELETON_KEYWORDS_RE.search(text)
+    return PromptSkeleton(
+        min_words=int(min_words.group(1)) if min_words else 0,
+        kw_count=int(kw_count.group(1)) if kw_count else _DEFAULT_KEYWORD_REQUEST,
+        focus_on_object=bool(_SKELETON_FOCUS_RE.search(text)),
+        max_chars=int(max_chars.group(1)) if max_chars else 0,
+    )
 
-PROMPT_TEXT_VIDEO_FAST = '''Video JSON: {"title": ["video action, minimum 4 words, max 150 chars, unique, dont use special characters"], "description":["video summary, max 150 chars, unique, dont use special characters"], "keywords":["Give me 60 unique keywords, ensure at least 55 unique; if fewer are obvious, add closely-related synonyms/variations. No multi-word phrases. Array"], "adobe_stock_category": ["pick number and name: 1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"], "shutterstock_category": ["pick one: 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Holidays', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"]}''' 
+@lru_cache(maxsize=None)
+def get_prompt(mode: str, media: str = "image") -> str:
+    return build_prompt(mode, media)
+
+
+# The Gemini PROMPT_TEXT* constants are built on first access rather than at
+# import; only the variants a run actually selects are ever materialised.
+_GEMINI_PROMPT_NAMES: Final = {
+    "PROMPT_TEXT": ("Detailed", "image"),
+    "PROMPT_TEXT_PNG": ("Detailed", "png"),
+    "PROMPT_TEXT_VIDEO": ("Detailed", "video"),
+    "PROMPT_TEXT_BALANCED": ("Balanced", "image"),
+    "PROMPT_TEXT_PNG_BALANCED": ("Balanced", "png"),
+    "PROMPT_TEXT_VIDEO_BALANCED": ("Balanced", "video"),
+    "PROMPT_TEXT_FAST": ("Less", "image"),
+    "PROMPT_TEXT_PNG_FAST": ("Less", "png"),
+    "PROMPT_TEXT_VIDEO_FAST": ("Less", "video"),
+}
 
-_ADOBE_STOCK_CATEGORY_LIST = (
-    "1.Animals, 2.Architecture, 3.Business, 4.Drinks, 5.Environment, 6.Mind, 7.Food, 8.Graphics, 9.Leisure, 10.Industry, 11.Landscapes, 12.Lifestyle, 13.People, 14.Plants, 15.Religion, 16.Science, 17.Social, 18.Sports, 19.Technology, 20.Transport, 21.Travel"
-)
 
-_SHUTTERSTOCK_CATEGORY_LIST_IMAGE = (
-    "'Abstract', 'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Beauty/Fashion', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"
-)
+def __getattr__(name: str) -> str:
+    variant = _GEMINI_PROMPT_NAMES.get(name)
+    if variant is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = get_prompt(*variant)
+    globals()[name] = value
+    return value
 
-_SHUTTERSTOCK_CATEGORY_LIST_VIDEO = (
-    "'Animals/Wildlife', 'Arts', 'Backgrounds/Textures', 'Buildings/Landmarks', 'Business/Finance', 'Education', 'Food and drink', 'Healthcare/Medical', 'Holidays', 'Industrial', 'Nature', 'Objects', 'People', 'Religion', 'Science', 'Signs/Symbols', 'Sports/Recreaction', 'Technology', 'Transportation'"
-)
 
 _OPENAI_JSON_TEMPLATE = '{"title": "", "description": "", "keywords": [], "adobe_stock_category": "", "shutterstock_category": ""}'
 
@@ -71,11 +164,6 @@ def _build_openai_prompt(
     keyword_rule: str,
     is_video: bool = False,
 ) -> str:
-    shutterstock_list = (
-        _SHUTTERSTOCK_CATEGORY_LIST_VIDEO
-        if is_video
-        else _SHUTTERSTOCK_CATEGORY_LIST_IMAGE
-    )
     return (
         "You are a stock photography metadata generator. "
         f"{intro}\n\n"
@@ -83,8 +171,7 @@ def _build_openai_prompt(
         f"- Title: {title_rule}.\n"
         f"- Description: {description_rule}.\n"
         f"- Keywords: {keyword_rule}.\n"
-        f"- Adobe Stock category: choose the number and name from: {_ADOBE_STOCK_CATEGORY_LIST}.\n"
-        f"- Shutterstock category: choose one from: {shutterstock_list}.\n\n"
+        f"{_OPENAI_CATEGORY_RULES[is_video]}"
         "Return ONLY valid JSON matching this schema exactly (no extra text, comments, or markdown):\n"
         f"{_OPENAI_JSON_TEMPLATE}"
     )
@@ -174,25 +261,6 @@ _OPENAI_PROMPT_PRIORITY_MAP = {
     },
 }
 
-_GEMINI_PROMPT_PRIORITY_MAP = {
-    "Detailed": {
-        "default": PROMPT_TEXT,
-        "png": PROMPT_TEXT_PNG,
-        "video": PROMPT_TEXT_VIDEO,
-    },
-    "Balanced": {
-        "default": PROMPT_TEXT_BALANCED,
-        "png": PROMPT_TEXT_PNG_BALANCED,
-        "video": PROMPT_TEXT_VIDEO_BALANCED,
-    },
-    "Less": {
-        "default": PROMPT_TEXT_FAST,
-        "png": PROMPT_TEXT_PNG_FAST,
-        "video": PROMPT_TEXT_VIDEO_FAST,
-    },
-}
-
-
 def select_prompt(
     priority: str,
     use_png_prompt: bool = False,
@@ -201,10 +269,10 @@ def select_prompt(
 ) -> str:
     provider_key = (provider or "openai").strip().lower()
     if provider_key == "gemini":
-        priority_map = _GEMINI_PROMPT_PRIORITY_MAP
-    else:
-        priority_map = _OPENAI_PROMPT_PRIORITY_MAP
+        media = "video" if use_video_prompt else "png" if use_png_prompt else "image"
+        return get_prompt(priority if priority in _GEMINI_TIER_LIMITS else "Detailed", media)
 
+    priority_map = _OPENAI_PROMPT_PRIORITY_MAP
     priority_key = priority if priority in priority_map else "Detailed"
     variants = priority_map[priority_key]
 
@@ -213,3 +281,4 @@ def select_prompt(
     if use_png_prompt:
         return variants.get("png", variants["default"])
     return variants["default"]
+
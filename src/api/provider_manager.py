@@ -20,7 +20,7 @@ from __future__ import annotations
 from typing import Iterable, List, Optional
 import re
 
-from src.api import gemini_api, openai_api, openrouter_api, groq_api, koboillm_api
+from src.api import gemini_api, gemini_batch, openai_api, openrouter_api, groq_api, koboillm_api
 from src.utils.logging import log_message
 
 PROVIDER_GEMINI = "Gemini"
@@ -103,6 +103,78 @@ def select_api_key(provider: str, api_keys: Iterable[str]):
     return module.select_api_key(list(api_keys))
 
 
+def _fill_keywords_if_short(metadata: dict, keyword_count_value: str):
+    try:
+        limit = int(keyword_count_value)
+        if limit < 1:
+            limit = 49
+        if limit > 100:
+            limit = limit
+    except Exception:
+        limit = 49
+
+    raw_tags = metadata.get("tags") or []
+    title = metadata.get("title", "") or ""
+    description = metadata.get("description", "") or ""
+
+    seen = set()
+    final_tags: List[str] = []
+
+    def add_tag(tag_value):
+        tag_text = str(tag_value).strip()
+        if not tag_text:
+            return
+        tag_text = re.sub(r"[^\w\-]", " ", tag_text)
+        tag_text = re.sub(r"\s+", " ", tag_text).strip()
+        if not tag_text:
+            return
+        if " " in tag_text:
+            tag_text = tag_text.replace(" ", "")
+            if not tag_text:
+                return
+        lower = tag_text.lower()
+        if lower in seen:
+            return
+        seen.add(lower)
+        final_tags.append(tag_text)
+
+    for tag in raw_tags:
+        add_tag(tag)
+
+    if len(final_tags) >= limit:
+        metadata["tags"] = final_tags[:limit]
+        return metadata
+
+    filler_words: List[str] = []
+
+    def collect_words(text: str):
+        for word in re.split(r"[^A-Za-z0-9]+", text or ""):
+            if len(word) >= 3:
+                filler_words.append(word)
+
+    collect_words(title)
+    collect_words(description)
+
+    for word in filler_words:
+        if len(final_tags) >= limit:
+            break
+        add_tag(word)
+
+    metadata["tags"] = final_tags[:limit]
+    return metadata
+
+
+def take_prefetched_metadata(provider: str, input_path, keyword_count: str = "49"):
+    """Metadata a batch-mode job already returned for input_path, or None."""
+    _, provider_key = get_provider_module(provider)
+    if provider_key != PROVIDER_GEMINI:
+        return None
+    prefetched = gemini_batch.take_prefetched_metadata(input_path)
+    if prefetched is None:
+        return None
+    return _fill_keywords_if_short(prefetched, keyword_count)
+
+
 def get_metadata(
     provider: str,
     image_path,
@@ -117,65 +189,6 @@ def get_metadata(
 ):
     module, provider_key = get_provider_module(provider)
 
-    def _fill_keywords_if_short(metadata: dict, keyword_count_value: str):
-        try:
-            limit = int(keyword_count_value)
-            if limit < 1:
-                limit = 49
-            if limit > 100:
-                limit = limit
-        except Exception:
-            limit = 49
-
-        raw_tags = metadata.get("tags") or []
-        title = metadata.get("title", "") or ""
-        description = metadata.get("description", "") or ""
-
-        seen = set()
-        final_tags: List[str] = []
-
-        def add_tag(tag_value):
-            tag_text = str(tag_value).strip()
-            if not tag_text:
-                return
-            tag_text = re.sub(r"[^\w\-]", " ", tag_text)
-            tag_text = re.sub(r"\s+", " ", tag_text).strip()
-            if not tag_text:
-                return
-            if " " in tag_text:
-                tag_text = tag_text.replace(" ", "")
-                if not tag_text:
-                    return
-            lower = tag_text.lower()
-            if lower in seen:
-                return
-            seen.add(lower)
-            final_tags.append(tag_text)
-
-        for tag in raw_tags:
-            add_tag(tag)
-
-        if len(final_tags) >= limit:
-            metadata["tags"] = final_tags[:limit]
-            return metadata
-
-        filler_words: List[str] = []
-
-        def collect_words(text: str):
-            for word in re.split(r"[^A-Za-z0-9]+", text or ""):
-                if len(word) >= 3:
-                    filler_words.append(word)
-
-        collect_words(title)
-        collect_words(description)
-
-        for word in filler_words:
-            if len(final_tags) >= limit:
-                break
-            add_tag(word)
-
-        metadata["tags"] = final_tags[:limit]
-        return metadata
     effective_model = selected_model
     if provider_key == PROVIDER_GEMINI:
         if selected_model in (None, "", "Auto Rotation"):
@@ -0,0 +1,300 @@
+# RJ Auto Metadata
+# Copyright (C) 2025 Riiicil
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# src/api/response_cache.py
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from src.utils.logging import log_message
+
+CACHE_FILE_NAME = "response_cache.sqlite3"
+CACHE_MAX_SIZE_MB = 64
+CACHE_EVICT_FRACTION = 0.2
+
+CACHE_READ_CHUNK = 4 * 1024 * 1024
+
+_CONN = None
+_CONN_LOCK = threading.Lock()
+_DISABLED = False
+
+# In-run memo in front of SQLite, so duplicate images within one batch are
+# answered without touching the database. Cleared at the end of every run.
+_MEMO = {}
+_MEMO_LOCK = threading.Lock()
+
+
+def _get_cache_path() -> str:
+    try:
+        from src.utils.system_checks import _get_base_dir
+        base_dir = _get_base_dir()
+        if base_dir and os.access(base_dir, os.W_OK):
+            return os.path.join(base_dir, CACHE_FILE_NAME)
+    except Exception:
+        pass
+    return os.path.join(tempfile.gettempdir(), CACHE_FILE_NAME)
+
+
+def _get_connection():
+    global _CONN, _DISABLED
+    if _CONN is not None or _DISABLED:
+        return _CONN
+    try:
+        conn = sqlite3.connect(_get_cache_path(), check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key BLOB PRIMARY KEY, title TEXT, description TEXT, keywords TEXT, "
+            "adobe TEXT, shutter TEXT, created_at INT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_created_at ON cache(created_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS variant_cache ("
+            "image_hash BLOB, slot TEXT, min_words INT, kw_count INT, max_chars INT, "
+            "title TEXT, description TEXT, keywords TEXT, adobe TEXT, shutter TEXT, created_at INT, "
+            "PRIMARY KEY (image_hash, slot))"
+        )
+        conn.commit()
+        _CONN = conn
+    except Exception as e:
+        log_message(f"Response cache disabled: {e}", "warning")
+        _DISABLED = True
+    return _CONN
+
+
+def prompt_id(prompt_text: str, model_name: str) -> str:
+    """Short tag for a prompt/model pair; changes whenever the prompt text is edited."""
+    digest = hashlib.sha1(prompt_text.encode("utf-8")).hexdigest()[:10]
+    return f"{model_name}:{digest}"
+
+
+def image_digest(image_paths):
+    if isinstance(image_paths, str):
+        image_paths = [image_paths]
+    hasher = hashlib.sha256()
+    try:
+        for path in image_paths:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CACHE_READ_CHUNK), b""):
+                    hasher.update(chunk)
+    except OSError:
+        return None
+    return hasher.digest()
+
+
+def make_key(digest, prompt_tag: str):
+    if digest is None:
+        return None
+    return digest + b"|" + prompt_tag.encode("utf-8")
+
+
+def _row_to_metadata(title, description, keywords, adobe, shutter):
+    try:
+        tags = json.loads(keywords or "[]")
+    except json.JSONDecodeError:
+        tags = []
+    return {
+        "title": title or "",
+        "description": description or "",
+        "tags": tags,
+        "as_category": adobe or "",
+        "ss_category": shutter or "",
+    }
+
+
+def _trim_text(text: str, max_chars: int) -> str:
+    if not max_chars or len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > max_chars // 2 else cut).rstrip(" ,.;:")
+
+
+def clear_memo() -> None:
+    with _MEMO_LOCK:
+        _MEMO.clear()
+
+
+def get_cached(key):
+    if key is None:
+        return None
+    with _MEMO_LOCK:
+        memo = _MEMO.get(key)
+    if memo is not None:
+        return dict(memo, tags=list(memo["tags"]))
+    with _CONN_LOCK:
+        conn = _get_connection()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT title, description, keywords, adobe, shutter FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log_message(f"Response cache read failed: {e}", "warning")
+            return None
+    if row is None:
+        return None
+    metadata = _row_to_metadata(*row)
+    with _MEMO_LOCK:
+        _MEMO[key] = metadata
+    return dict(metadata, tags=list(metadata["tags"]))
+
+
+def store(key, metadata: dict) -> None:
+    if key is None or not isinstance(metadata, dict):
+        return
+    with _MEMO_LOCK:
+        _MEMO[key] = {
+            "title": metadata.get("title", ""),
+            "description": metadata.get("description", ""),
+            "tags": list(metadata.get("tags") or []),
+            "as_category": metadata.get("as_category", ""),
+            "ss_category": metadata.get("ss_category", ""),
+        }
+    with _CONN_LOCK:
+        conn = _get_connection()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    metadata.get("title", ""),
+                    metadata.get("description", ""),
+                    json.dumps(list(metadata.get("tags") or [])),
+                    metadata.get("as_category", ""),
+                    metadata.get("ss_category", ""),
+                    int(time.time()),
+                ),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            log_message(f"Response cache write failed: {e}", "warning")
+
+
+def _variant_slot(media: str, model_tag: str, skeleton) -> str:
+    return f"{media}|{int(skeleton.focus_on_object)}|{model_tag}"
+
+
+def get_variant(digest, media: str, model_tag: str, skeleton):
+    """Reshape a cached response from a richer prompt variant to fit skeleton."""
+    if digest is None:
+        return None
+    with _CONN_LOCK:
+        conn = _get_connection()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT min_words, kw_count, max_chars, title, description, keywords, adobe, shutter "
+                "FROM variant_cache WHERE image_hash = ? AND slot = ?",
+                (digest, _variant_slot(media, model_tag, skeleton)),
+            ).fetchone()
+        except sqlite3.Error as e:
+            log_message(f"Response cache read failed: {e}", "warning")
+            return None
+    if row is None:
+        return None
+    min_words, kw_count, max_chars = row[0], row[1], row[2]
+    if min_words < skeleton.min_words or kw_count < skeleton.kw_count or max_chars < skeleton.max_chars:
+        return None
+    metadata = _row_to_metadata(*row[3:])
+    metadata["title"] = _trim_text(metadata["title"], skeleton.max_chars)
+    metadata["description"] = _trim_text(metadata["description"], skeleton.max_chars)
+    metadata["tags"] = metadata["tags"][:skeleton.kw_count]
+    return metadata
+
+
+def store_variant(digest, media: str, model_tag: str, skeleton, metadata: dict) -> None:
+    """Keep the richest response seen for (image, media) so lower tiers can reuse it."""
+    if digest is None or not isinstance(metadata, dict):
+        return
+    slot = _variant_slot(media, model_tag, skeleton)
+    with _CONN_LOCK:
+        conn = _get_connection()
+        if conn is None:
+            return
+        try:
+            row = conn.execute(
+                "SELECT min_words, kw_count, max_chars FROM variant_cache WHERE image_hash = ? AND slot = ?",
+                (digest, slot),
+            ).fetchone()
+            # Keep the stored response only when it covers this request in every field
+            if row is not None and all(a >= b for a, b in zip(row, (skeleton.min_words, skeleton.kw_count, skeleton.max_chars))):
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO variant_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    digest, slot, skeleton.min_words, skeleton.kw_count, skeleton.max_chars,
+                    metadata.get("title", ""),
+                    metadata.get("description", ""),
+                    json.dumps(list(metadata.get("tags") or [])),
+                    metadata.get("as_category", ""),
+                    metadata.get("ss_category", ""),
+                    int(time.time()),
+                ),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            log_message(f"Response cache write failed: {e}", "warning")
+
+
+def trim() -> None:
+    """Drop the oldest entries once the cache file passes CACHE_MAX_SIZE_MB.
+
+    Called once at the end of a run rather than from store(). The VACUUM
+    that gives the space back runs on its own connection, outside _CONN_LOCK.
+    """
+    with _CONN_LOCK:
+        conn = _get_connection()
+        if conn is None:
+            return
+        try:
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            if page_count * page_size <= CACHE_MAX_SIZE_MB * 1024 * 1024:
+                return
+            total = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            to_delete = max(1, int(total * CACHE_EVICT_FRACTION))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY created_at ASC LIMIT ?)",
+                (to_delete,),
+            )
+            conn.execute(
+                "DELETE FROM variant_cache WHERE rowid IN (SELECT rowid FROM variant_cache ORDER BY created_at ASC LIMIT ?)",
+                (to_delete,),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            log_message(f"Response cache trim failed: {e}", "warning")
+            return
+    try:
+        vacuum_conn = sqlite3.connect(_get_cache_path(), timeout=5)
+        try:
+            vacuum_conn.execute("VACUUM")
+            vacuum_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            vacuum_conn.close()
+    except sqlite3.Error as e:
+        log_message(f"Response cache vacuum failed: {e}", "warning")
+    log_message(f"Response cache trimmed: {to_delete} oldest entries removed", "info")
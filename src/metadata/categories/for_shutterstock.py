@@ -15,110 +15,88 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 # src/metadata/categories/for_shutterstock.py
+from src.metadata.categories.keyword_matcher import KeywordMatcher
+
+SHUTTERSTOCK_CATEGORIES_IMAGE = (
+    "Abstract", "Animals/Wildlife", "Arts", "Backgrounds/Textures", "Beauty/Fashion",
+    "Buildings/Landmarks", "Business/Finance", "Education", "Food and drink",
+    "Healthcare/Medical", "Industrial", "Nature", "Objects", "People", "Religion",
+    "Science", "Signs/Symbols", "Sports/Recreation", "Technology", "Transportation",
+)
+SHUTTERSTOCK_CATEGORIES_VIDEO = (
+    "Animals/Wildlife", "Arts", "Backgrounds/Textures", "Buildings/Landmarks",
+    "Business/Finance", "Education", "Food and drink", "Healthcare/Medical",
+    "Holidays", "Industrial", "Nature", "Objects", "People", "Religion",
+    "Science", "Signs/Symbols", "Sports/Recreation", "Technology", "Transportation",
+)
+SHUTTERSTOCK_CATEGORY_SET_IMAGE = frozenset(name.lower() for name in SHUTTERSTOCK_CATEGORIES_IMAGE)
+SHUTTERSTOCK_CATEGORY_SET_VIDEO = frozenset(name.lower() for name in SHUTTERSTOCK_CATEGORIES_VIDEO)
+_SHUTTERSTOCK_CANONICAL = {name.lower(): name for name in SHUTTERSTOCK_CATEGORIES_IMAGE + SHUTTERSTOCK_CATEGORIES_VIDEO}
+
+
+def normalize_shutterstock_category(name, is_video=False):
+    """Return the canonical category name, or "" when name is not an allowed category."""
+    key = (name or "").strip().lower()
+    allowed = SHUTTERSTOCK_CATEGORY_SET_VIDEO if is_video else SHUTTERSTOCK_CATEGORY_SET_IMAGE
+    if key in allowed:
+        return _SHUTTERSTOCK_CANONICAL[key]
+    return ""
+
+_SHUTTERSTOCK_MATCHER = KeywordMatcher({
+    "Abstract": {"abstract", "pattern", "texture", "design", "geometric", "shape", "minimal"},
+    "Animals/Wildlife": {"animal", "wildlife", "pet", "dog", "cat", "bird", "zoo", "fish", "insect"},
+    "Arts": {"art", "painting", "drawing", "sculpture", "artistic", "creative", "canvas"},
+    "Backgrounds/Textures": {"background", "texture", "pattern", "surface", "wallpaper", "backdrop"},
+    "Beauty/Fashion": {"beauty", "fashion", "cosmetic", "makeup", "model", "style", "glamour"},
+    "Buildings/Landmarks": {"building", "landmark", "architecture", "monument", "skyscraper", "tower"},
+    "Business/Finance": {"business", "finance", "office", "corporate", "professional", "meeting"},
+    "Celebrities": {"celebrity", "famous", "star", "actor", "actress", "singer", "performer"},
+    "Education": {"education", "school", "classroom", "student", "teacher", "learning", "study"},
+    "Food and drink": {"food", "drink", "meal", "beverage", "cuisine", "restaurant", "cooking"},
+    "Healthcare/Medical": {"health", "medical", "doctor", "hospital", "medicine", "healthcare"},
+    "Holidays": {"holiday", "celebration", "festival", "christmas", "party", "event", "decoration"},
+    "Industrial": {"industrial", "industry", "factory", "manufacturing", "machinery", "construction"},
+    "Interiors": {"interior", "room", "furniture", "home", "decoration", "house", "apartment"},
+    "Miscellaneous": {"miscellaneous", "various", "assorted", "diverse", "mixed", "random"},
+    "Nature": {"nature", "natural", "outdoor", "environment", "landscape", "scenic", "wilderness"},
+    "Objects": {"object", "item", "thing", "product", "tool", "device", "equipment"},
+    "Parks/Outdoor": {"park", "outdoor", "garden", "playground", "recreation", "field", "lawn"},
+    "People": {"people", "person", "human", "man", "woman", "child", "portrait", "face"},
+    "Religion": {"religion", "religious", "faith", "spiritual", "belief", "worship", "ceremony"},
+    "Science": {"science", "scientific", "research", "laboratory", "experiment", "chemistry"},
+    "Signs/Symbols": {"sign", "symbol", "icon", "logo", "emblem", "mark", "badge"},
+    "Sports/Recreation": {"sport", "recreation", "game", "fitness", "exercise", "competition", "athlete"},
+    "Technology": {"technology", "tech", "digital", "computer", "electronic", "device", "gadget"},
+    "Transportation": {"transportation", "vehicle", "car", "train", "airplane", "bus", "traffic"},
+    "Vintage": {"vintage", "retro", "old", "antique", "classic", "nostalgic", "historical"}
+})
 
 def map_to_shutterstock_category(title, description, tags):
+    best_category = _SHUTTERSTOCK_MATCHER.best_category(title, description, tags)
+    return best_category if best_category else ""
 
-    keywords = [tag.lower() for tag in tags]
-    title_lower = title.lower()
-    desc_lower = description.lower()
-    
-    categories = {
-        "Abstract": {"abstract", "pattern", "texture", "design", "geometric", "shape", "minimal"},
-        "Animals/Wildlife": {"animal", "wildlife", "pet", "dog", "cat", "bird", "zoo", "fish", "insect"},
-        "Arts": {"art", "painting", "drawing", "sculpture", "artistic", "creative", "canvas"},
-        "Backgrounds/Textures": {"background", "texture", "pattern", "surface", "wallpaper", "backdrop"},
-        "Beauty/Fashion": {"beauty", "fashion", "cosmetic", "makeup", "model", "style", "glamour"},
-        "Buildings/Landmarks": {"building", "landmark", "architecture", "monument", "skyscraper", "tower"},
-        "Business/Finance": {"business", "finance", "office", "corporate", "professional", "meeting"},
-        "Celebrities": {"celebrity", "famous", "star", "actor", "actress", "singer", "performer"},
-        "Education": {"education", "school", "classroom", "student", "teacher", "learning", "study"},
-        "Food and drink": {"food", "drink", "meal", "beverage", "cuisine", "restaurant", "cooking"},
-        "Healthcare/Medical": {"health", "medical", "doctor", "hospital", "medicine", "healthcare"},
-        "Holidays": {"holiday", "celebration", "festival", "christmas", "party", "event", "decoration"},
-        "Industrial": {"industrial", "industry", "factory", "manufacturing", "machinery", "construction"},
-        "Interiors": {"interior", "room", "furniture", "home", "decoration", "house", "apartment"},
-        "Miscellaneous": {"miscellaneous", "various", "assorted", "diverse", "mixed", "random"},
-        "Nature": {"nature", "natural", "outdoor", "environment", "landscape", "scenic", "wilderness"},
-        "Objects": {"object", "item", "thing", "product", "tool", "device", "equipment"},
-        "Parks/Outdoor": {"park", "outdoor", "garden", "playground", "recreation", "field", "lawn"},
-        "People": {"people", "person", "human", "man", "woman", "child", "portrait", "face"},
-        "Religion": {"religion", "religious", "faith", "spiritual", "belief", "worship", "ceremony"},
-        "Science": {"science", "scientific", "research", "laboratory", "experiment", "chemistry"},
-        "Signs/Symbols": {"sign", "symbol", "icon", "logo", "emblem", "mark", "badge"},
-        "Sports/Recreation": {"sport", "recreation", "game", "fitness", "exercise", "competition", "athlete"},
-        "Technology": {"technology", "tech", "digital", "computer", "electronic", "device", "gadget"},
-        "Transportation": {"transportation", "vehicle", "car", "train", "airplane", "bus", "traffic"},
-        "Vintage": {"vintage", "retro", "old", "antique", "classic", "nostalgic", "historical"}
-    }
-    
-    category_scores = {cat_name: 0 for cat_name in categories}
-    
-    for cat_name, cat_keywords in categories.items():
-        for kw in keywords:
-            if any(cat_kw in kw for cat_kw in cat_keywords):
-                category_scores[cat_name] += 3
-    
-    for cat_name, cat_keywords in categories.items():
-        if any(cat_kw in title_lower for cat_kw in cat_keywords):
-            category_scores[cat_name] += 5 
-    
-    for cat_name, cat_keywords in categories.items():
-        if any(cat_kw in desc_lower for cat_kw in cat_keywords):
-            category_scores[cat_name] += 1 
-    
-    best_category = max(category_scores.items(), key=lambda x: x[1])
-    
-    if best_category[1] == 0:
-        return ""
-    
-    return best_category[0]
+_SHUTTERSTOCK_VIDEO_MATCHER = KeywordMatcher({
+    "Animals/Wildlife": {"animal", "wildlife", "pet", "dog", "cat", "bird", "zoo", "fish", "insect"},
+    "Arts": {"art", "painting", "drawing", "sculpture", "artistic", "creative", "canvas"},
+    "Backgrounds/Textures": {"background", "texture", "pattern", "surface", "wallpaper", "backdrop"},
+    "Buildings/Landmarks": {"building", "landmark", "architecture", "monument", "skyscraper", "tower"},
+    "Business/Finance": {"business", "finance", "office", "corporate", "professional", "meeting"},
+    "Education": {"education", "school", "classroom", "student", "teacher", "learning", "study"},
+    "Food and drink": {"food", "drink", "meal", "beverage", "cuisine", "restaurant", "cooking"},
+    "Healthcare/Medical": {"health", "medical", "doctor", "hospital", "medicine", "healthcare"},
+    "Holidays": {"holiday", "celebration", "festival", "christmas", "party", "event", "decoration"},
+    "Industrial": {"industrial", "industry", "factory", "manufacturing", "machinery", "construction"},
+    "Nature": {"nature", "natural", "outdoor", "environment", "landscape", "scenic", "wilderness"},
+    "Objects": {"object", "item", "thing", "product", "tool", "device", "equipment"},
+    "People": {"people", "person", "human", "man", "woman", "child", "portrait", "face"},
+    "Religion": {"religion", "religious", "faith", "spiritual", "belief", "worship", "ceremony"},
+    "Science": {"science", "scientific", "research", "laboratory", "experiment", "chemistry"},
+    "Signs/Symbols": {"sign", "symbol", "icon", "logo", "emblem", "mark", "badge"},
+    "Sports/Recreation": {"sport", "recreation", "game", "fitness", "exercise", "competition", "athlete"},
+    "Technology": {"technology", "tech", "digital", "computer", "electronic", "device", "gadget"},
+    "Transportation": {"transportation", "vehicle", "car", "train", "airplane", "bus", "traffic"}
+})
 
 def map_to_shutterstock_category_video(title, description, tags):
-
-    keywords = [tag.lower() for tag in tags]
-    title_lower = title.lower()
-    desc_lower = description.lower()
-    
-    video_categories = {
-        "Animals/Wildlife": {"animal", "wildlife", "pet", "dog", "cat", "bird", "zoo", "fish", "insect"},
-        "Arts": {"art", "painting", "drawing", "sculpture", "artistic", "creative", "canvas"},
-        "Backgrounds/Textures": {"background", "texture", "pattern", "surface", "wallpaper", "backdrop"},
-        "Buildings/Landmarks": {"building", "landmark", "architecture", "monument", "skyscraper", "tower"},
-        "Business/Finance": {"business", "finance", "office", "corporate", "professional", "meeting"},
-        "Education": {"education", "school", "classroom", "student", "teacher", "learning", "study"},
-        "Food and drink": {"food", "drink", "meal", "beverage", "cuisine", "restaurant", "cooking"},
-        "Healthcare/Medical": {"health", "medical", "doctor", "hospital", "medicine", "healthcare"},
-        "Holidays": {"holiday", "celebration", "festival", "christmas", "party", "event", "decoration"},
-        "Industrial": {"industrial", "industry", "factory", "manufacturing", "machinery", "construction"},
-        "Nature": {"nature", "natural", "outdoor", "environment", "landscape", "scenic", "wilderness"},
-        "Objects": {"object", "item", "thing", "product", "tool", "device", "equipment"},
-        "People": {"people", "person", "human", "man", "woman", "child", "portrait", "face"},
-        "Religion": {"religion", "religious", "faith", "spiritual", "belief", "worship", "ceremony"},
-        "Science": {"science", "scientific", "research", "laboratory", "experiment", "chemistry"},
-        "Signs/Symbols": {"sign", "symbol", "icon", "logo", "emblem", "mark", "badge"},
-        "Sports/Recreation": {"sport", "recreation", "game", "fitness", "exercise", "competition", "athlete"},
-        "Technology": {"technology", "tech", "digital", "computer", "electronic", "device", "gadget"},
-        "Transportation": {"transportation", "vehicle", "car", "train", "airplane", "bus", "traffic"}
-    }
-    
-    category_scores = {cat_name: 0 for cat_name in video_categories}
-    
-    for cat_name, cat_keywords in video_categories.items():
-        for kw in keywords:
-            if any(cat_kw in kw for cat_kw in cat_keywords):
-                category_scores[cat_name] += 3
-    
-    for cat_name, cat_keywords in video_categories.items():
-        if any(cat_kw in title_lower for cat_kw in cat_keywords):
-            category_scores[cat_name] += 5 
-    
-    for cat_name, cat_keywords in video_categories.items():
-        if any(cat_kw in desc_lower for cat_kw in cat_keywords):
-            category_scores[cat_name] += 1 
-    
-    best_category = max(category_scores.items(), key=lambda x: x[1])
-    
-    if best_category[1] == 0:
-        return "Nature"
-    
-    return best_category[0]
\ No newline at end of file
+    best_category = _SHUTTERSTOCK_VIDEO_MATCHER.best_category(title, description, tags)
+    return best_category if best_category else "Nature"
@@ -0,0 +1,64 @@
+# RJ Auto Metadata
+# Copyright (C) 2025 Riiicil
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# src/metadata/categories/keyword_matcher.py
+import re
+
+TAG_WEIGHT = 3
+TITLE_WEIGHT = 5
+DESCRIPTION_WEIGHT = 1
+
+
+class KeywordMatcher:
+    """Scores categories by substring hits of their keywords in one regex pass per text.
+
+    All keywords go into a single lookahead alternation, longest first, so each
+    text position reports the longest keyword starting there. Every shorter
+    keyword matching at the same position is a prefix of that one, so its
+    categories are folded into the longest keyword's entry up front.
+    """
+
+    def __init__(self, categories):
+        self.names = tuple(categories)
+        owners = {}
+        for name, keywords in categories.items():
+            for keyword in keywords:
+                owners.setdefault(keyword, set()).add(name)
+        self._owners = {
+            keyword: frozenset().union(*(cats for other, cats in owners.items() if keyword.startswith(other)))
+            for keyword in owners
+        }
+        needles = sorted(owners, key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(map(re.escape, needles)) + "))")
+
+    def categories_in(self, text):
+        found = set()
+        for match in self._pattern.finditer(text):
+            found |= self._owners[match.group(1)]
+        return found
+
+    def best_category(self, title, description, tags):
+        """Return the highest scoring category name, or None when nothing matched."""
+        scores = dict.fromkeys(self.names, 0)
+        for tag in tags:
+            for name in self.categories_in(tag.lower()):
+                scores[name] += TAG_WEIGHT
+        for name in self.categories_in(title.lower()):
+            scores[name] += TITLE_WEIGHT
+        for name in self.categories_in(description.lower()):
+            scores[name] += DESCRIPTION_WEIGHT
+        best_name, best_score = max(scores.items(), key=lambda x: x[1])
+        return best_name if best_score else None
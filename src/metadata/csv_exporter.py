@@ -20,9 +20,9 @@ import re
 import threading
 import time
 from src.utils.logging import log_message
-from src.utils.file_utils import sanitize_csv_field, write_to_csv_thread_safe
+from src.utils.file_utils import sanitize_csv_field, write_to_csv_thread_safe, write_csv_rows
 from src.metadata.categories.for_adobestock import map_to_adobe_stock_category
-from src.metadata.categories.for_shutterstock import map_to_shutterstock_category, map_to_shutterstock_category_video
+from src.metadata.categories.for_shutterstock import map_to_shutterstock_category, map_to_shutterstock_category_video, normalize_shutterstock_category
 _csv_locks = {
     'adobe_stock': threading.Lock(),
     'shutterstock': threading.Lock(),
@@ -159,21 +159,15 @@ def write_123rf_csv_safe(csv_path, filename, description, keywords):
             return False
     with _csv_locks['123rf']:
         try:
-            file_exists = os.path.isfile(csv_path)
-            
-            with open(csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-                if not file_exists or os.path.getsize(csv_path) == 0:
-                    csvfile.write('oldfilename,"123rf_filename","description","keywords","country"\n')
-                    csvfile.flush() 
-                truncated_description = smart_truncate_description(description, max_length=200)
-                safe_filename = filename.replace('"', '""')
-                safe_description = truncated_description.replace('"', '""')
-                safe_keywords = keywords.replace('"', '""')
-                
-                csvfile.write(f'{safe_filename},"","{safe_description}","{safe_keywords}","ID"\n')
-                csvfile.flush()  
-                
-            return True
+            truncated_description = smart_truncate_description(description, max_length=200)
+            safe_filename = filename.replace('"', '""')
+            safe_description = truncated_description.replace('"', '""')
+            safe_keywords = keywords.replace('"', '""')
+            return write_csv_rows(
+                csv_path,
+                'oldfilename,"123rf_filename","description","keywords","country"\n',
+                [f'{safe_filename},"","{safe_description}","{safe_keywords}","ID"\n'],
+            )
             
         except Exception as e:
             log_message(f"Error writing to CSV 123RF: {e}")
@@ -189,23 +183,18 @@ def write_vecteezy_csv_safe(csv_path, filename, title, description, keywords):
             return False
     with _csv_locks['vecteezy']:
         try:
-            file_exists = os.path.isfile(csv_path)
+            truncated_title = smart_truncate_title(title, max_length=200)
+            truncated_description = smart_truncate_description(description, max_length=200)
             
-            with open(csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-                if not file_exists or os.path.getsize(csv_path) == 0:
-                    csvfile.write('Filename,Title,Description,Keywords,License,Id\n')
-                    csvfile.flush() 
-                truncated_title = smart_truncate_title(title, max_length=200)
-                truncated_description = smart_truncate_description(description, max_length=200)
-                
-                safe_filename = filename.replace('"', '""')
-                safe_title = truncated_title.replace('"', '""')
-                safe_description = truncated_description.replace('"', '""')
-                safe_keywords = keywords.replace('"', '""')
-                
-                csvfile.write(f'{safe_filename},"{safe_title}","{safe_description}","{safe_keywords}",pro,\n')
-                csvfile.flush()  
-            return True
+            safe_filename = filename.replace('"', '""')
+            safe_title = truncated_title.replace('"', '""')
+            safe_description = truncated_description.replace('"', '""')
+            safe_keywords = keywords.replace('"', '""')
+            return write_csv_rows(
+                csv_path,
+                'Filename,Title,Description,Keywords,License,Id\n',
+                [f'{safe_filename},"{safe_title}","{safe_description}","{safe_keywords}",pro,\n'],
+            )
             
         except Exception as e:
             log_message(f"Error writing to CSV Vecteezy: {e}")
@@ -222,28 +211,23 @@ def write_miri_canvas_csv_safe(csv_path, filename, title, keywords):
             return False
     with _csv_locks['miri_canvas']:
         try:
-            file_exists = os.path.isfile(csv_path)
+            base_filename = os.path.splitext(filename)[0]
+            safe_title = smart_truncate_title(str(title), max_length=100)
+            safe_title = re.sub(r'[^\w\s-]', '', safe_title)
             
-            with open(csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-                if not file_exists or os.path.getsize(csv_path) == 0:
-                    csvfile.write('fileName,"uniqueId","elementName","keywords","tier","contentType"\n')
-                    csvfile.flush() 
-                base_filename = os.path.splitext(filename)[0]
-                safe_title = smart_truncate_title(str(title), max_length=100)
-                safe_title = re.sub(r'[^\w\s-]', '', safe_title)
-                
-                if isinstance(keywords, list):
-                    safe_keywords = ','.join(keywords[:25])
-                else:
-                    safe_keywords = ','.join(str(keywords).split(',')[:25])
-                    
-                tier = 'Premium'
-                content_type = ''
-                unique_id = ''
+            if isinstance(keywords, list):
+                safe_keywords = ','.join(keywords[:25])
+            else:
+                safe_keywords = ','.join(str(keywords).split(',')[:25])
                 
-                csvfile.write(f'{base_filename},"{unique_id}","{safe_title}","{safe_keywords}","{tier}","{content_type}"\n')
-                csvfile.flush()  
-            return True
+            tier = 'Premium'
+            content_type = ''
+            unique_id = ''
+            return write_csv_rows(
+                csv_path,
+                'fileName,"uniqueId","elementName","keywords","tier","contentType"\n',
+                [f'{base_filename},"{unique_id}","{safe_title}","{safe_keywords}","{tier}","{content_type}"\n'],
+            )
             
         except Exception as e:
             log_message(f"Error writing to CSV Miri Canvas: {e}")
@@ -376,22 +360,9 @@ def write_to_platform_csvs_safe(csv_dir, filename, title, description, keywords,
         ss_category = ""
 
         def _normalize_ss_category(raw_ss, is_video_asset, title_text, desc_text, tags_list):
-            allowed_video = {
-                "Animals/Wildlife", "Arts", "Backgrounds/Textures", "Buildings/Landmarks",
-                "Business/Finance", "Education", "Food and drink", "Healthcare/Medical",
-                "Holidays", "Industrial", "Nature", "Objects", "People", "Religion",
-                "Science", "Signs/Symbols", "Sports/Recreation", "Technology", "Transportation"
-            }
-            allowed_image = {
-                "Abstract", "Animals/Wildlife", "Arts", "Backgrounds/Textures", "Beauty/Fashion",
-                "Buildings/Landmarks", "Business/Finance", "Education", "Food and drink",
-                "Healthcare/Medical", "Industrial", "Nature", "Objects", "People", "Religion",
-                "Science", "Signs/Symbols", "Sports/Recreation", "Technology", "Transportation"
-            }
-            allowed = allowed_video if is_video_asset else allowed_image
-            raw_clean = (raw_ss or "").strip()
-            if raw_clean in allowed:
-                return raw_clean
+            canonical = normalize_shutterstock_category(raw_ss, is_video_asset)
+            if canonical:
+                return canonical
             mapper = map_to_shutterstock_category_video if is_video_asset else map_to_shutterstock_category
             return mapper(title_text, desc_text, tags_list)
 
@@ -20,57 +20,297 @@ import time
 import sys
 import subprocess
 import re
+import json
+import atexit
 import platform
-from sqlalchemy import text
+import shutil
+import threading
+import traceback
+from functools import lru_cache
+from itertools import chain
 from src.utils.logging import log_message
+from src.utils.file_utils import fast_copy
 from src.api.gemini_api import check_stop_event, is_stop_requested
 
-def check_exiftool_exists():
-    try:
-        creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-        result = subprocess.run(["exiftool", "-ver"], check=True, capture_output=True, text=True, creationflags=creation_flags)
-        log_message(f"Exiftool found (version: {result.stdout.strip()}).")
-        global EXIFTOOL_PATH
-        EXIFTOOL_PATH = "exiftool"
-        return True
-    except (FileNotFoundError, subprocess.CalledProcessError):
+def _exiftool_candidates():
+    on_path = shutil.which("exiftool")
+    if on_path:
+        yield on_path
+    if getattr(sys, 'frozen', False):
+        if hasattr(sys, '_MEIPASS'):
+            base_dir = sys._MEIPASS
+        elif hasattr(sys, '_MEIPASS2'):
+             base_dir = sys._MEIPASS2
+        else:
+            base_dir = os.path.dirname(sys.executable)
+        log_message(f"Using base_dir for Nuitka/PyInstaller: {base_dir}")
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        base_dir = os.path.dirname(os.path.dirname(base_dir))
+    potential_paths = [
+        os.path.join(base_dir, "tools", "exiftool", "exiftool.exe"),
+        os.path.join(os.path.dirname(sys.executable), "tools", "exiftool", "exiftool.exe"),
+        os.path.join(os.environ.get('TEMP', ''), "_MEI", "tools", "exiftool", "exiftool.exe"),
+        os.path.abspath("tools/exiftool/exiftool.exe")
+    ]
+    for path in potential_paths:
+        normalized_path = os.path.normpath(path)
+        log_message(f"Checking exiftool at: {normalized_path}")
+        if os.path.exists(normalized_path):
+            yield normalized_path
+
+@lru_cache(maxsize=1)
+def _find_exiftool():
+    """Return (path, version) of the first candidate that answers -ver, or (None, None).
+
+    Candidates are filtered with a cheap existence check; only those are
+    probed, through the same stay_open daemon later used for writing.
+    """
+    for path in _exiftool_candidates():
+        daemon = get_exiftool_daemon(path)
         try:
-            if getattr(sys, 'frozen', False):
-                if hasattr(sys, '_MEIPASS'):
-                    base_dir = sys._MEIPASS
-                elif hasattr(sys, '_MEIPASS2'):
-                     base_dir = sys._MEIPASS2
+            return_code, version, _ = daemon.execute(["-ver"], timeout=15)
+        except Exception as e_test:
+            log_message(f"Found but failed execution: {path} - Error: {e_test}")
+            daemon.close()
+            continue
+        if return_code == 0 and version:
+            return path, version.strip()
+        log_message(f"Found but failed execution: {path} (code {return_code})")
+    return None, None
+
+def check_exiftool_exists(refresh=False):
+    global EXIFTOOL_PATH
+    if refresh:
+        _find_exiftool.cache_clear()
+    try:
+        path, version = _find_exiftool()
+    except Exception as e:
+        log_message(f"Unexpected error checking exiftool: {e}", "error")
+        return False
+    if path is None:
+        log_message("Error: 'exiftool' not found in expected location.", "error")
+        return False
+    EXIFTOOL_PATH = path
+    log_message(f"Exiftool found and valid at: {path} (version: {version})")
+    return True
+
+EXIFTOOL_PATH = None
+
+_WRITE_ARG_PREFIX = ("-overwrite_original", "-charset", "UTF8", "-codedcharacterset=utf8")
+_MINIMAL_ARG_PREFIX = ("-overwrite_original", "-charset", "UTF8")
+
+def _list_add_args(tag, values):
+    """'-Tag+=value' arguments for every value, built with str concatenation."""
+    return map((tag + "+=").__add__, values)
+
+_USE_POSIX_SPAWN = getattr(subprocess, "_USE_POSIX_SPAWN", False)
+
+class _Watchdog:
+    """Single background thread that kills exiftool commands hitting a stop request or deadline.
+
+    Callers block in a plain pipe read; only this thread wakes periodically,
+    and only while at least one command is in flight.
+    """
+
+    INTERVAL = 0.2
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._active = {}
+        self._thread = None
+
+    def watch(self, process, stop_event, timeout):
+        deadline = time.monotonic() + timeout if timeout else None
+        entry = [process, stop_event, deadline, None]
+        with self._cond:
+            self._active[id(entry)] = entry
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="exiftool-watchdog", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return entry
+
+    def release(self, entry):
+        """Stop watching entry; returns "stopped", "timeout" or None."""
+        with self._cond:
+            self._active.pop(id(entry), None)
+            return entry[3]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                self._cond.wait(self.INTERVAL)
+                entries = list(self._active.values())
+            now = time.monotonic()
+            force_stop = is_stop_requested()
+            for entry in entries:
+                process, stop_event, deadline, outcome = entry
+                if outcome is not None:
+                    continue
+                if force_stop or (stop_event is not None and stop_event.is_set()):
+                    entry[3] = "stopped"
+                elif deadline is not None and now > deadline:
+                    entry[3] = "timeout"
                 else:
-                    base_dir = os.path.dirname(sys.executable)
-                log_message(f"Using base_dir for Nuitka/PyInstaller: {base_dir}")
+                    continue
+                try: process.kill()
+                except Exception: pass
+
+_WATCHDOG = _Watchdog()
+
+# Allowed for a freshly started exiftool (Perl start-up, AV scans on Windows)
+# to answer its first command; per-write deadlines only start after that.
+EXIFTOOL_STARTUP_TIMEOUT = 60
+
+class ExifToolDaemon:
+    """A long-lived `exiftool -stay_open True -@ -` process fed one argument block per file.
+
+    Saves the Perl start-up cost that a fresh exiftool process pays for every
+    write. Commands are written to stdin and answers are read back up to the
+    `{readyN}` marker on stdout and the `-echo4` status marker on stderr.
+    """
+
+    def __init__(self, executable):
+        self.executable = executable
+        self._process = None
+        self._seq = 0
+        self.registered = False
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        if platform.system() == "Windows":
+            creation_flags, close_fds = subprocess.CREATE_NO_WINDOW, True
+        else:
+            # Descriptors opened by Python are non-inheritable already, so leaving
+            # close_fds off is safe and lets Popen launch through posix_spawn
+            # instead of forking the (large) GUI process.
+            creation_flags, close_fds = 0, not _USE_POSIX_SPAWN
+        self._process = subprocess.Popen(
+            [self.executable, "-stay_open", "True", "-@", "-", "-common_args", "-charset", "filename=UTF8"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            close_fds=close_fds,
+            creationflags=creation_flags
+        )
+
+    def close(self, force=False):
+        process = self._process
+        self._process = None
+        if process is None:
+            return
+        try:
+            if force:
+                process.kill()
             else:
-                base_dir = os.path.dirname(os.path.abspath(__file__))
-                base_dir = os.path.dirname(os.path.dirname(base_dir))
-            potential_paths = [
-                os.path.join(base_dir, "tools", "exiftool", "exiftool.exe"),
-                os.path.join(os.path.dirname(sys.executable), "tools", "exiftool", "exiftool.exe"),
-                os.path.join(os.environ.get('TEMP', ''), "_MEI", "tools", "exiftool", "exiftool.exe"),
-                os.path.abspath("tools/exiftool/exiftool.exe")
-            ]
-            for path in potential_paths:
-                normalized_path = os.path.normpath(path)
-                log_message(f"Checking exiftool at: {normalized_path}")
-                if os.path.exists(normalized_path):
-                    try:
-                         creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-                         test_result = subprocess.run([normalized_path, "-ver"], check=True, capture_output=True, text=True, creationflags=creation_flags)
-                         log_message(f"Exiftool found and valid at: {normalized_path} (version: {test_result.stdout.strip()})")
-                         EXIFTOOL_PATH = normalized_path
-                         return True
-                    except Exception as e_test:
-                         log_message(f"Found but failed execution: {normalized_path} - Error: {e_test}")
-                         continue
-            log_message("Error: 'exiftool' not found in expected location.", "error")
-            return False
-        except Exception as e:
-            log_message(f"Unexpected error checking exiftool: {e}", "error")
-            return False
-EXIFTOOL_PATH = None
+                process.stdin.write(b"-stay_open\nFalse\n")
+                process.stdin.flush()
+            process.wait(timeout=5)
+        except Exception:
+            try:
+                process.kill()
+                process.wait(timeout=1)
+            except Exception: pass
+        for stream in (process.stdin, process.stdout, process.stderr):
+            try: stream.close()
+            except Exception: pass
+
+    @staticmethod
+    def _read_until(stream, marker):
+        buffer = bytearray()
+        fd = stream.fileno()
+        while not buffer.rstrip().endswith(marker):
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise BrokenPipeError("exiftool exited unexpectedly")
+            buffer += chunk
+        return bytes(buffer)
+
+    def execute(self, args, stop_event=None, timeout=None):
+        """Run one command; returns (return_code, stdout, stderr), or return_code None when stopped."""
+        if any("\n" in arg or "\r" in arg for arg in args):
+            raise ValueError("exiftool arguments cannot contain line breaks")
+        if not self.running:
+            self.start()
+            if args != ["-ver"]:
+                return_code, _, _ = self.execute(["-ver"], stop_event, EXIFTOOL_STARTUP_TIMEOUT)
+                if return_code is None:
+                    return None, "", ""
+        self._seq += 1
+        ready = f"{{ready{self._seq}}}".encode()
+        post = f"=post{self._seq}".encode()
+        block = "\n".join(args) + f"\n-echo4\n=${{status}}=post{self._seq}\n-execute{self._seq}\n"
+        process = self._process
+        watch = _WATCHDOG.watch(process, stop_event, timeout)
+        try:
+            process.stdin.write(block.encode("utf-8"))
+            process.stdin.flush()
+            stdout = self._read_until(process.stdout, ready)
+            stderr = self._read_until(process.stderr, post)
+        except (BrokenPipeError, OSError, ValueError):
+            interrupted = _WATCHDOG.release(watch)
+            self.close(force=True)
+            if interrupted == "stopped":
+                return None, "", ""
+            if interrupted:
+                raise subprocess.TimeoutExpired(self.executable, timeout)
+            raise
+        _WATCHDOG.release(watch)
+        # Markers are stripped on the raw bytes; only what is left gets decoded,
+        # which for a successful write is a single short line.
+        stdout = stdout[:stdout.rfind(ready)].strip()
+        post_start = stderr.rfind(post)
+        status_start = stderr.rfind(b"=", 0, post_start)
+        status_bytes = stderr[status_start + 1:post_start]
+        stderr = stderr[:status_start].strip()
+        stdout = stdout.decode("utf-8", "replace") if stdout else ""
+        stderr = stderr.decode("utf-8", "replace") if stderr else ""
+        if status_bytes.isdigit():
+            return_code = int(status_bytes)
+        else:
+            return_code = 1 if "Error" in stderr else 0
+        return return_code, stdout, stderr
+
+_DAEMON_LOCAL = threading.local()
+_DAEMONS = []
+_DAEMONS_LOCK = threading.Lock()
+
+def get_exiftool_daemon(executable=None):
+    """Return the calling thread's exiftool daemon, (re)creating it when the path changes."""
+    executable = executable or EXIFTOOL_PATH
+    daemon = getattr(_DAEMON_LOCAL, "daemon", None)
+    if daemon is None or daemon.executable != executable:
+        if daemon is not None:
+            daemon.close()
+        daemon = ExifToolDaemon(executable)
+        _DAEMON_LOCAL.daemon = daemon
+    if not daemon.registered:
+        # Also re-registers a daemon released by close_exiftool_daemons() at the
+        # end of a run, so the next run's process is still closed at exit.
+        with _DAEMONS_LOCK:
+            _DAEMONS.append(daemon)
+            daemon.registered = True
+    return daemon
+
+def run_exiftool(args, stop_event=None, timeout=None):
+    """Single entry point for image, video and probe commands on the thread's daemon."""
+    return get_exiftool_daemon().execute(args, stop_event, timeout)
+
+@atexit.register
+def close_exiftool_daemons():
+    with _DAEMONS_LOCK:
+        daemons = list(_DAEMONS)
+        _DAEMONS.clear()
+        for daemon in daemons:
+            daemon.registered = False
+    for daemon in daemons:
+        daemon.close()
 
 def smart_truncate_title_for_metadata(title, max_length=200):
     if not title:
@@ -104,6 +344,16 @@ def sanitize_metadata_text(text, max_length=None):
         sanitized = sanitized[:max_length].strip()
     return sanitized
 
+def _truncate_utf8(text, max_bytes):
+    """Cut text to at most max_bytes of UTF-8 without splitting a character.
+
+    IPTC limits (ObjectName/Keywords 64, Caption-Abstract 2000) count bytes,
+    not code points, so CJK or accented text sliced by length can overflow.
+    """
+    if text.isascii():
+        return text[:max_bytes]
+    return text.encode("utf-8")[:max_bytes].decode("utf-8", "ignore")
+
 def sanitize_keyword(keyword):
     if not keyword:
         return ""
@@ -113,6 +363,35 @@ def sanitize_keyword(keyword):
     sanitized = sanitized.strip()[:64] 
     return sanitized if sanitized else None
 
+DEFAULT_KEYWORD_COUNT = 49
+
+def parse_keyword_count(keyword_count):
+    if keyword_count == DEFAULT_KEYWORD_COUNT:
+        return DEFAULT_KEYWORD_COUNT
+    try:
+        max_kw = int(keyword_count.strip() if isinstance(keyword_count, str) else keyword_count)
+    except Exception as e:
+        log_message(f"Warning: Invalid keyword_count '{keyword_count}', using default {DEFAULT_KEYWORD_COUNT}: {e}", "warning")
+        return DEFAULT_KEYWORD_COUNT
+    if max_kw < 1 or max_kw > 100:
+        return DEFAULT_KEYWORD_COUNT
+    return max_kw
+
+def clean_tags(tags, max_kw):
+    """Sanitize, de-duplicate and cap tags in one pass, stopping at max_kw."""
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    seen = set()
+    cleaned_tags = []
+    for tag in tags or ():
+        sanitized_tag = sanitize_keyword(str(tag))
+        if sanitized_tag and sanitized_tag not in seen:
+            seen.add(sanitized_tag)
+            cleaned_tags.append(sanitized_tag)
+            if len(cleaned_tags) >= max_kw:
+                break
+    return cleaned_tags
+
 def get_file_format_metadata_support(file_path):
     if not file_path:
         return {'xmp': True, 'iptc': True, 'strategy': 'xmp_first', 'tags': {}} 
@@ -196,65 +475,17 @@ def get_file_format_metadata_support(file_path):
     }
     return format_support.get(ext, {'xmp': True, 'iptc': True, 'strategy': 'xmp_first', 'tags': {}})  # Default to XMP first if unknown
 
-def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
-    title = metadata.get('title', '')
-    description = metadata.get('description', '')
-    tags = metadata.get('tags', [])
-    keyword_count = metadata.get('keyword_count', 49)
-    try:
-        if isinstance(keyword_count, str):
-            max_kw = int(keyword_count.strip())
-        else:
-            max_kw = int(keyword_count)
-        if max_kw < 1: max_kw = 49
-        if max_kw > 100: max_kw = 49 
-    except Exception as e:
-        log_message(f"Warning: Invalid keyword_count '{keyword_count}', using default 49: {e}", "warning")
-        max_kw = 49
-    if isinstance(tags, str):
-        raw_tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
-    else:
-        raw_tags = [str(tag).strip() for tag in tags if str(tag).strip()]
-    cleaned_tags = []
-    for tag in raw_tags:
-        sanitized_tag = sanitize_keyword(tag)
-        if sanitized_tag and sanitized_tag not in cleaned_tags:  
-            cleaned_tags.append(sanitized_tag)
-    cleaned_tags = cleaned_tags[:max_kw]
-    if stop_event.is_set() or is_stop_requested():
-        log_message("Process stopped before writing EXIF.")
-        return False, "stopped"
-    if not os.path.exists(output_path):
-        try:
-            import shutil
-            shutil.copy2(image_path, output_path)
-        except Exception as e:
-            log_message(f"Failed to copy file '{os.path.basename(image_path)}' to output: {e}")
-            return False, "copy_failed"
-    if stop_event.is_set() or is_stop_requested():
-        log_message("Process stopped after copying file.")
-        return False, "stopped"
-    if not title and not description and not cleaned_tags:
-        log_message("Info: No valid metadata to write to EXIF.")
-        return True, "no_metadata"
-    if not EXIFTOOL_PATH:
-        log_message("Error: Exiftool path not set.", "error")
-        return True, "exiftool_not_found"
-    format_support = get_file_format_metadata_support(output_path)
-    strategy = format_support.get('strategy', 'xmp_first')
-    available_tags = format_support.get('tags', {})
-    processed_title = smart_truncate_title_for_metadata(title, 200) if title else ""
-    processed_description = sanitize_metadata_text(description, 2000) if description else ""
-    exiftool_cmd = EXIFTOOL_PATH
-    clear_command = [exiftool_cmd, "-overwrite_original"]
+def build_image_write_args(output_path, strategy, available_tags, processed_title, processed_description, cleaned_tags):
+    """exiftool arguments (without the target path) that replace an image's title, description and keywords."""
+    clear_args = []
     if 'xmp' in available_tags:
-        clear_command.extend([
+        clear_args.extend([
             "-XMP-dc:Title=",
             "-XMP-dc:Description=", 
             "-XMP-dc:Subject="
         ])
     if 'iptc' in available_tags:
-        clear_command.extend([
+        clear_args.extend([
             "-IPTC:ObjectName=",
             "-IPTC:Caption-Abstract=",
             "-IPTC:Keywords="
@@ -262,19 +493,19 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
     if 'native' in available_tags:
         ext = os.path.splitext(output_path)[1].lower()
         if ext == '.eps':
-            clear_command.extend([
+            clear_args.extend([
                 "-PostScript:Title=",
                 "-PostScript:Subject=",
                 "-PostScript:Keywords="
             ])
         elif ext == '.png':
-            clear_command.extend([
+            clear_args.extend([
                 "-PNG:Title=",
                 "-PNG:Description=",
                 "-PNG:Subject="
             ])
     if strategy == 'eps_simple':
-        clear_command.extend([
+        clear_args.extend([
             "-Title=",
             "-ObjectName=", 
             "-Keywords=",
@@ -289,7 +520,7 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
             "-PostScript:Keywords="
         ])
     if strategy == 'xmp_only':
-        clear_command.extend([
+        clear_args.extend([
             "-XMP-dc:Title=",
             "-XMP-dc:Description=", 
             "-XMP-dc:Subject=",
@@ -303,7 +534,7 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
             "-Subject="
         ])
     if strategy == 'eps_comprehensive':
-        clear_command.extend([
+        clear_args.extend([
             "-PostScript:Title=",
             "-PostScript:Subject=", 
             "-PostScript:Keywords=",
@@ -318,32 +549,10 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
             "-Description=",
             "-Keywords="
         ])
-    clear_command.append(output_path)
-    try:
-        if stop_event.is_set() or is_stop_requested():
-            return False, "stopped"
-        clearing_fields = [arg for arg in clear_command if '=' in arg and arg.endswith('=')]
-        creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-        result = subprocess.run(clear_command, check=False, capture_output=True, text=True,
-                                encoding='utf-8', errors='replace', timeout=30,
-                                creationflags=creation_flags)
-        if result.returncode == 0:
-            log_message(f"Old metadata successfully cleared from {os.path.basename(output_path)}")
-        else:
-             log_message(f"Warning: Failed to clean old metadata (Code: {result.returncode}). Error: {result.stderr.strip()}", "warning")
-    except subprocess.TimeoutExpired:
-         log_message(f"Warning: Timeout cleaning old metadata.", "warning")
-    except Exception as e:
-        log_message(f"Warning: Failed to clean old metadata: {e}", "warning")
-    if stop_event.is_set() or is_stop_requested():
-        log_message("Process stopped after trying to clean metadata.")
-        return False, "stopped"
-    command = [
-        exiftool_cmd,
-        "-overwrite_original",
-        "-charset", "UTF8",
-        "-codedcharacterset=utf8"
-    ]
+    # Clearing assignments go first in the same command: exiftool applies them
+    # before the new values, so the file is only rewritten once.
+    command = list(_WRITE_ARG_PREFIX)
+    command.extend(clear_args)
     if strategy == 'native_first':
         if 'native' in available_tags and processed_title:
             command.append(f"{available_tags['native']['title']}={processed_title}")
@@ -358,8 +567,7 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
             if processed_description:
                 command.append(f"{available_tags['xmp']['description']}={processed_description}")
             if cleaned_tags:
-                for tag in cleaned_tags:
-                    command.append(f"{available_tags['xmp']['keywords']}+={tag}")
+                command.extend(_list_add_args(available_tags['xmp']['keywords'], cleaned_tags))
     elif strategy == 'dual_format':
         if 'xmp' in available_tags:
             if processed_title:
@@ -367,8 +575,7 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
             if processed_description:
                 command.append(f"{available_tags['xmp']['description']}={processed_description}")
             if cleaned_tags:
-                for tag in cleaned_tags:
-                    command.append(f"{available_tags['xmp']['keywords']}+={tag}")
+                command.extend(_list_add_args(available_tags['xmp']['keywords'], cleaned_tags))
         if 'native' in available_tags:
             if processed_title:
                 command.append(f"{available_tags['native']['title']}={processed_title}")
@@ -385,20 +592,18 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
                 command.append(f"{available_tags['xmp']['description']}={processed_description}")
             if cleaned_tags:
                 command.append(f"{available_tags['xmp']['keywords']}=")
-                for tag in cleaned_tags:
-                    command.append(f"{available_tags['xmp']['keywords']}+={tag}")
+                command.extend(_list_add_args(available_tags['xmp']['keywords'], cleaned_tags))
         if 'iptc' in available_tags:
             if processed_title:
-                iptc_title = processed_title[:64] if len(processed_title) > 64 else processed_title
+                iptc_title = _truncate_utf8(processed_title, 64)
                 command.append(f"{available_tags['iptc']['title']}={iptc_title}")
             if processed_description:
-                iptc_description = processed_description[:2000] if len(processed_description) > 2000 else processed_description
+                iptc_description = _truncate_utf8(processed_description, 2000)
                 command.append(f"{available_tags['iptc']['description']}={iptc_description}")
             if cleaned_tags:
                 command.append(f"{available_tags['iptc']['keywords']}=")
-                for tag in cleaned_tags:
-                    safe_tag = tag[:64] if len(tag) > 64 else tag
-                    command.append(f"{available_tags['iptc']['keywords']}+={safe_tag}")
+                iptc_keyword_prefix = available_tags['iptc']['keywords'] + "+="
+                command.extend(iptc_keyword_prefix + _truncate_utf8(tag, 64) for tag in cleaned_tags)
     elif strategy == 'xmp_only':
         command.extend([
             "-XMP-dc:Title=", "-XMP-dc:Description=", "-XMP-dc:Subject=",
@@ -412,8 +617,7 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
                 command.append(f"{available_tags['xmp']['description']}={processed_description}")
             if cleaned_tags:
                 command.append(f"{available_tags['xmp']['keywords']}=")
-                for tag in cleaned_tags:
-                    command.append(f"{available_tags['xmp']['keywords']}+={tag}")
+                command.extend(_list_add_args(available_tags['xmp']['keywords'], cleaned_tags))
                 log_message(f"XMP-only: Added {len(cleaned_tags)} keywords after clean reset", "debug")
     elif strategy == 'eps_simple':
         command.extend([
@@ -423,17 +627,16 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
         ])
         if processed_title:
             truncated_title = processed_title[:160].strip()
-            command.extend([f'-Title={truncated_title}', f'-ObjectName={truncated_title}'])
-            command.append(f'-IPTC:Headline={truncated_title[:64]}')
+            iptc_title = _truncate_utf8(truncated_title, 64)
+            command.extend([f'-Title={truncated_title}', f'-ObjectName={iptc_title}'])
+            command.append(f'-IPTC:Headline={iptc_title}')
         if processed_description:
             command.extend([f'-XPComment={processed_description}', f'-UserComment={processed_description}', f'-ImageDescription={processed_description}'])
-            iptc_desc = processed_description[:2000] if len(processed_description) > 2000 else processed_description
+            iptc_desc = _truncate_utf8(processed_description, 2000)
             command.append(f'-IPTC:Caption-Abstract={iptc_desc}')
         if cleaned_tags:
             command.extend(["-Keywords=", "-Subject="])
-            for tag in cleaned_tags:
-                command.append(f"-Keywords+={tag}")
-                command.append(f"-Subject+={tag}")
+            command.extend(chain.from_iterable(("-Keywords+=" + tag, "-Subject+=" + tag) for tag in cleaned_tags))
     elif strategy == 'eps_comprehensive':
         if 'postscript' in available_tags:
             if processed_title:
@@ -445,18 +648,17 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
                 command.append(f"{available_tags['postscript']['keywords']}={keywords_str}")
         if 'iptc' in available_tags:
             if processed_title:
-                iptc_title = processed_title[:64] if len(processed_title) > 64 else processed_title
+                iptc_title = _truncate_utf8(processed_title, 64)
                 command.append(f"{available_tags['iptc']['title']}={iptc_title}")
                 if 'headline' in available_tags['iptc']:
                     command.append(f"{available_tags['iptc']['headline']}={iptc_title}")
             if processed_description:
-                iptc_description = processed_description[:2000] if len(processed_description) > 2000 else processed_description
+                iptc_description = _truncate_utf8(processed_description, 2000)
                 command.append(f"{available_tags['iptc']['description']}={iptc_description}")
             if cleaned_tags:
                 command.append(f"{available_tags['iptc']['keywords']}=")
-                for tag in cleaned_tags:
-                    safe_tag = tag[:64] if len(tag) > 64 else tag
-                    command.append(f"{available_tags['iptc']['keywords']}+={safe_tag}")
+                iptc_keyword_prefix = available_tags['iptc']['keywords'] + "+="
+                command.extend(iptc_keyword_prefix + _truncate_utf8(tag, 64) for tag in cleaned_tags)
         if 'exif' in available_tags:
             if processed_title:
                 command.append(f"{available_tags['exif']['title']}={processed_title}")
@@ -487,96 +689,152 @@ def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
         if processed_description:
             command.append(f'-XMP-dc:Description={processed_description}')
         if cleaned_tags:
-            for tag in cleaned_tags:
-                command.append(f'-XMP-dc:Subject+={tag}')
-    command.append(output_path)
-    exiftool_process = None
+            command.extend(_list_add_args("-XMP-dc:Subject", cleaned_tags))
+    return command
+
+_PROBE_TAGS = ("-XMP-dc:Title", "-XMP-dc:Description", "-XMP-dc:Subject",
+               "-IPTC:ObjectName", "-IPTC:Caption-Abstract", "-IPTC:Keywords")
+
+def _as_text_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return [str(value)]
+
+def _metadata_unchanged(path, title, description, tags, stop_event):
+    """True when the XMP/IPTC fields of path already hold exactly what would be written."""
     try:
-        if stop_event.is_set() or is_stop_requested():
+        return_code, stdout, _ = run_exiftool(["-j", *_PROBE_TAGS, path], stop_event, timeout=30)
+        if return_code != 0:
+            return False
+        current = json.loads(stdout)[0]
+    except Exception:
+        return False
+    expected = {
+        "Title": [title] if title else [],
+        "Description": [description] if description else [],
+        "Subject": list(tags),
+        "ObjectName": [_truncate_utf8(title, 64)] if title else [],
+        "Caption-Abstract": [_truncate_utf8(description, 2000)] if description else [],
+        "Keywords": [_truncate_utf8(tag, 64) for tag in tags],
+    }
+    return all(_as_text_list(current.get(key)) == value for key, value in expected.items())
+
+EXIFTOOL_TIMEOUT_MIN = 5
+EXIFTOOL_TIMEOUT_MAX = 300
+EXIFTOOL_BYTES_PER_SECOND = 20 * 1024 * 1024
+
+def exiftool_timeout(path):
+    """Seconds to allow a write on path: 5s plus 1s per 20 MB, capped at 5 minutes."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 30
+    return max(EXIFTOOL_TIMEOUT_MIN, min(EXIFTOOL_TIMEOUT_MAX, size / EXIFTOOL_BYTES_PER_SECOND + EXIFTOOL_TIMEOUT_MIN))
+
+def _discard_output(output_path):
+    # A partial file left behind would pass as an existing output next run
+    try:
+        os.remove(output_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log_message(f"Failed to remove incomplete output '{os.path.basename(output_path)}': {e}")
+
+def _copy_to_output(image_path, output_path, replace=False):
+    try:
+        if replace and os.path.exists(output_path):
+            os.remove(output_path)
+        fast_copy(image_path, output_path)
+        return True
+    except Exception as e:
+        log_message(f"Failed to copy file '{os.path.basename(image_path)}' to output: {e}")
+        _discard_output(output_path)
+        return False
+
+def write_exif_with_exiftool(image_path, output_path, metadata, stop_event):
+    stop_set = stop_event.is_set
+    title = metadata.get('title', '')
+    description = metadata.get('description', '')
+    tags = metadata.get('tags', [])
+    max_kw = parse_keyword_count(metadata.get('keyword_count', DEFAULT_KEYWORD_COUNT))
+    cleaned_tags = clean_tags(tags, max_kw)
+    if stop_set() or is_stop_requested():
+        log_message("Process stopped before writing EXIF.")
+        return False, "stopped"
+    try:
+        in_place = os.path.samefile(image_path, output_path)
+    except OSError:
+        in_place = False
+    # A missing output is created by exiftool itself with -o, which reads the
+    # source once and writes the new file once instead of copy + rewrite.
+    # Every path that does not end in a successful write copies it instead.
+    write_to_new = not in_place and not os.path.exists(output_path)
+    if not title and not description and not cleaned_tags:
+        log_message("Info: No valid metadata to write to EXIF.")
+        if write_to_new and not _copy_to_output(image_path, output_path):
+            return False, "copy_failed"
+        return True, "no_metadata"
+    if not EXIFTOOL_PATH:
+        log_message("Error: Exiftool path not set.", "error")
+        if write_to_new and not _copy_to_output(image_path, output_path):
+            return False, "copy_failed"
+        return True, "exiftool_not_found"
+    output_name = os.path.basename(output_path)
+    format_support = get_file_format_metadata_support(output_path)
+    strategy = format_support.get('strategy', 'xmp_first')
+    available_tags = format_support.get('tags', {})
+    processed_title = smart_truncate_title_for_metadata(title, 200) if title else ""
+    processed_description = sanitize_metadata_text(description, 2000) if description else ""
+    if in_place and strategy == 'xmp_first' and 'xmp' in available_tags and 'iptc' in available_tags:
+        if _metadata_unchanged(output_path, processed_title, processed_description, cleaned_tags, stop_event):
+            log_message(f"Metadata already up to date in {output_name}")
+            return True, "exif_ok"
+    command = build_image_write_args(output_path, strategy, available_tags, processed_title, processed_description, cleaned_tags)
+    if write_to_new:
+        command.extend(("-o", output_path, image_path))
+    else:
+        command.append(output_path)
+    status = "exif_failed"
+    try:
+        if stop_set() or is_stop_requested():
             log_message("Process stopped before writing new metadata.")
             return False, "stopped"
-        creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-        exiftool_process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding='utf-8',
-            errors='replace',
-            creationflags=creation_flags
-        )
-        while exiftool_process.poll() is None:
-            if stop_event.is_set() or is_stop_requested():
-                log_message("Stopping running exiftool process.")
-                try:
-                    exiftool_process.terminate()
-                    time.sleep(0.5)
-                    if exiftool_process.poll() is None:
-                        exiftool_process.kill()
-                except Exception as kill_e:
-                     log_message(f"Error stopping exiftool: {kill_e}")
-                return False, "stopped"
-            time.sleep(0.1)
-        stdout, stderr = exiftool_process.communicate()
-        return_code = exiftool_process.returncode
+        return_code, stdout, stderr = run_exiftool(command, stop_event, timeout=exiftool_timeout(image_path if write_to_new else output_path))
+        if return_code is None:
+            log_message("Stopping running exiftool process.")
+            if write_to_new:
+                _discard_output(output_path)
+            return False, "stopped"
         if return_code == 0:
-            if stdout and "1 image files updated" in stdout:
-                 log_message(f"Metadata successfully written to {os.path.basename(output_path)}")
+            if "1 image files updated" in stdout or "1 image files created" in stdout:
+                log_message("Metadata successfully written to %s", "debug", output_name)
             else:
-                 log_message(f"Metadata written (return code 0, output: {stdout.strip()})")
-            if stderr:
-                 pass
+                log_message("Metadata written (return code 0, output: %s)", "debug", stdout)
             return True, "exif_ok"
         else:
-            log_message(f"Failed to write metadata (exit code {return_code}) on {os.path.basename(output_path)}")
-            if stderr:
-                pass
-            if stdout:
-                 pass
-            return True, "exif_failed"
+            log_message(f"Failed to write metadata (exit code {return_code}) on {output_name}: {stderr or stdout}")
     except subprocess.TimeoutExpired:
-        log_message(f"Error: Exiftool timeout processing {os.path.basename(output_path)}")
-        if exiftool_process and exiftool_process.poll() is None:
-            try: exiftool_process.kill()
-            except: pass
-        return True, "exif_failed"
+        log_message(f"Error: Exiftool timeout processing {output_name}")
     except FileNotFoundError:
         log_message("Error: 'exiftool' not found during execution.", "error")
-        return True, "exiftool_not_found"
+        status = "exiftool_not_found"
     except Exception as e:
         log_message(f"Error running exiftool: {e}", "error")
-        if exiftool_process and exiftool_process.poll() is None:
-             try: exiftool_process.kill()
-             except: pass
-        import traceback
         log_message(f"Traceback: {traceback.format_exc()}", "error")
-        return True, "exif_failed"
+    if write_to_new and not _copy_to_output(image_path, output_path, replace=True):
+        return False, "copy_failed"
+    return True, status
 
 def write_exif_to_video(input_path, output_path, metadata, stop_event):
     title = metadata.get('title', '')
     description = metadata.get('description', '')
     tags = metadata.get('tags', [])
-    keyword_count = metadata.get('keyword_count', 49)
-    try:
-        if isinstance(keyword_count, str):
-            max_kw = int(keyword_count.strip())
-        else:
-            max_kw = int(keyword_count)
-        if max_kw < 1: max_kw = 49
-        if max_kw > 100: max_kw = 49  
-    except Exception as e:
-        max_kw = 49
-    if isinstance(tags, str):
-        raw_tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
-    else:
-        raw_tags = [str(tag).strip() for tag in tags if str(tag).strip()]
-    cleaned_tags = []
-    for tag in raw_tags:
-        sanitized_tag = sanitize_keyword(tag)
-        if sanitized_tag and sanitized_tag not in cleaned_tags:  
-            cleaned_tags.append(sanitized_tag)
-    cleaned_tags = cleaned_tags[:max_kw]
-    if len(cleaned_tags) > 0:
-        log_message(f"Video keywords processed: {len(cleaned_tags)}/{max_kw} keywords will be embedded", "debug")
+    max_kw = parse_keyword_count(metadata.get('keyword_count', DEFAULT_KEYWORD_COUNT))
+    cleaned_tags = clean_tags(tags, max_kw)
+    if cleaned_tags:
+        log_message("Video keywords processed: %d/%d keywords will be embedded", "debug", len(cleaned_tags), max_kw)
     if stop_event.is_set() or is_stop_requested():
         log_message("Process stopped before writing metadata to video.")
         return False, "stopped"
@@ -592,14 +850,9 @@ def write_exif_to_video(input_path, output_path, metadata, stop_event):
     processed_title = smart_truncate_title_for_metadata(title, 200) if title else ""
     processed_description = sanitize_metadata_text(description, 200) if description else ""
     format_support = get_file_format_metadata_support(output_path)
-    log_message(f"Video format support for {os.path.splitext(output_path)[1]}: XMP={format_support['xmp']}, IPTC={format_support['iptc']}")
-    exiftool_cmd = EXIFTOOL_PATH
-    command = [
-        exiftool_cmd,
-        "-overwrite_original",
-        "-charset", "UTF8",
-        "-codedcharacterset=utf8"
-    ]
+    log_message("Video format support for %s: XMP=%s, IPTC=%s", "debug",
+                os.path.splitext(output_path)[1], format_support['xmp'], format_support['iptc'])
+    command = list(_WRITE_ARG_PREFIX)
     if processed_title:
         command.extend([
             f'-Title={processed_title}',
@@ -630,86 +883,38 @@ def write_exif_to_video(input_path, output_path, metadata, stop_event):
     return _execute_video_exiftool_command(command, output_path, stop_event, processed_title, processed_description, cleaned_tags[:49] if cleaned_tags else [])
 
 def _execute_video_exiftool_command(command, output_path, stop_event, title, description, tags):
-    exiftool_process = None
     try:
         if stop_event.is_set() or is_stop_requested():
             log_message("Process stopped before writing metadata to video.")
             return False, "stopped"
-        
-        creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-        exiftool_process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding='utf-8',
-            errors='replace',
-            creationflags=creation_flags
-        )
 
-        timeout_seconds = 45
-        start_time = time.time()
-        
-        while exiftool_process.poll() is None:
-            if stop_event.is_set() or is_stop_requested():
-                log_message("Stopping exiftool process for video.")
-                try:
-                    exiftool_process.terminate()
-                    time.sleep(0.5)
-                    if exiftool_process.poll() is None:
-                        exiftool_process.kill()
-                except Exception as kill_e:
-                     log_message(f"Error stopping exiftool for video: {kill_e}")
-                return False, "stopped"
-            
-            if time.time() - start_time > timeout_seconds:
-                log_message(f"Exiftool timeout ({timeout_seconds}s) reached for video. Trying minimal fallback.")
-                try:
-                    exiftool_process.terminate()
-                    time.sleep(1)
-                    if exiftool_process.poll() is None:
-                        exiftool_process.kill()
-                        time.sleep(0.5)
-                except Exception as timeout_e:
-                    log_message(f"Error terminating timed-out exiftool process: {timeout_e}")
-                
-                return _try_minimal_video_metadata(output_path, stop_event, title, description)
-            
-            time.sleep(0.1)
-
-        stdout, stderr = exiftool_process.communicate()
-        return_code = exiftool_process.returncode
+        timeout_seconds = exiftool_timeout(output_path)
+        return_code, stdout, stderr = run_exiftool(command, stop_event, timeout=timeout_seconds)
+        if return_code is None:
+            log_message("Stopping exiftool process for video.")
+            return False, "stopped"
 
         if return_code == 0:
             return True, "exif_ok"
         else:
+            log_message(f"Video metadata write failed (exit code {return_code}): {stderr or stdout}")
             return _try_minimal_video_metadata(output_path, stop_event, title, description)
 
     except subprocess.TimeoutExpired:
-        log_message(f"Error: Exiftool timeout processing video {os.path.basename(output_path)}")
-        if exiftool_process and exiftool_process.poll() is None:
-            try: exiftool_process.kill()
-            except: pass
+        log_message(f"Exiftool timeout reached for video {os.path.basename(output_path)}. Trying minimal fallback.")
         return _try_minimal_video_metadata(output_path, stop_event, title, description)
     except FileNotFoundError:
         log_message("Error: 'exiftool' not found during video execution.", "error")
         return True, "exiftool_not_found"
     except Exception as e:
         log_message(f"Error running exiftool for video: {e}", "error")
-        if exiftool_process and exiftool_process.poll() is None:
-             try: exiftool_process.kill()
-             except: pass
-        import traceback
         log_message(f"Traceback: {traceback.format_exc()}", "error")
         return True, "exif_failed"
 
 def _try_minimal_video_metadata(output_path, stop_event, title, description):
     if stop_event.is_set() or is_stop_requested():
         return False, "stopped"
-    minimal_command = [
-        EXIFTOOL_PATH,
-        "-overwrite_original",
-        "-charset", "UTF8"
-    ]
+    minimal_command = list(_MINIMAL_ARG_PREFIX)
     if title:
         title_short = title[:200] 
         minimal_command.extend([
@@ -727,14 +932,13 @@ def _try_minimal_video_metadata(output_path, stop_event, title, description):
     
     try:
         log_message(f"Running minimal command with {len(minimal_command)} arguments")
-        creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-        result = subprocess.run(
-            minimal_command,
-            capture_output=True,
-            text=True,
-            timeout=20,
-            creationflags=creation_flags
-        )
+        return_code, _, stderr = run_exiftool(minimal_command, stop_event, timeout=exiftool_timeout(output_path))
+        if return_code is None:
+            return False, "stopped"
+        if return_code == 0:
+            return True, "exif_ok"
+        log_message(f"Minimal video metadata failed (Code: {return_code}). Error: {stderr.strip()}")
+        return True, "exif_failed"
     except subprocess.TimeoutExpired:
         log_message("Minimal video metadata command also timed out")
         return True, "exif_timeout"
@@ -16,10 +16,13 @@
 
 # src/processing/batch_processing.py
 import os
-import shutil
 import time
 import random
+import itertools
+import threading
 import concurrent.futures
+import queue
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 
 def get_recommended_workers() -> int:
@@ -43,42 +46,272 @@ def get_recommended_workers() -> int:
 RECOMMENDED_WORKERS: int = get_recommended_workers()
 
 from src.utils.logging import log_message
-from src.utils.file_utils import ensure_unique_title, sanitize_filename
+from src.utils.file_utils import ensure_unique_title, sanitize_filename, claim_unique_path, clear_claimed_names, link_or_copy
+from src.utils.file_utils import start_csv_buffering, flush_csv_buffers, csv_failed_row_count
 from src.utils.file_utils import SUPPORTED_IMAGE_EXTENSIONS, SUPPORTED_VIDEO_EXTENSIONS, ALL_SUPPORTED_EXTENSIONS
-from src.utils.compression import cleanup_temp_compression_folder, manage_temp_folders
+from src.utils.compression import cleanup_temp_compression_folder, manage_temp_folders, compress_image
+from src.utils.rate_limiter import RateLimiter, take_retry_after
 from src.processing.image_processing.format_jpg_jpeg_processing import process_jpg_jpeg
 from src.processing.image_processing.format_png_processing import process_png
 from src.processing.vector_processing.format_eps_ai_processing import convert_eps_to_jpg
 from src.processing.vector_processing.format_svg_processing import convert_svg_to_jpg
 from src.processing.video_processing import process_video
-from src.api import provider_manager
+from src.api import provider_manager, gemini_batch, response_cache
 from src.metadata.csv_exporter import write_to_platform_csvs
-from src.metadata.exif_writer import write_exif_with_exiftool
+from src.metadata.exif_writer import write_exif_with_exiftool, close_exiftool_daemons
+
+_EXT_SET = frozenset(ext.lower() for ext in ALL_SUPPORTED_EXTENSIONS)
+_VIDEO_EXT_SET = frozenset(SUPPORTED_VIDEO_EXTENSIONS)
+_VECTOR_EXT_SET = frozenset(('.eps', '.ai', '.svg'))
+_JPEG_EXT_SET = frozenset(('.jpg', '.jpeg'))
+# Formats whose processing is dominated by local CPU work (Ghostscript/SVG
+# rasterising, video frame extraction) rather than by the API call.
+_CONVERSION_EXT_SET = _VECTOR_EXT_SET | _VIDEO_EXT_SET
+
+def _is_conversion_heavy(path):
+    return os.path.splitext(path)[1].lower() in _CONVERSION_EXT_SET
+
+# Directories already created during this run; cleared when the run ends
+# because temp folders are removed then.
+_ensured_dirs: set = set()
+_ensured_dirs_lock = threading.Lock()
+
+def _ensure_dir(path):
+    if path in _ensured_dirs:
+        return
+    with _ensured_dirs_lock:
+        if path not in _ensured_dirs:
+            os.makedirs(path, exist_ok=True)
+            _ensured_dirs.add(path)
+
+class _InputScanner:
+    """Lists processable files of input_dir on a background thread.
+
+    Workers can start on the first files while a large (or network) folder is
+    still being enumerated; get(index) blocks until that file is found.
+    """
+
+    def __init__(self, input_dir, should_stop):
+        self.paths = []
+        self.error = None
+        self.done = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, args=(input_dir, should_stop),
+                                        name="input-scan", daemon=True)
+        self._thread.start()
+
+    def _run(self, input_dir, should_stop):
+        stopped = False
+        try:
+            with os.scandir(input_dir) as entries:
+                for entry in entries:
+                    if should_stop():
+                        stopped = True
+                        break
+                    filename = entry.name
+                    if filename.startswith('.'):
+                        continue
+                    dot = filename.rfind('.')
+                    if dot > 0 and filename[dot:].lower() in _EXT_SET and entry.is_file():
+                        with self._cond:
+                            self.paths.append(entry.path)
+                            self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+        if stopped:
+            log_message("Processing stopped while enumerating files.", "warning")
+        elif self.error is None and self.paths:
+            log_message(f"Found {len(self.paths)} files to process", "success")
+
+    def get(self, index):
+        """Return the index-th file, or None once the scan ended without reaching it."""
+        with self._cond:
+            while index >= len(self.paths) and not self.done:
+                self._cond.wait()
+            return self.paths[index] if index < len(self.paths) else None
+
+    def wait(self):
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+        return self.paths
+
+# Minimum seconds between progress_callback updates during a pass
+PROGRESS_MIN_INTERVAL = 0.1
+
+FAILED_STATUS_LABELS = {
+    "failed_api": "API Error/Limit",
+    "failed_copy": "failed copy",
+    "failed_format": "format/file error",
+    "failed_empty": "empty file",
+    "failed_input_missing": "input missing",
+}
 
 RETRYABLE_STATUSES = {
-    "failed_api": {"priority": "HIGH", "max_attempts": 5}, 
-    "failed_copy": {"priority": "MEDIUM", "max_attempts": 3}, 
-    "failed_conversion": {"priority": "MEDIUM", "max_attempts": 3}, 
-    "failed_frames": {"priority": "MEDIUM", "max_attempts": 3}, 
-    "failed_worker": {"priority": "MEDIUM", "max_attempts": 2}, 
-    "failed_timeout": {"priority": "MEDIUM", "max_attempts": 2},
-    "failed_exception": {"priority": "LOW", "max_attempts": 2}, 
-    "debug_artificial_failure": {"priority": "HIGH", "max_attempts": 3}, 
+    "failed_api": {"priority": "HIGH", "max_attempts": 5, "base_delay": 1.0, "max_delay": 30.0}, 
+    "failed_copy": {"priority": "MEDIUM", "max_attempts": 3, "base_delay": 2.0, "max_delay": 60.0}, 
+    "failed_conversion": {"priority": "MEDIUM", "max_attempts": 3, "base_delay": 2.0, "max_delay": 60.0}, 
+    "failed_frames": {"priority": "MEDIUM", "max_attempts": 3, "base_delay": 2.0, "max_delay": 60.0}, 
+    "failed_worker": {"priority": "MEDIUM", "max_attempts": 2, "base_delay": 2.0, "max_delay": 60.0}, 
+    "failed_timeout": {"priority": "MEDIUM", "max_attempts": 2, "base_delay": 2.0, "max_delay": 60.0},
+    "failed_exception": {"priority": "LOW", "max_attempts": 2, "base_delay": 4.0, "max_delay": 120.0}, 
+    "debug_artificial_failure": {"priority": "HIGH", "max_attempts": 3, "base_delay": 1.0, "max_delay": 30.0}, 
 }
 
 NON_RETRYABLE_STATUSES = {
     "failed_format", "failed_empty", "failed_input_missing"  
 }
 
+def retry_backoff_delay(status: str, attempt: int) -> float:
+    """Seconds to hold a failed file back, with full jitter: uniform over [0, min(max_delay, base_delay * 2**attempt)).
+
+    Full jitter spreads a burst of rate-limited files across the whole window
+    instead of retrying them together.
+    """
+    policy = RETRYABLE_STATUSES.get(status)
+    if not policy:
+        return 0.0
+    return random.random() * min(policy["max_delay"], policy["base_delay"] * (2 ** min(attempt, 16)))
+
+def _take_completed(done_queue, timeout):
+    """Block up to timeout for a finished future, then drain any others already queued."""
+    try:
+        done = [done_queue.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    while True:
+        try:
+            done.append(done_queue.get_nowait())
+        except queue.Empty:
+            return done
+
+def _cancel_unfinished(futures):
+    """Cancel every future not yet done in one pass; returns how many that was.
+
+    The sliding window keeps at most one future per worker submitted, so there
+    is no deep executor queue to drain here.
+    """
+    unfinished = 0
+    for future in futures:
+        if not future.done():
+            future.cancel()
+            unfinished += 1
+    return unfinished
+
 def is_retryable(status: str, attempt: int) -> bool:
-    if status in NON_RETRYABLE_STATUSES:
-        return False
-    
-    if status in RETRYABLE_STATUSES:
-        max_attempts = RETRYABLE_STATUSES[status]["max_attempts"]
-        return attempt < max_attempts
+    # The two tables are disjoint, so a miss here also covers NON_RETRYABLE_STATUSES.
+    entry = RETRYABLE_STATUSES.get(status)
+    return entry is not None and attempt < entry["max_attempts"]
+
+def _rasterize_vector(input_path, temp_folder, ghostscript_path, stop_event):
+    """Convert an EPS/AI/SVG file to a compressed JPG in temp_folder.
+
+    Returns (raster_path, None) on success or (None, error_message).
+    """
+    base, ext = os.path.splitext(os.path.basename(input_path))
+    ext_lower = ext.lower()
+    temp_raster_path = os.path.join(temp_folder, f"{base}_converted.jpg")
+    if ext_lower == '.svg':
+        conversion_success, error_msg = convert_svg_to_jpg(input_path, temp_raster_path, stop_event)
+    else:
+        conversion_success, error_msg = convert_eps_to_jpg(input_path, temp_raster_path, ghostscript_path, stop_event)
     
-    return False
+    if not conversion_success:
+        if os.path.exists(temp_raster_path):
+            try: os.remove(temp_raster_path)
+            except Exception: pass
+        return None, error_msg
+    if os.path.exists(temp_raster_path):
+        try:
+            compressed_raster_path, is_compressed = compress_image(
+                temp_raster_path, temp_folder, stop_event=stop_event
+            )
+            if is_compressed and compressed_raster_path and os.path.exists(compressed_raster_path):
+                try:
+                    os.remove(temp_raster_path)  
+                    temp_raster_path = compressed_raster_path
+                except Exception as e:
+                    log_message(f"Warning: Failed to replace with compressed version: {e}")
+        except Exception as e:
+            log_message(f"Warning: Failed to compress converted {ext_lower.upper()}: {e}")
+    return temp_raster_path, None
+
+class _BatchCounts:
+    """Outcome tallies for one batch run.
+
+    Only the coordinating thread updates these (worker threads just queue
+    their finished futures), so no lock is needed.
+    """
+    __slots__ = ("processed", "failed", "skipped", "stopped", "completed")
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.stopped = 0
+        self.completed = 0
+
+class _RasterPrefetcher:
+    """Rasterizes vector files that are waiting for a worker slot.
+
+    Vector jobs held back by the conversion cap have their Ghostscript/SVG
+    conversion started here, overlapping the API calls of running jobs;
+    process_vector_file then picks the finished raster up with take().
+    """
+
+    def __init__(self, output_dir, ghostscript_path, stop_event, max_workers):
+        self._temp_folder = os.path.join(output_dir, "temp_compressed")
+        self._ghostscript_path = ghostscript_path
+        self._stop_event = stop_event
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="raster")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, input_path):
+        if os.path.splitext(input_path)[1].lower() not in _VECTOR_EXT_SET:
+            return
+        with self._lock:
+            if input_path in self._futures:
+                return
+            _ensure_dir(self._temp_folder)
+            self._futures[input_path] = self._executor.submit(
+                _rasterize_vector, input_path, self._temp_folder, self._ghostscript_path, self._stop_event
+            )
+
+    def take(self, input_path):
+        with self._lock:
+            return self._futures.pop(input_path, None)
+
+    def close(self):
+        """Cancel queued conversions and delete rasters nobody picked up."""
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        for future in futures:
+            if future.cancelled():
+                continue
+            try:
+                raster_path, _ = future.result()
+                if raster_path and os.path.exists(raster_path):
+                    os.remove(raster_path)
+            except Exception:
+                pass
+
+# Set by batch_process_files for the duration of a run
+_raster_prefetcher = None
+
+def _close_raster_prefetcher():
+    global _raster_prefetcher
+    prefetcher, _raster_prefetcher = _raster_prefetcher, None
+    if prefetcher is not None:
+        prefetcher.close()
 
 def process_vector_file(
     input_path,
@@ -94,7 +327,7 @@ def process_vector_file(
     priority="Details",
 ):
     filename = os.path.basename(input_path)
-    _, ext = os.path.splitext(filename)
+    base, ext = os.path.splitext(filename)
     ext_lower = ext.lower()
     is_eps_original = (ext_lower == '.eps')
     is_ai_original = (ext_lower == '.ai')
@@ -110,62 +343,27 @@ def process_vector_file(
     if _check_stop(): 
         return "stopped", None, None
     
-    if os.path.exists(initial_output_path):
+    try:
+        os.stat(initial_output_path)
         return "skipped_exists", None, initial_output_path
+    except OSError:
+        pass
     
     chosen_temp_folder = os.path.join(output_dir, "temp_compressed")
-    os.makedirs(chosen_temp_folder, exist_ok=True)
+    _ensure_dir(chosen_temp_folder)
     
     if conversion_needed:
-        base, _ = os.path.splitext(filename)
-        if is_eps_original or is_ai_original:
-            temp_raster_path = os.path.join(chosen_temp_folder, f"{base}_converted.jpg")
-            conversion_func = convert_eps_to_jpg
-            target_format = "JPG"
-        elif is_svg_original:
-            temp_raster_path = os.path.join(chosen_temp_folder, f"{base}_converted.jpg")
-            conversion_func = convert_svg_to_jpg
-            target_format = "JPG"
-        else:
-            return "failed_unknown", None, None
-        
         if _check_stop():
             return "stopped", None, None
         
-        if conversion_func == convert_eps_to_jpg:
-            conversion_success, error_msg = conversion_func(
-                input_path,
-                temp_raster_path,
-                ghostscript_path,
-                stop_event,
-            )
+        prefetched = _raster_prefetcher.take(input_path) if _raster_prefetcher is not None else None
+        if prefetched is not None:
+            temp_raster_path, error_msg = prefetched.result()
         else:
-            conversion_success, error_msg = conversion_func(
-                input_path,
-                temp_raster_path,
-                stop_event,
-            )
-        
-        if not conversion_success:
+            temp_raster_path, error_msg = _rasterize_vector(input_path, chosen_temp_folder, ghostscript_path, stop_event)
+        if temp_raster_path is None:
             log_message(f"Conversion of {ext_lower.upper()} failed: {error_msg}")
-            if temp_raster_path and os.path.exists(temp_raster_path):
-                try: os.remove(temp_raster_path)
-                except Exception: pass
             return "failed_conversion", None, None
-        if temp_raster_path and os.path.exists(temp_raster_path):
-            try:
-                from src.utils.compression import compress_image
-                compressed_raster_path, is_compressed = compress_image(
-                    temp_raster_path, chosen_temp_folder, stop_event=stop_event
-                )
-                if is_compressed and compressed_raster_path and os.path.exists(compressed_raster_path):
-                    try:
-                        os.remove(temp_raster_path)  
-                        temp_raster_path = compressed_raster_path
-                    except Exception as e:
-                        log_message(f"Warning: Failed to replace with compressed version: {e}")
-            except Exception as e:
-                log_message(f"Warning: Failed to compress converted {ext_lower.upper()}: {e}")
         
     
     api_key_to_use = selected_api_key
@@ -204,11 +402,9 @@ def process_vector_file(
         return "stopped", metadata, None
     
     try:
-        if not os.path.exists(initial_output_path):
-            shutil.copy2(input_path, initial_output_path)
-        else:
-            log_message(f"Overwriting existing output file: {filename}")
-            shutil.copy2(input_path, initial_output_path)
+        # The output was absent at the start; with embedding on, exiftool -o creates it.
+        if not embedding_enabled:
+            link_or_copy(input_path, initial_output_path)
         
         if isinstance(metadata, dict):
             metadata['keyword_count'] = keyword_count
@@ -253,13 +449,14 @@ def process_image(
     embedding_enabled=True,
     keyword_count="49",
     priority="Details",
+    input_stat=None,
 ):
     filename = os.path.basename(input_path)
     _, ext = os.path.splitext(filename)
     ext_lower = ext.lower()
     
     try:
-        file_size = os.path.getsize(input_path)
+        file_size = (input_stat or os.stat(input_path)).st_size
         if file_size < 100:
             log_message(f"File too small or empty: {filename} ({file_size} bytes)")
             return "failed_empty", None, None
@@ -268,7 +465,6 @@ def process_image(
         return "failed_unknown", None, None
     
     if ext_lower == '.png':
-        from src.processing.image_processing.format_png_processing import process_png
         return process_png(
             input_path,
             output_dir,
@@ -281,7 +477,7 @@ def process_image(
             keyword_count=keyword_count,
             priority=priority,
         )
-    elif ext_lower in ['.eps', '.ai', '.svg']:
+    elif ext_lower in _VECTOR_EXT_SET:
         return process_vector_file(
             input_path,
             output_dir,
@@ -295,8 +491,7 @@ def process_image(
             keyword_count=keyword_count,
             priority=priority,
         )
-    elif ext_lower in ['.jpg', '.jpeg']:
-        from src.processing.image_processing.format_jpg_jpeg_processing import process_jpg_jpeg
+    elif ext_lower in _JPEG_EXT_SET:
         return process_jpg_jpeg(
             input_path,
             output_dir,
@@ -329,14 +524,16 @@ def process_single_file(
     stop_event=None,
 ):
     if stop_event is None:
-        import threading
         stop_event = threading.Event()
         
     original_filename = os.path.basename(input_path)
+    original_base, file_ext = os.path.splitext(original_filename)
+    ext_lower = file_ext.lower()
     final_output_path = None
     processed_metadata = None
     status = "failed"
     new_filename = None
+    take_retry_after()  # drop a hint left by an earlier job on this worker
     
     def _should_stop(message=None):
         return provider_manager.check_stop_event(provider_name, stop_event, message) or provider_manager.is_stop_requested(provider_name)
@@ -351,10 +548,8 @@ def process_single_file(
         if _should_stop():
             return {"status": "stopped", "input": input_path}
         
-        _, ext = os.path.splitext(input_path)
-        ext_lower = ext.lower()
-        is_video = ext_lower in SUPPORTED_VIDEO_EXTENSIONS
-        is_vector = ext_lower in ('.eps', '.ai', '.svg')
+        is_video = ext_lower in _VIDEO_EXT_SET
+        is_vector = ext_lower in _VECTOR_EXT_SET
         is_image = not is_video and not is_vector
         
         target_output_dir = output_dir
@@ -366,20 +561,19 @@ def process_single_file(
             else:
                 target_output_dir = os.path.join(output_dir, "Images")
             
-            if not os.path.exists(target_output_dir):
-                try:
-                    os.makedirs(target_output_dir, exist_ok=True)
-                except Exception as e:
-                    log_message(f"Error creating subfolder '{os.path.basename(target_output_dir)}': {e}", "error")
-                    target_output_dir = output_dir
+            try:
+                _ensure_dir(target_output_dir)
+            except Exception as e:
+                log_message(f"Error creating subfolder '{os.path.basename(target_output_dir)}': {e}", "error")
+                target_output_dir = output_dir
         
         try:
-            if os.path.exists(input_path):
-                original_file_size = os.path.getsize(input_path)
-                original_file_mtime = os.path.getmtime(input_path)
-            else:
-                log_message(f"⨯ File input {original_filename} missing before processing.", "error")
-                return {"status": "failed_input_missing", "input": input_path}
+            input_stat = os.stat(input_path)
+            original_file_size = input_stat.st_size
+            original_file_mtime = input_stat.st_mtime
+        except FileNotFoundError:
+            log_message(f"⨯ File input {original_filename} missing before processing.", "error")
+            return {"status": "failed_input_missing", "input": input_path}
         except Exception as e_info:
             log_message(f"Warning: Failed to get initial info for {original_filename}: {e_info}", "warning")
         
@@ -409,7 +603,7 @@ def process_single_file(
                 keyword_count,
                 priority,
             )
-        elif ext_lower in ['.eps', '.ai', '.svg']:
+        elif is_vector:
             status, processed_metadata, initial_output_path = process_vector_file(
                 input_path,
                 target_output_dir,
@@ -423,8 +617,7 @@ def process_single_file(
                 keyword_count,
                 priority,
             )
-        elif ext_lower in ['.jpg', '.jpeg']:
-            from src.processing.image_processing.format_jpg_jpeg_processing import process_jpg_jpeg
+        elif ext_lower in _JPEG_EXT_SET:
             status, processed_metadata, initial_output_path = process_jpg_jpeg(
                 input_path,
                 target_output_dir,
@@ -438,7 +631,6 @@ def process_single_file(
                 priority,
             )
         elif ext_lower == '.png':
-            from src.processing.image_processing.format_png_processing import process_png
             status, processed_metadata, initial_output_path = process_png(
                 input_path,
                 target_output_dir,
@@ -466,32 +658,26 @@ def process_single_file(
             if rename_enabled and processed_metadata and processed_metadata.get("title"):
                 current_output_path = final_output_path
                 rename_success = True
-                _, file_ext = os.path.splitext(original_filename)
                 title_for_rename = processed_metadata.get("title", "").strip()
                 
                 if title_for_rename:
                     sanitized_title = sanitize_filename(title_for_rename)
                     if not sanitized_title:
-                        sanitized_title = f"untitled_{os.path.splitext(original_filename)[0]}"
+                        sanitized_title = f"untitled_{original_base}"
                     
                     new_base_filename = f"{sanitized_title}{file_ext}"
                     new_path = os.path.join(target_output_dir, new_base_filename)
                     
                     if new_path.lower() != initial_output_path.lower():
-                        counter = 0
-                        max_rename_attempts = 50
+                        new_path = claim_unique_path(target_output_dir, sanitized_title, file_ext)
                         
-                        while os.path.exists(new_path) and counter < max_rename_attempts:
-                            counter += 1
-                            new_base_filename = f"{sanitized_title} ({counter}){file_ext}"
-                            new_path = os.path.join(target_output_dir, new_base_filename)
-                        
-                        if counter >= max_rename_attempts:
+                        if new_path is None:
                             log_message(f"Error: Failed to find unique name for rename.")
                             rename_success = False
                         else:
+                            new_base_filename = os.path.basename(new_path)
                             try:
-                                shutil.move(initial_output_path, new_path)
+                                os.replace(initial_output_path, new_path)
                                 final_output_path = new_path
                                 new_filename = new_base_filename
                             except Exception as e_rename:
@@ -508,16 +694,14 @@ def process_single_file(
             if status in processed_statuses and processed_metadata and final_output_path:
                 try:
                     csv_subfolder = os.path.join(target_output_dir, "metadata_csv")
-                    if not os.path.exists(csv_subfolder):
-                        os.makedirs(csv_subfolder, exist_ok=True)
+                    _ensure_dir(csv_subfolder)
 
                     final_filename_for_csv = os.path.basename(final_output_path)
 
                     title_for_csv = processed_metadata.get('title', '')
                     if rename_enabled and new_filename:
-                        title_for_csv = os.path.splitext(new_filename)[0]
+                        title_for_csv = new_filename[:-len(file_ext)] if file_ext else new_filename
 
-                    is_vector_file = original_filename.lower().endswith(('.eps', '.ai', '.svg'))
                     
                     try:
                         max_keywords = int(keyword_count)
@@ -531,7 +715,7 @@ def process_single_file(
                         processed_metadata.get('description', ''),
                         processed_metadata.get('tags', []),
                         auto_kategori_enabled=auto_kategori_enabled,
-                        is_vector=is_vector_file,
+                        is_vector=is_vector,
                         max_keywords=max_keywords,
                         is_video=is_video
                     )
@@ -553,7 +737,8 @@ def process_single_file(
         "output": final_output_path,
         "metadata": processed_metadata,
         "original_filename": original_filename,
-        "new_filename": new_filename
+        "new_filename": new_filename,
+        "retry_after": take_retry_after() if status == "failed_api" else None,
     }
 
 def batch_process_files(
@@ -575,15 +760,22 @@ def batch_process_files(
     keyword_count="49",
     priority="Details",
     bypass_api_key_limit=False,
+    batch_mode=False,
+    rpm_limit=0,
 ):
+    global _raster_prefetcher
     log_message(f"Starting process ({num_workers} worker, delay {delay_seconds}s)", "warning")
     
     provider_manager.reset_force_stop(provider_name)
 
+    # Polled on every scheduler pass, so resolve the provider helpers once.
+    check_stop_event = provider_manager.check_stop_event
+    is_stop_requested = provider_manager.is_stop_requested
+
     def should_stop(message=None):
-        if provider_manager.check_stop_event(provider_name, stop_event, message):
+        if check_stop_event(provider_name, stop_event, message):
             return True
-        if provider_manager.is_stop_requested(provider_name):
+        if is_stop_requested(provider_name):
             if message:
                 log_message(message, "warning")
             return True
@@ -602,23 +794,17 @@ def batch_process_files(
             
         temp_folders = manage_temp_folders(input_dir, output_dir)
         
-        processable_extensions = ALL_SUPPORTED_EXTENSIONS
-        
-        try:
-            dir_list = os.listdir(input_dir)
-        except Exception as e:
-            log_message(f"Error reading input directory: {e}", "error")
-            return {
-                "processed_count": 0,
-                "failed_count": 0,
-                "skipped_count": 0,
-                "stopped_count": 0
-            }
-        
-        files_to_process = []
-        for filename in dir_list:
+        scanner = _InputScanner(input_dir, should_stop)
+        if scanner.get(0) is None:
+            if scanner.error is not None:
+                log_message(f"Error reading input directory: {scanner.error}", "error")
+                return {
+                    "processed_count": 0,
+                    "failed_count": 0,
+                    "skipped_count": 0,
+                    "stopped_count": 0
+                }
             if should_stop():
-                log_message("Processing stopped while enumerating files.", "warning")
                 return {
                     "processed_count": 0,
                     "failed_count": 0,
@@ -626,16 +812,6 @@ def batch_process_files(
                     "stopped_count": 0,
                     "total_files": 0
                 }
-                
-            if filename.lower().endswith(processable_extensions) and not filename.startswith('.'):
-                full_path = os.path.join(input_dir, filename)
-                if os.path.isfile(full_path):
-                    files_to_process.append(full_path)
-        
-        files_to_process = [f for f in files_to_process if os.path.exists(f)]
-        total_files = len(files_to_process)
-        
-        if total_files == 0:
             log_message("No new/valid files to process in input folder.", "warning")
             return {
                 "status": "no_files",
@@ -645,11 +821,28 @@ def batch_process_files(
                 "stopped_count": 0,
                 "total_files": 0
             }
-        
-        log_message(f"Found {total_files} files to process", "success")
+
+        # Batch-mode files wait for the background Gemini batch job(s);
+        # everything else is processed per file in the meantime.
+        batch_thread = None
+        batch_paths = set()
+        if batch_mode and provider_name == provider_manager.PROVIDER_GEMINI and api_keys:
+            image_output_dir = os.path.join(output_dir, "Images") if auto_foldering_enabled else output_dir
+            pending_batch = [
+                f for f in scanner.wait()
+                if os.path.splitext(f)[1].lower() in gemini_batch.BATCH_SUPPORTED_EXTENSIONS
+                and not os.path.exists(os.path.join(image_output_dir, os.path.basename(f)))
+            ]
+            if pending_batch:
+                log_message(f"Batch mode: submitting {len(pending_batch)} file(s) as Gemini batch jobs over {len(api_keys)} API key(s)", "info")
+                batch_paths = set(pending_batch)
+                batch_thread = gemini_batch.start_batch_prefetch(
+                    pending_batch, output_dir, api_keys, stop_event,
+                    selected_model=selected_model, keyword_count=keyword_count, priority=priority
+                )
         
         if progress_callback:
-            progress_callback(0, total_files)
+            progress_callback(0, len(scanner.paths))
         
         if should_stop():
             log_message("Processing stopped before start (initial detection)", "warning")
@@ -657,16 +850,16 @@ def batch_process_files(
                 "processed_count": 0,
                 "failed_count": 0,
                 "skipped_count": 0,
-                "stopped_count": total_files
+                "stopped_count": len(scanner.wait())
             }
         
-        processed_count = 0
-        failed_count = 0
-        skipped_count = 0
-        stopped_count = 0
-        completed_count = 0
+        # CSV rows are queued per file and written in batches; flushed below.
+        start_csv_buffering()
+        counts = _BatchCounts()
         
-        failed_files = []  
+        failed_files = {}  # input path -> (status, attempt)
+        # Earliest time.monotonic() at which a failed file may be retried (exponential backoff)
+        retry_ready_at: dict = {}
         if not auto_foldering_enabled:
             csv_subfolder_main = os.path.join(output_dir, "metadata_csv")
             try:
@@ -680,38 +873,74 @@ def batch_process_files(
 
         # Map future → (input_path, submit_time) for tracking
         future_to_path: dict = {}
-        processed_files: set = set()
-        current_api_key_index = 0
-        file_queue = list(files_to_process)  # remaining files to submit
-        file_queue_index = 0
-        pending_futures: set = set()
+        done_queue = queue.SimpleQueue()
+        api_key_cycle = itertools.cycle(api_keys)
+        file_queue_index = 0  # next position in scanner.paths to submit
+        # Cap concurrent vector/video jobs so they cannot occupy every worker
+        # while API-bound images wait behind them; extra ones are deferred,
+        # but only while such an image is actually queued.
+        heavy_limit = max(1, min(os.cpu_count() or 1, effective_num_workers - 1))
+        heavy_in_flight = 0
+        deferred_heavy = deque()
+        deferred_batch = deque()
+        light_scan_index = 0  # no non-heavy file below this index is still unsubmitted
+        _raster_prefetcher = _RasterPrefetcher(output_dir, ghostscript_path, stop_event, heavy_limit)
         last_submit_time = 0.0  # track when last file was submitted for per-file delay
+        last_progress_time = 0.0
+        # Requests-per-minute cap shared by all workers (0 = unlimited)
+        rate_limiter = RateLimiter(rpm_limit, 60.0)
+        if rate_limiter.enabled:
+            log_message(f"Rate limit: {rate_limiter.rate} request(s) per minute", "info")
+
+        def _light_file_queued():
+            """True when a non-heavy file is already listed and not yet submitted."""
+            nonlocal light_scan_index
+            light_scan_index = max(light_scan_index, file_queue_index)
+            paths = scanner.paths
+            while light_scan_index < len(paths):
+                if not _is_conversion_heavy(paths[light_scan_index]):
+                    return True
+                light_scan_index += 1
+            return False
 
         def _submit_next_file():
             """Submit the next available file from the queue. Returns True if submitted."""
-            nonlocal file_queue_index, current_api_key_index, last_submit_time, failed_count, completed_count
-            while file_queue_index < len(file_queue):
-                input_path = file_queue[file_queue_index]
-                file_queue_index += 1
-                if not os.path.exists(input_path) or input_path in processed_files:
+            nonlocal file_queue_index, last_submit_time, heavy_in_flight
+            while True:
+                if deferred_batch and not batch_thread.is_alive():
+                    input_path = deferred_batch.popleft()
+                elif deferred_heavy and (heavy_in_flight < heavy_limit or not _light_file_queued()):
+                    input_path = deferred_heavy.popleft()
+                else:
+                    input_path = scanner.get(file_queue_index)
+                    if input_path is None:
+                        return False
+                    file_queue_index += 1
+                    if input_path in batch_paths and batch_thread.is_alive():
+                        deferred_batch.append(input_path)
+                        continue
+                    if heavy_in_flight >= heavy_limit and _is_conversion_heavy(input_path) and _light_file_queued():
+                        deferred_heavy.append(input_path)
+                        _raster_prefetcher.prefetch(input_path)
+                        continue
+                if not os.path.exists(input_path):
                     continue
                 # Apply per-file delay (spread across workers, not per-batch)
                 if delay_seconds > 0 and last_submit_time > 0:
-                    elapsed = time.time() - last_submit_time
+                    elapsed = time.monotonic() - last_submit_time
                     wait_needed = delay_seconds - elapsed
                     if wait_needed > 0:
-                        cooldown_end = time.time() + wait_needed
-                        while time.time() < cooldown_end:
-                            if should_stop():
+                        if stop_event is not None:
+                            if stop_event.wait(wait_needed):
                                 return False
-                            time.sleep(0.05)
-                if should_stop():
+                        else:
+                            time.sleep(wait_needed)
+                if not rate_limiter.acquire(stop_event) or should_stop():
                     return False
                 original_filename = os.path.basename(input_path)
                 log_message(f" → Processing {original_filename}...", "info")
                 try:
-                    assigned_api_key = api_keys[current_api_key_index % len(api_keys)]
-                    current_api_key_index = (current_api_key_index + 1) % len(api_keys)
+                    assigned_api_key = next(api_key_cycle)
                     future = executor.submit(
                         process_single_file,
                         input_path,
@@ -728,357 +957,355 @@ def batch_process_files(
                         priority,
                         stop_event,
                     )
+                    future.add_done_callback(done_queue.put)
                     future_to_path[future] = input_path
-                    pending_futures.add(future)
-                    processed_files.add(input_path)
-                    last_submit_time = time.time()
+                    if _is_conversion_heavy(input_path):
+                        heavy_in_flight += 1
+                    last_submit_time = time.monotonic()
                     return True
                 except Exception as e:
                     log_message(f"Error submitting job for {original_filename}: {e}", "error")
-                    failed_count += 1
-                    completed_count += 1
-            return False
+                    counts.failed += 1
+                    counts.completed += 1
 
         def _handle_result(future):
             """Process a completed future and update counters."""
-            nonlocal processed_count, failed_count, skipped_count, stopped_count, completed_count
-            input_path_result = future_to_path.get(future, "")
-            filename = os.path.basename(input_path_result) if input_path_result else "unknown file"
+            nonlocal last_progress_time, heavy_in_flight
+            input_path_result = future_to_path.pop(future, "")
+            if _is_conversion_heavy(input_path_result):
+                heavy_in_flight -= 1
             try:
-                result = future.result(timeout=120)
-                completed_count += 1
+                # Futures only reach here via their done callback, so this never blocks
+                result = future.result()
+                counts.completed += 1
                 if not result:
                     log_message(f"⨯ Invalid result received", "error")
-                    failed_count += 1
+                    counts.failed += 1
                     return
                 status = result.get("status", "failed")
                 input_path_r = result.get("input", "")
-                fname = os.path.basename(input_path_r) if input_path_r else filename
+                fname = os.path.basename(input_path_r or input_path_result) or "unknown file"
                 if status in ("processed_exif", "processed_no_exif"):
-                    processed_count += 1
+                    counts.processed += 1
                     new_name = result.get("new_filename")
-                    log_msg = f"✓ {fname}" + (f" → {new_name}" if new_name else "")
-                    log_message(log_msg)
+                    if new_name:
+                        log_message(f"✓ {fname} → {new_name}")
+                    else:
+                        log_message(f"✓ {fname}")
                 elif status in ("processed_exif_failed", "processed_unknown_exif_status"):
-                    processed_count += 1
+                    counts.processed += 1
                     new_name = result.get("new_filename")
-                    log_msg = f"⚠ {fname}" + (f" → {new_name}" if new_name else "") + " (EXIF write failed, proceeding)"
-                    log_message(log_msg, "warning")
+                    if new_name:
+                        log_message(f"⚠ {fname} → {new_name} (EXIF write failed, proceeding)", "warning")
+                    else:
+                        log_message(f"⚠ {fname} (EXIF write failed, proceeding)", "warning")
                 elif status == "skipped_exists":
-                    skipped_count += 1
+                    counts.skipped += 1
                     log_message(f"⋯ {fname} (already exists)", "info")
                 elif status == "stopped":
-                    stopped_count += 1
+                    counts.stopped += 1
                     log_message(f"⊘ {fname} (stopped internally)", "warning")
                 else:
-                    failed_count += 1
-                    failed_files.append((input_path_r, status, 1))
-                    if status == "failed_api":
-                        log_message(f"✗ {fname} (API Error/Limit)", "error")
-                    elif status == "failed_copy":
-                        log_message(f"✗ {fname} (failed copy)", "error")
-                    elif status == "failed_format":
-                        log_message(f"✗ {fname} (format/file error)", "error")
-                    elif status == "failed_empty":
-                        log_message(f"✗ {fname} (empty file)", "error")
-                    elif status == "failed_input_missing":
-                        log_message(f"✗ {fname} (input missing)", "error")
-                    else:
-                        log_message(f"✗ {fname} ({status})", "error")
+                    counts.failed += 1
+                    failed_files[input_path_r] = (status, 1)
+                    retry_ready_at[input_path_r] = time.monotonic() + max(retry_backoff_delay(status, 1), result.get("retry_after") or 0)
+                    log_message(f"✗ {fname} ({FAILED_STATUS_LABELS.get(status, status)})", "error")
             except concurrent.futures.TimeoutError:
-                completed_count += 1
-                failed_count += 1
-                failed_files.append((input_path_result, "failed_timeout", 1))
-                log_message(f"⨯ Timeout waiting for job results for {filename}", "error")
+                counts.completed += 1
+                counts.failed += 1
+                failed_files[input_path_result] = ("failed_timeout", 1)
+                retry_ready_at[input_path_result] = time.monotonic() + retry_backoff_delay("failed_timeout", 1)
+                log_message(f"⨯ Timed out while processing {os.path.basename(input_path_result) or 'unknown file'}", "error")
             except concurrent.futures.CancelledError:
                 log_message(f"Job cancelled.", "warning")
-                stopped_count += 1
+                counts.stopped += 1
             except Exception as e:
                 log_message(f"Error processing results: {e}", "error")
-                failed_count += 1
-                failed_files.append((input_path_result, "failed_exception", 1))
+                counts.failed += 1
+                failed_files[input_path_result] = ("failed_exception", 1)
+                retry_ready_at[input_path_result] = time.monotonic() + retry_backoff_delay("failed_exception", 1)
             if progress_callback:
-                progress_callback(completed_count, total_files)
+                # Coalesce UI updates; the count is flushed once more after the pass.
+                now = time.monotonic()
+                total_known = len(scanner.paths)
+                if counts.completed >= total_known or now - last_progress_time >= PROGRESS_MIN_INTERVAL:
+                    last_progress_time = now
+                    progress_callback(counts.completed, total_known)
 
-        with ThreadPoolExecutor(max_workers=effective_num_workers) as executor:
-            log_message(f"Sending {total_files} jobs to {effective_num_workers} workers (sliding window)...", "warning")
+        def _run_sliding_window(in_flight, done_q, submit_next, handle_done, stop_message):
+            """Top the pool up to effective_num_workers, then refill as jobs finish.
 
-            # Pre-fill the worker pool up to max_workers
-            while len(pending_futures) < effective_num_workers and not should_stop():
-                if not _submit_next_file():
-                    break
-
-            # Sliding window: as each worker finishes, immediately submit the next file
-            while pending_futures and not should_stop():
-                done_set, _ = concurrent.futures.wait(
-                    pending_futures, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED
-                )
+            in_flight maps submitted futures to paths and handle_done must pop
+            each one it is given. Runs until submit_next finds nothing more to
+            submit and every job has finished, or a stop is requested. While
+            files are held back for a running batch job the loop keeps waiting.
+            """
+            while not should_stop():
+                while len(in_flight) < effective_num_workers and submit_next():
+                    pass
+                if not in_flight:
+                    if not deferred_batch:
+                        return
+                    batch_thread.join(1.0)
+                    continue
+                done_set = _take_completed(done_q, 1.0)
                 if should_stop():
-                    log_message("Processing stopped while waiting for results.", "warning")
-                    break
+                    log_message(stop_message, "warning")
+                    return
                 for done_future in done_set:
-                    pending_futures.discard(done_future)
-                    _handle_result(done_future)
-                    # Immediately submit the next file to keep workers busy
-                    if not should_stop():
-                        _submit_next_file()
+                    handle_done(done_future)
+
+        # One pool serves the primary pass and every retry pass
+        with ThreadPoolExecutor(max_workers=effective_num_workers) as executor:
+            log_message(f"Sending jobs to {effective_num_workers} workers (sliding window)...", "warning")
+            _run_sliding_window(
+                future_to_path, done_queue, _submit_next_file, _handle_result,
+                "Processing stopped while waiting for results.",
+            )
 
             if should_stop():
                 log_message("Cancelling remaining tasks...", "warning")
                 provider_manager.set_force_stop(provider_name)
-                remaining_submitted = 0
-                for f in list(pending_futures):
-                    if not f.done():
-                        f.cancel()
-                        remaining_submitted += 1
+                remaining_submitted = _cancel_unfinished(future_to_path)
                 if remaining_submitted > 0:
                     log_message(f"Cancelling {remaining_submitted} running tasks.", "warning")
-                    stopped_count += remaining_submitted
-                    completed_count += remaining_submitted
+                    counts.stopped += remaining_submitted
+                    counts.completed += remaining_submitted
         
-        retry_attempt = 1
+            total_files = len(scanner.wait())
+            if progress_callback:
+                progress_callback(counts.completed, total_files)
+            retry_attempt = 1
 
-        if auto_retry_enabled and failed_count > 0 and not should_stop():
-            log_message("", None)
-            log_message("AUTO RETRY ENABLED - Processing failed files...", "info")
+            if auto_retry_enabled and counts.failed > 0 and not should_stop():
+                log_message("", None)
+                log_message("AUTO RETRY ENABLED - Processing failed files...", "info")
 
-            retryable_failed_files = []
-            for file_path, status, attempt in failed_files:
-                if file_path and os.path.exists(file_path) and is_retryable(status, attempt):
-                    retryable_failed_files.append((file_path, status, attempt))
-                else:
-                    log_message(f"Skipping non-retryable: {os.path.basename(file_path)} ({status})", "info")
+                # Existence is checked once here; the retry pass trusts this snapshot
+                retry_files = []
+                for file_path, (status, attempt) in failed_files.items():
+                    if file_path and is_retryable(status, attempt) and os.path.exists(file_path):
+                        retry_files.append(file_path)
+                    else:
+                        log_message(f"Skipping non-retryable: {os.path.basename(file_path)} ({status})", "info")
 
-            retry_files = [f[0] for f in retryable_failed_files]
+                while retry_files and not should_stop():
+                    log_message("", None)
+                    log_message(f"RETRY ATTEMPT {retry_attempt}: {len(retry_files)} file(s) remaining", "warning")
 
-            while retry_files and not should_stop():
-                log_message("", None)
-                log_message(f"RETRY ATTEMPT {retry_attempt}: {len(retry_files)} file(s) remaining", "warning")
-
-                retry_processed = 0
-                retry_failed = 0
-                retry_stopped = 0
-                retry_processed_files: set = set()
-                current_retry_failed_files = []
-                retry_future_to_path: dict = {}
-                retry_pending: set = set()
-                retry_queue_index = 0
-                retry_last_submit = 0.0
-
-                def _submit_retry_file(retry_exec):
-                    nonlocal retry_queue_index, current_api_key_index, retry_last_submit, retry_failed
-                    while retry_queue_index < len(retry_files):
-                        input_path = retry_files[retry_queue_index]
-                        retry_queue_index += 1
-                        if not os.path.exists(input_path) or input_path in retry_processed_files:
-                            continue
-                        if delay_seconds > 0 and retry_last_submit > 0:
-                            elapsed = time.time() - retry_last_submit
-                            wait_needed = delay_seconds - elapsed
+                    retry_processed = 0
+                    retry_failed = 0
+                    retry_stopped = 0
+                    current_retry_failed_files = []
+                    retry_future_to_path: dict = {}
+                    retry_done_queue = queue.SimpleQueue()
+                    # retry_files holds only retryable, existing paths, so each submit takes the next one
+                    retry_queue = iter(retry_files)
+                    retry_last_submit = 0.0
+
+                    def _submit_retry_file():
+                        nonlocal retry_last_submit, retry_failed
+                        for input_path in retry_queue:
+                            # Backoff since the file's last failure, never less than the per-file delay
+                            now = time.monotonic()
+                            wait_needed = retry_ready_at.get(input_path, 0.0) - now
+                            if delay_seconds > 0 and retry_last_submit > 0:
+                                wait_needed = max(wait_needed, delay_seconds - (now - retry_last_submit))
                             if wait_needed > 0:
-                                cooldown_end = time.time() + wait_needed
-                                while time.time() < cooldown_end:
-                                    if should_stop():
+                                if stop_event is not None:
+                                    if stop_event.wait(wait_needed):
                                         return False
-                                    time.sleep(0.05)
-                        if should_stop():
-                            return False
-                        original_filename = os.path.basename(input_path)
-                        log_message(f" → Retrying {original_filename}...", "info")
+                                else:
+                                    time.sleep(wait_needed)
+                            if should_stop():
+                                return False
+                            original_filename = os.path.basename(input_path)
+                            log_message(f" → Retrying {original_filename}...", "info")
+                            try:
+                                assigned_api_key = next(api_key_cycle)
+                                future = executor.submit(
+                                    process_single_file,
+                                    input_path,
+                                    output_dir,
+                                    [assigned_api_key],
+                                    ghostscript_path,
+                                    rename_enabled,
+                                    auto_kategori_enabled,
+                                    auto_foldering_enabled,
+                                    provider_name,
+                                    selected_model,
+                                    embedding_enabled,
+                                    keyword_count,
+                                    priority,
+                                    stop_event,
+                                )
+                                future.add_done_callback(retry_done_queue.put)
+                                retry_future_to_path[future] = input_path
+                                retry_last_submit = time.monotonic()
+                                return True
+                            except Exception as e:
+                                log_message(f"Error submitting retry job for {original_filename}: {e}", "error")
+                                retry_failed += 1
+                                current_retry_failed_files.append(input_path)
+                        return False
+
+                    def _handle_retry_result(future):
+                        nonlocal retry_processed, retry_failed, retry_stopped
+                        input_path = retry_future_to_path.pop(future, "")
+                        filename = os.path.basename(input_path) if input_path else "unknown"
                         try:
-                            assigned_api_key = api_keys[current_api_key_index % len(api_keys)]
-                            current_api_key_index = (current_api_key_index + 1) % len(api_keys)
-                            future = retry_exec.submit(
-                                process_single_file,
-                                input_path,
-                                output_dir,
-                                [assigned_api_key],
-                                ghostscript_path,
-                                rename_enabled,
-                                auto_kategori_enabled,
-                                auto_foldering_enabled,
-                                provider_name,
-                                selected_model,
-                                embedding_enabled,
-                                keyword_count,
-                                priority,
-                                stop_event,
-                            )
-                            retry_future_to_path[future] = input_path
-                            retry_pending.add(future)
-                            retry_processed_files.add(input_path)
-                            retry_last_submit = time.time()
-                            return True
+                            result = future.result()
+                            if not result:
+                                retry_failed += 1
+                                current_retry_failed_files.append(input_path)
+                                log_message(f"⨯ RETRY: Invalid result for {filename}", "error")
+                            else:
+                                status = result.get("status", "failed")
+                                if status in ("processed_exif", "processed_no_exif",
+                                              "processed_exif_failed", "processed_unknown_exif_status"):
+                                    retry_processed += 1
+                                    failed_files.pop(input_path, None)
+                                    new_name = result.get("new_filename")
+                                    log_msg = f"✓ RETRY SUCCESS: {filename}" + (f" → {new_name}" if new_name else "")
+                                    log_message(log_msg)
+                                elif status == "stopped":
+                                    retry_stopped += 1
+                                    log_message(f"⊘ RETRY STOPPED: {filename}")
+                                else:
+                                    retry_failed += 1
+                                    previous = failed_files.get(input_path)
+                                    new_attempt = previous[1] + 1 if previous else 1
+                                    failed_files[input_path] = (status, new_attempt)
+                                    retry_ready_at[input_path] = time.monotonic() + max(
+                                        retry_backoff_delay(status, new_attempt), result.get("retry_after") or 0
+                                    )
+                                    if is_retryable(status, new_attempt):
+                                        current_retry_failed_files.append(input_path)
+                                    log_message(f"✗ RETRY FAILED: {filename} ({status})")
+                        except concurrent.futures.TimeoutError:
+                            retry_failed += 1
+                            current_retry_failed_files.append(input_path)
+                            log_message(f"⨯ RETRY TIMEOUT: {filename}", "error")
+                        except concurrent.futures.CancelledError:
+                            log_message(f"Retry job cancelled for {filename}", "warning")
+                            retry_stopped += 1
                         except Exception as e:
-                            log_message(f"Error submitting retry job for {original_filename}: {e}", "error")
                             retry_failed += 1
                             current_retry_failed_files.append(input_path)
-                    return False
+                            log_message(f"✗ RETRY ERROR: {filename} - {e}")
 
-                with ThreadPoolExecutor(max_workers=effective_num_workers) as retry_executor:
                     log_message(
                         f"Sending {len(retry_files)} retry jobs to {effective_num_workers} workers (sliding window)...",
                         "warning",
                     )
-                    # Pre-fill pool
-                    while len(retry_pending) < effective_num_workers and not should_stop():
-                        if not _submit_retry_file(retry_executor):
-                            break
-
-                    # Sliding window for retries
-                    while retry_pending and not should_stop():
-                        done_set, _ = concurrent.futures.wait(
-                            retry_pending, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED
-                        )
-                        if should_stop():
-                            log_message("Retry processing stopped while waiting for results.", "warning")
-                            break
-                        for done_future in done_set:
-                            retry_pending.discard(done_future)
-                            input_path = retry_future_to_path.get(done_future, "")
-                            filename = os.path.basename(input_path) if input_path else "unknown"
-                            try:
-                                result = done_future.result(timeout=120)
-                                if not result:
-                                    retry_failed += 1
-                                    current_retry_failed_files.append(input_path)
-                                    log_message(f"⨯ RETRY: Invalid result for {filename}", "error")
-                                else:
-                                    status = result.get("status", "failed")
-                                    if status in ("processed_exif", "processed_no_exif",
-                                                  "processed_exif_failed", "processed_unknown_exif_status"):
-                                        retry_processed += 1
-                                        processed_count += 1
-                                        failed_count -= 1
-                                        failed_files = [(fp, st, att) for fp, st, att in failed_files if fp != input_path]
-                                        new_name = result.get("new_filename")
-                                        log_msg = f"✓ RETRY SUCCESS: {filename}" + (f" → {new_name}" if new_name else "")
-                                        log_message(log_msg)
-                                    elif status == "stopped":
-                                        retry_stopped += 1
-                                        log_message(f"⊘ RETRY STOPPED: {filename}")
-                                    else:
-                                        retry_failed += 1
-                                        updated_failed_files = []
-                                        new_attempt = 1
-                                        for fp, st, att in failed_files:
-                                            if fp == input_path:
-                                                new_attempt = att + 1
-                                                updated_failed_files.append((fp, status, new_attempt))
-                                            else:
-                                                updated_failed_files.append((fp, st, att))
-                                        failed_files = updated_failed_files
-                                        if is_retryable(status, new_attempt):
-                                            current_retry_failed_files.append(input_path)
-                                        log_message(f"✗ RETRY FAILED: {filename} ({status})")
-                            except concurrent.futures.TimeoutError:
-                                retry_failed += 1
-                                current_retry_failed_files.append(input_path)
-                                log_message(f"⨯ RETRY TIMEOUT: {filename}", "error")
-                            except concurrent.futures.CancelledError:
-                                log_message(f"Retry job cancelled for {filename}", "warning")
-                                retry_stopped += 1
-                            except Exception as e:
-                                retry_failed += 1
-                                current_retry_failed_files.append(input_path)
-                                log_message(f"✗ RETRY ERROR: {filename} - {e}")
-                            # Submit next file immediately
-                            if not should_stop():
-                                _submit_retry_file(retry_executor)
+                    _run_sliding_window(
+                        retry_future_to_path, retry_done_queue, _submit_retry_file, _handle_retry_result,
+                        "Retry processing stopped while waiting for results.",
+                    )
 
                     if should_stop():
-                        for f in list(retry_pending):
-                            if not f.done():
-                                f.cancel()
+                        _cancel_unfinished(retry_future_to_path)
                         log_message("Retry processing stopped and remaining tasks cancelled.", "warning")
 
-                retry_files = []
-                for file_path in current_retry_failed_files:
-                    if file_path and os.path.exists(file_path):
-                        current_attempt = 1
-                        current_status = "failed_unknown"
-                        for fp, st, att in failed_files:
-                            if fp == file_path:
-                                current_attempt = att
-                                current_status = st
-                                break
-
-                        if is_retryable(current_status, current_attempt):
-                            retry_files.append(file_path)
-
-                log_message(f"RETRY ATTEMPT {retry_attempt} RESULTS:")
-                log_message(f"✓ Success: {retry_processed}")
-                log_message(f"✗ Failed: {retry_failed}")
-                if retry_stopped > 0:
-                    log_message(f"⊘ Stopped: {retry_stopped}")
-
-                retry_attempt += 1
-
-                if retry_processed == 0 and len(retry_files) == 0:
+                    # Recovered files move from failed to processed once per pass
+                    counts.processed += retry_processed
+                    counts.failed -= retry_processed
+
+                    retry_files = []
+                    for file_path in dict.fromkeys(current_retry_failed_files):
+                        if file_path:
+                            current_status, current_attempt = failed_files.get(file_path, ("failed_unknown", 1))
+                            if is_retryable(current_status, current_attempt) and os.path.exists(file_path):
+                                retry_files.append(file_path)
+
+                    log_message(f"RETRY ATTEMPT {retry_attempt} RESULTS:")
+                    log_message(f"✓ Success: {retry_processed}")
+                    log_message(f"✗ Failed: {retry_failed}")
+                    if retry_stopped > 0:
+                        log_message(f"⊘ Stopped: {retry_stopped}")
+
+                    retry_attempt += 1
+
+                    if retry_processed == 0 and len(retry_files) == 0:
+                        log_message(
+                            f"No retryable files remaining after attempt {retry_attempt-1}, stopping auto retry",
+                            "warning",
+                        )
+                        break
+                    elif retry_processed == 0 and retry_failed > 0:
+                        log_message(
+                            f"No progress made in retry attempt {retry_attempt-1}, but retryable files remain",
+                            "warning",
+                        )
+
+                if retry_files and not should_stop():
                     log_message(
-                        f"No retryable files remaining after attempt {retry_attempt-1}, stopping auto retry",
+                        f"AUTO RETRY COMPLETED: {len(retry_files)} file(s) still failed after {retry_attempt-1} attempts",
                         "warning",
                     )
-                    break
-                elif retry_processed == 0 and retry_failed > 0:
+                elif len(failed_files) == 0:
+                    log_message("AUTO RETRY SUCCESS: All files processed successfully!", "success")
+                elif not retry_files and len(failed_files) > 0:
                     log_message(
-                        f"No progress made in retry attempt {retry_attempt-1}, but retryable files remain",
+                        f"AUTO RETRY: No retryable files found ({len(failed_files)} failed files not suitable for retry)",
                         "warning",
                     )
-
-            if retry_files and not should_stop():
-                log_message(
-                    f"AUTO RETRY COMPLETED: {len(retry_files)} file(s) still failed after {retry_attempt-1} attempts",
-                    "warning",
-                )
-            elif len(failed_files) == 0:
-                log_message("AUTO RETRY SUCCESS: All files processed successfully!", "success")
-            elif not retry_files and len(failed_files) > 0:
-                log_message(
-                    f"AUTO RETRY: No retryable files found ({len(failed_files)} failed files not suitable for retry)",
-                    "warning",
-                )
         
+        if batch_mode:
+            gemini_batch.clear_prefetched_metadata()
+        flush_csv_buffers()
+        csv_failed_count = csv_failed_row_count()
+        _close_raster_prefetcher()
+        response_cache.clear_memo()
+        response_cache.trim()
+        clear_claimed_names()
+        _ensured_dirs.clear()
+        close_exiftool_daemons()
+
         try:
             for folder_type, folder_path in temp_folders.items():
                 if os.path.exists(folder_path):
                     cleanup_temp_compression_folder(folder_path)
             
             if auto_foldering_enabled:
-                possible_subfolders = [
-                    os.path.join(output_dir, "Images"),
-                    os.path.join(output_dir, "Videos"),
-                    os.path.join(output_dir, "Vectors")
-                ]
-                
-                for subfolder in possible_subfolders:
-                    if os.path.exists(subfolder) and os.path.isdir(subfolder):
-                        temp_subfolder = os.path.join(subfolder, "temp_compressed")
-                        if os.path.exists(temp_subfolder):
-                            log_message(f"Cleaning up compression folder in {os.path.basename(subfolder)}", "info")
-                            cleanup_temp_compression_folder(temp_subfolder)
+                with os.scandir(output_dir) as entries:
+                    subfolders = [
+                        entry for entry in entries
+                        if entry.name in ("Images", "Videos", "Vectors") and entry.is_dir(follow_symlinks=False)
+                    ]
+                for subfolder in subfolders:
+                    temp_subfolder = os.path.join(subfolder.path, "temp_compressed")
+                    if os.path.isdir(temp_subfolder):
+                        log_message(f"Cleaning up compression folder in {subfolder.name}", "info")
+                        cleanup_temp_compression_folder(temp_subfolder)
         except Exception as e:
             log_message(f"Error when cleaning up temp folder: {e}", "warning")
         
         log_message("", None)
         log_message("============= Summary Process =============", "bold")
         log_message(f"Total file: {total_files}", None)
-        log_message(f"Success: {processed_count}", "success")
-        log_message(f"Failed: {failed_count}", "error")
-        log_message(f"Skipped: {skipped_count}", "info")
-        log_message(f"Stopped: {stopped_count}", "warning")
+        log_message(f"Success: {counts.processed}", "success")
+        log_message(f"Failed: {counts.failed}", "error")
+        log_message(f"Skipped: {counts.skipped}", "info")
+        log_message(f"Stopped: {counts.stopped}", "warning")
+        if csv_failed_count:
+            log_message(f"CSV rows not written: {csv_failed_count}", "error")
         log_message("=========================================", None)
         
         return {
-            "processed_count": processed_count,
-            "failed_count": failed_count,
-            "skipped_count": skipped_count,
-            "stopped_count": stopped_count,
-            "total_files": total_files
+            "processed_count": counts.processed,
+            "failed_count": counts.failed,
+            "skipped_count": counts.skipped,
+            "stopped_count": counts.stopped,
+            "total_files": total_files,
+            "csv_failed_count": csv_failed_count,
         }
     
     except Exception as e:
         log_message(f"Fatal error in processing thread: {e}", "error")
+        if not flush_csv_buffers():
+            log_message("Some queued CSV rows could not be written.", "error")
+        _close_raster_prefetcher()
         import traceback
         tb_str = traceback.format_exc()
         log_message(f"Traceback:\n{tb_str}", "error")
@@ -22,7 +22,7 @@ from src.api import provider_manager
 from src.metadata.exif_writer import write_exif_with_exiftool
 from src.metadata.csv_exporter import write_to_platform_csvs
 from src.utils.compression import compress_image, get_temp_compression_folder
-from src.utils.file_utils import ensure_unique_title
+from src.utils.file_utils import ensure_unique_title, link_or_copy
 from src.utils.logging import log_message
 
 
@@ -48,54 +48,56 @@ def process_jpg_jpeg(
     if os.path.exists(initial_output_path):
         return "skipped_exists", None, initial_output_path
     
-    chosen_temp_folder = get_temp_compression_folder(output_dir)
-    if not chosen_temp_folder:
-        log_message("Error: Cannot find writable temporary folder.")
-        return "failed_unknown", None, None
+    metadata_result = provider_manager.take_prefetched_metadata(provider_name, input_path, keyword_count)
+    if metadata_result is None:
+        chosen_temp_folder = get_temp_compression_folder(output_dir)
+        if not chosen_temp_folder:
+            log_message("Error: Cannot find writable temporary folder.")
+            return "failed_unknown", None, None
     
-    try:
-        compressed_path, is_compressed = compress_image(
-            input_path, chosen_temp_folder, stop_event=stop_event
-        )
-        if is_compressed and compressed_path and os.path.exists(compressed_path):
-            path_for_api = compressed_path
-            temp_files_created.append(compressed_path)
-        else:
-            log_message(f"No compression needed for {filename}; using original")
+        try:
+            compressed_path, is_compressed = compress_image(
+                input_path, chosen_temp_folder, stop_event=stop_event
+            )
+            if is_compressed and compressed_path and os.path.exists(compressed_path):
+                path_for_api = compressed_path
+                temp_files_created.append(compressed_path)
+            else:
+                log_message(f"No compression needed for {filename}; using original")
+                path_for_api = input_path
+        except Exception as e:
+            log_message(f"Error checking file size/compression: {e}")
             path_for_api = input_path
-    except Exception as e:
-        log_message(f"Error checking file size/compression: {e}")
-        path_for_api = input_path
     
-    if provider_manager.check_stop_event(provider_name, stop_event):
+        if provider_manager.check_stop_event(provider_name, stop_event):
+            for temp_file in temp_files_created:
+                try:
+                    if os.path.exists(temp_file):
+                        os.remove(temp_file)
+                except Exception:
+                    pass
+            return "stopped", None, None
+    
+        api_key_to_use = selected_api_key
+        metadata_result = provider_manager.get_metadata(
+            provider_name,
+            path_for_api,
+            api_key_to_use,
+            stop_event,
+            use_png_prompt=False,
+            selected_model=selected_model,
+            keyword_count=keyword_count,
+            priority=priority,
+            is_vector_conversion=False,
+        )
+    
         for temp_file in temp_files_created:
             try:
                 if os.path.exists(temp_file):
                     os.remove(temp_file)
-            except Exception:
-                pass
-        return "stopped", None, None
-    
-    api_key_to_use = selected_api_key
-    metadata_result = provider_manager.get_metadata(
-        provider_name,
-        path_for_api,
-        api_key_to_use,
-        stop_event,
-        use_png_prompt=False,
-        selected_model=selected_model,
-        keyword_count=keyword_count,
-        priority=priority,
-        is_vector_conversion=False,
-    )
-    
-    for temp_file in temp_files_created:
-        try:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-                log_message(f"Temporary compression file removed: {os.path.basename(temp_file)}")
-        except Exception as e:
-            log_message(f"Warning: Failed to remove temporary compression file: {e}")
+                    log_message(f"Temporary compression file removed: {os.path.basename(temp_file)}")
+            except Exception as e:
+                log_message(f"Warning: Failed to remove temporary compression file: {e}")
     
     if metadata_result == "stopped":
         return "stopped", None, None
@@ -112,11 +114,12 @@ def process_jpg_jpeg(
         return "stopped", metadata, None
     
     try:
-        if not os.path.exists(initial_output_path):
-            shutil.copy2(input_path, initial_output_path)
-        else:
+        # With embedding on, a missing output is created by exiftool -o.
+        if os.path.exists(initial_output_path):
             log_message(f"Overwriting existing output file: {filename}")
             shutil.copy2(input_path, initial_output_path)
+        elif not embedding_enabled:
+            link_or_copy(input_path, initial_output_path)
     except Exception as e:
         log_message(f"Failed to copy {filename}: {e}")
         return "failed_copy", metadata, None
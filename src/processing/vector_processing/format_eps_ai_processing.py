@@ -62,7 +62,7 @@ def convert_eps_to_jpg(eps_path, output_jpg_path, ghostscript_path, stop_event=N
             creationflags=creationflags
         )
 
-        start_time = time.time()
+        start_time = time.monotonic()
         timeout_seconds = 180
 
         while process.poll() is None:
@@ -74,11 +74,12 @@ def convert_eps_to_jpg(eps_path, output_jpg_path, ghostscript_path, stop_event=N
                 except subprocess.TimeoutExpired:
                     log_message(f"Ghostscript did not terminate, killing process for {filename}")
                     process.kill()
+                    process.wait()
                 except Exception as term_err:
                     log_message(f"Error during termination of Ghostscript for {filename}: {term_err}")
                 return False, f"Ghostscript conversion stopped: {filename}"
 
-            if time.time() - start_time > timeout_seconds:
+            if time.monotonic() - start_time > timeout_seconds:
                 log_message(f"Ghostscript process timed out (> {timeout_seconds}s) for {filename}, terminating.")
                 try:
                     process.terminate()
@@ -86,11 +87,15 @@ def convert_eps_to_jpg(eps_path, output_jpg_path, ghostscript_path, stop_event=N
                 except subprocess.TimeoutExpired:
                     log_message(f"Ghostscript did not terminate after timeout, killing process for {filename}")
                     process.kill()
+                    process.wait()
                 except Exception as term_err:
                     log_message(f"Error during termination of Ghostscript after timeout for {filename}: {term_err}")
                 return False, f"Ghostscript conversion timeout: {filename}"
 
-            time.sleep(0.1)
+            try:
+                process.wait(timeout=0.1)
+            except subprocess.TimeoutExpired:
+                pass
 
         try:
             stdout, stderr = process.communicate(timeout=15)
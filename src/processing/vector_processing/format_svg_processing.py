@@ -20,13 +20,19 @@ import platform
 from src.utils.logging import log_message
 from src.api.gemini_api import check_stop_event
 
+# Set once cairosvg fails to import (e.g. no libcairo on Windows) so later
+# files go straight to the fallbacks.
+_cairosvg_unavailable = False
+
 def convert_svg_to_jpg(svg_path, output_jpg_path, stop_event=None):
     filename = os.path.basename(svg_path)
     log_message(f"Trying to convert SVG to JPG: {filename}")
     
     if check_stop_event(stop_event, f"Conversion of SVG cancelled: {filename}"):
         return False, f"Conversion cancelled: {filename}"
-    if platform.system() in ["Darwin", "Linux"]:
+    # Native cairo rendering first on every platform; svglib's pure-Python
+    # renderer is only a fallback.
+    if not _cairosvg_unavailable:
         success, error = _convert_svg_with_cairosvg(svg_path, output_jpg_path, stop_event)
         if success:
             return True, None
@@ -46,41 +52,31 @@ def convert_svg_to_jpg(svg_path, output_jpg_path, stop_event=None):
     return False, f"All SVG conversion methods failed for: {filename}"
 
 def _convert_svg_with_cairosvg(svg_path, output_jpg_path, stop_event=None):
+    global _cairosvg_unavailable
     try:
-        import cairosvg
+        try:
+            import cairosvg
+        except (ImportError, OSError) as e:
+            _cairosvg_unavailable = True
+            return False, f"CairoSVG not available: {e}"
         from PIL import Image
         import io
+        from src.utils.compression import save_api_jpeg
         
         filename = os.path.basename(svg_path)
         
         if check_stop_event(stop_event):
             return False, "Conversion cancelled"
-        png_data = cairosvg.svg2png(url=svg_path)
+        png_data = cairosvg.svg2png(url=svg_path, background_color="white")
         
         if check_stop_event(stop_event):
             return False, "Conversion cancelled"
-        img = Image.open(io.BytesIO(png_data))
-        
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-        
-        img.save(output_jpg_path, 'JPEG', quality=95, optimize=True)
+        with Image.open(io.BytesIO(png_data)) as img:
+            # The raster only feeds the API, so it is sized for upload here
+            # instead of being written at full size and recompressed.
+            save_api_jpeg(img, output_jpg_path)
         
         if os.path.exists(output_jpg_path) and os.path.getsize(output_jpg_path) > 0:
-            try:
-                from src.utils.compression import compress_image
-                compressed_path, is_compressed = compress_image(output_jpg_path, os.path.dirname(output_jpg_path))
-                if is_compressed and compressed_path and os.path.exists(compressed_path):
-                    try:
-                        os.replace(compressed_path, output_jpg_path)
-                    except Exception:
-                        pass
-            except Exception as e_comp:
-                log_message(f"Warning: Failed to compress rasterized SVG: {e_comp}")
             return True, None
         else:
             return False, "Output file is empty or not created"
@@ -95,6 +91,7 @@ def _convert_svg_with_svglib(svg_path, output_jpg_path, stop_event=None):
     try:
         from svglib.svglib import svg2rlg
         from reportlab.graphics import renderPM
+        from src.utils.compression import save_api_jpeg
         
         filename = os.path.basename(svg_path)
         
@@ -108,19 +105,9 @@ def _convert_svg_with_svglib(svg_path, output_jpg_path, stop_event=None):
         if check_stop_event(stop_event):
             return False, "Conversion cancelled after parse"
         
-        renderPM.drawToFile(drawing, output_jpg_path, fmt="JPEG", bg=0xFFFFFF)
+        save_api_jpeg(renderPM.drawToPIL(drawing, bg=0xFFFFFF), output_jpg_path)
         
         if os.path.exists(output_jpg_path) and os.path.getsize(output_jpg_path) > 0:
-            try:
-                from src.utils.compression import compress_image
-                compressed_path, is_compressed = compress_image(output_jpg_path, os.path.dirname(output_jpg_path))
-                if is_compressed and compressed_path and os.path.exists(compressed_path):
-                    try:
-                        os.replace(compressed_path, output_jpg_path)
-                    except Exception:
-                        pass
-            except Exception as e_comp:
-                log_message(f"Warning: Failed to compress rasterized SVG: {e_comp}")
             return True, None
         else:
             return False, "Output file is empty or not created"
@@ -24,7 +24,7 @@ from src.api import provider_manager
 from src.metadata.csv_exporter import write_to_platform_csvs
 from src.metadata.exif_writer import write_exif_to_video  # Corrected import
 from src.utils.compression import compress_image, get_temp_compression_folder
-from src.utils.file_utils import WRITABLE_METADATA_VIDEO_EXTENSIONS  # Import the constant
+from src.utils.file_utils import WRITABLE_METADATA_VIDEO_EXTENSIONS, link_or_copy  # Import the constant
 from src.utils.logging import log_message
 
 def extract_frames_from_video(video_path, output_folder, provider_name, num_frames=3, stop_event=None):
@@ -249,7 +249,7 @@ def process_video(
 
     try:
         if not os.path.exists(initial_output_path):
-            shutil.copy2(input_path, initial_output_path)
+            link_or_copy(input_path, initial_output_path)
         else:
             log_message(f"Overwriting existing output file: {filename}")
             shutil.copy2(input_path, initial_output_path)
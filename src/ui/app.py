@@ -33,7 +33,7 @@ import customtkinter as ctk
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from src.utils.logging import log_message
-from src.utils.file_utils import read_api_keys, is_writable_directory
+from src.utils.file_utils import read_api_keys, is_writable_directory, is_running_as_executable, flush_csv_buffers
 from src.utils.analytics import send_analytics_event
 from src.config.config import MEASUREMENT_ID, API_SECRET, ANALYTICS_URL
 from src.processing.batch_processing import batch_process_files
@@ -118,6 +118,7 @@ class MetadataApp(ctk.CTk):
         self.output_dir = tk.StringVar()
         self.rename_files_var = tk.BooleanVar(value=False)
         self.delay_var = tk.StringVar(value="10")
+        self.rpm_var = tk.StringVar(value="0")
         # Default workers = CPU-adaptive recommendation (N_logical_cpus × 1.5, capped at 100)
         from src.processing.batch_processing import RECOMMENDED_WORKERS
         self.workers_var = tk.StringVar(value=str(RECOMMENDED_WORKERS))
@@ -146,6 +147,7 @@ class MetadataApp(ctk.CTk):
         self.auto_kategori_var = tk.BooleanVar(value=False)
         self.auto_foldering_var = tk.BooleanVar(value=False)
         self.auto_retry_var = tk.BooleanVar(value=False)
+        self.batch_mode_var = tk.BooleanVar(value=False)
         self._needs_initial_save = False
 
         self.available_models = provider_manager.get_model_choices(self.selected_provider)
@@ -246,18 +248,7 @@ class MetadataApp(ctk.CTk):
 
 
     def _is_running_as_executable(self):
-        if getattr(sys, 'frozen', False):
-            return True
-        for attr in ['__compiled__', '_MEIPASS', '_MEIPASS2']:
-            if hasattr(sys, attr):
-                return True
-        try:
-            exe_path = os.path.realpath(sys.executable).lower()
-            if (exe_path.endswith('.exe') and 'python' not in exe_path) or '.exe.' in exe_path:
-                return True
-        except Exception:
-            pass
-        return False
+        return is_running_as_executable()
 
     def _create_ui(self):
         self.grid_columnconfigure(0, weight=1)
@@ -355,7 +346,9 @@ Configuration of application behavior:
 • Keywords: Number of keywords/tags taken from API results (min 8, max 49)
 • Workers: Number of parallel threads for processing files (e.g. 1-10)
 • Delay (s): Time delay (seconds) between API requests
+• RPM: Maximum API requests per minute across all workers (0 = no limit)
 • Auto Retry?: Check if you want to retry failed files
+• Batch mode?: Gemini only - send the whole folder as one Batch API job (slower to start, cheaper for bulk runs)
 • Auto Category?: Check if you want to auto category the files
 • Auto Foldering?: Check if you want to auto folder the files
 • Rename File?: Check if you want to rename the file
@@ -459,6 +452,10 @@ Configuration of application behavior:
         ctk.CTkLabel(settings_col1, text="Delay (s):", font=self.font_normal).grid(row=3, column=0, padx=10, pady=5, sticky="wns")
         self.delay_entry = ctk.CTkEntry(settings_col1, textvariable=self.delay_var, width=100, justify='center', font=self.font_normal)
         self.delay_entry.grid(row=3, column=1, padx=5, pady=5, sticky="wns")
+
+        ctk.CTkLabel(settings_col1, text="RPM:", font=self.font_normal).grid(row=4, column=0, padx=10, pady=5, sticky="wns")
+        self.rpm_entry = ctk.CTkEntry(settings_col1, textvariable=self.rpm_var, width=100, justify='center', font=self.font_normal)
+        self.rpm_entry.grid(row=4, column=1, padx=5, pady=5, sticky="wns")
         
         # Settings Column 2 - Model & Quality
         settings_col2 = ctk.CTkFrame(settings_row, fg_color="transparent")
@@ -504,6 +501,9 @@ Configuration of application behavior:
         
         self.auto_retry_switch = ctk.CTkSwitch(settings_col3, text="Auto Retry?", variable=self.auto_retry_var, font=self.font_normal)
         self.auto_retry_switch.grid(row=4, column=0, padx=10, pady=(10, 5), sticky="w")
+
+        self.batch_mode_switch = ctk.CTkSwitch(settings_col3, text="Batch mode?", variable=self.batch_mode_var, font=self.font_normal)
+        self.batch_mode_switch.grid(row=5, column=0, padx=10, pady=(10, 5), sticky="w")
         
 
 
@@ -915,6 +915,12 @@ Configuration of application behavior:
             if current_model:
                 self.model_dropdown.set(current_model)
 
+    def _refresh_batch_mode_switch(self, provider_name):
+        # The Batch API is Gemini-only; other providers always run per file
+        if hasattr(self, "batch_mode_switch"):
+            state = tk.NORMAL if provider_name == provider_manager.PROVIDER_GEMINI else tk.DISABLED
+            self.batch_mode_switch.configure(state=state)
+
     def _toggle_api_key_visibility(self):
         pass
 
@@ -930,6 +936,7 @@ Configuration of application behavior:
         self.provider_var.set(provider)
         self._load_provider_keys(provider)
         self._refresh_provider_models(provider)
+        self._refresh_batch_mode_switch(provider)
         try:
             self._save_settings()
         except Exception:
@@ -1021,11 +1028,13 @@ Configuration of application behavior:
                         self.input_dir.set(settings.get("input_dir", ""))
                         self.output_dir.set(settings.get("output_dir", ""))
                         self.delay_var.set(str(settings.get("delay", "10")))
+                        self.rpm_var.set(str(settings.get("rpm_limit", "0")))
                         self.workers_var.set(str(settings.get("workers", "3")))
                         self.rename_files_var.set(settings.get("rename", False))
                         self.auto_kategori_var.set(settings.get("auto_kategori", True))
                         self.auto_foldering_var.set(settings.get("auto_foldering", False))
                         self.auto_retry_var.set(settings.get("auto_retry", False))
+                        self.batch_mode_var.set(settings.get("batch_mode", False))
                         # show_api_keys_var removed - API keys now auto-hide by default
                         self.console_visible_var.set(settings.get("console_visible", True))
                         self.extra_settings_var.set(settings.get("api_key_paid", False))
@@ -1085,6 +1094,7 @@ Configuration of application behavior:
                         self.embedding_var.set(settings.get("embedding", "Enable"))
                         self.available_priorities = ["Detailed", "Balanced", "Less"]
                         self._refresh_provider_models(self.selected_provider)
+                        self._refresh_batch_mode_switch(self.selected_provider)
 
                 except Exception as inner_e:
                     self._log(f"Error loading configuration file: {inner_e}", "error")
@@ -1113,11 +1123,13 @@ Configuration of application behavior:
             "input_dir": self.input_dir.get(),
             "output_dir": self.output_dir.get(),
             "delay": self.delay_var.get(),
+            "rpm_limit": self.rpm_var.get(),
             "workers": self.workers_var.get(),
             "rename": self.rename_files_var.get(),
             "auto_kategori": self.auto_kategori_var.get(),
             "auto_foldering": self.auto_foldering_var.get(),
             "auto_retry": self.auto_retry_var.get(),
+            "batch_mode": self.batch_mode_var.get(),
             "api_keys": current_api_keys,
             # "show_api_keys" removed - API keys now auto-hide by default
             "console_visible": self.console_visible_var.get(),
@@ -1295,6 +1307,13 @@ Configuration of application behavior:
             self.delay_var.set("10")
             delay_sec = 10
 
+        try:
+            rpm_limit = max(0, min(int(self.rpm_var.get().strip() or "0"), 10000))
+            self.rpm_var.set(str(rpm_limit))
+        except ValueError:
+            self.rpm_var.set("0")
+            rpm_limit = 0
+
         if self.extra_settings_var.get():
             try:
                 num_workers = int(self.workers_var.get().strip() or "3")
@@ -1362,7 +1381,8 @@ Configuration of application behavior:
                   rename_enabled, delay_sec, num_workers,
                   auto_kategori_enabled, auto_foldering_enabled, self.model_var.get(), str(keyword_count), priority),
             kwargs={
-                'bypass_api_key_limit': self.extra_settings_var.get()
+                'bypass_api_key_limit': self.extra_settings_var.get(),
+                'rpm_limit': rpm_limit
             },
             daemon=True
         )
@@ -1375,6 +1395,7 @@ Configuration of application behavior:
         self.auto_kategori_switch.configure(state=tk.DISABLED)
         self.auto_foldering_switch.configure(state=tk.DISABLED)
         self.auto_retry_switch.configure(state=tk.DISABLED)
+        self.batch_mode_switch.configure(state=tk.DISABLED)
         self.api_textbox.configure(state=tk.DISABLED)
         self.theme_dropdown.configure(state=tk.DISABLED)
         self.model_dropdown.configure(state=tk.DISABLED)
@@ -1383,6 +1404,7 @@ Configuration of application behavior:
         self.keyword_entry.configure(state=tk.DISABLED)
         self.workers_entry.configure(state=tk.DISABLED)
         self.delay_entry.configure(state=tk.DISABLED)
+        self.rpm_entry.configure(state=tk.DISABLED)
         self.input_entry.configure(state=tk.DISABLED)
         self.output_entry.configure(state=tk.DISABLED)
         self.cek_api_button.configure(state=tk.DISABLED)
@@ -1394,12 +1416,13 @@ Configuration of application behavior:
         if hasattr(self, "provider_dropdown"):
             self.provider_dropdown.configure(state=tk.DISABLED)
 
-    def _run_processing(self, input_dir, output_dir, api_keys, rename_enabled, delay_seconds, num_workers, auto_kategori_enabled, auto_foldering_enabled, selected_model=None, keyword_count="49", priority="Details", bypass_api_key_limit=False):
+    def _run_processing(self, input_dir, output_dir, api_keys, rename_enabled, delay_seconds, num_workers, auto_kategori_enabled, auto_foldering_enabled, selected_model=None, keyword_count="49", priority="Details", bypass_api_key_limit=False, rpm_limit=0):
         from src.utils.system_checks import GHOSTSCRIPT_PATH as gs_path_found
 
         try:
             embedding_enabled = self.embedding_var.get() == "Enable"
             auto_retry_enabled = self.auto_retry_var.get()
+            batch_mode_enabled = self.batch_mode_var.get()
             
             provider_name = self.provider_var.get() if hasattr(self, "provider_var") else provider_manager.get_default_provider()
             if provider_name not in self.available_providers:
@@ -1422,7 +1445,9 @@ Configuration of application behavior:
                 auto_retry_enabled=auto_retry_enabled,
                 keyword_count=keyword_count,
                 priority=priority,
-                bypass_api_key_limit=bypass_api_key_limit
+                bypass_api_key_limit=bypass_api_key_limit,
+                batch_mode=batch_mode_enabled,
+                rpm_limit=rpm_limit
             )
 
             self.processed_count = result.get("processed_count", 0)
@@ -1482,6 +1507,8 @@ Configuration of application behavior:
             if tk.messagebox.askyesno("Stop Processing", "Stop processing? Active tasks will be signaled to stop."):
                 self._log("Received stop request...", "warning")
                 self.stop_event.set()
+                # Inputs of finished files are already moved; get their rows on disk now
+                flush_csv_buffers(stop_buffering=False)
 
                 from src.api import provider_manager
                 provider_manager.set_force_stop()
@@ -1546,6 +1573,7 @@ Configuration of application behavior:
             self.auto_kategori_switch.configure(state=tk.NORMAL)
             self.auto_foldering_switch.configure(state=tk.NORMAL)
             self.auto_retry_switch.configure(state=tk.NORMAL)
+            self._refresh_batch_mode_switch(self.selected_provider)
             self.workers_entry.configure(state=tk.NORMAL)
             self.theme_dropdown.configure(state=tk.NORMAL)
             self.model_dropdown.configure(state=tk.NORMAL)
@@ -1553,6 +1581,7 @@ Configuration of application behavior:
             self.embedding_dropdown.configure(state=tk.NORMAL)
             self.keyword_entry.configure(state=tk.NORMAL)
             self.delay_entry.configure(state=tk.NORMAL)
+            self.rpm_entry.configure(state=tk.NORMAL)
             self.input_entry.configure(state=tk.NORMAL)
             self.output_entry.configure(state=tk.NORMAL)
             self.cek_api_button.configure(state=tk.NORMAL)
@@ -1737,4 +1766,5 @@ Configuration of application behavior:
                 self.after_cancel(self._log_queue_after_id)
             except tk.TclError:
                 pass
+        flush_csv_buffers()
         self.destroy()
@@ -17,15 +17,24 @@
 # src/utils/file_utils.py
 import os
 import re
+import sys
 import time
 import csv
 import portalocker
 import hashlib
 import shutil
+import atexit
 import threading
 from src.utils.logging import log_message
 
 _csv_write_lock = threading.Lock()
+# Rows queued per CSV path while buffering is on: path -> (header, rows, first_queued)
+_csv_buffers = {}
+_csv_buffering = False
+_csv_buffering_run = 0  # bumped per start_csv_buffering so an old flusher thread retires
+_csv_failed_rows = 0  # queued rows that could not be written since start_csv_buffering
+CSV_FLUSH_ROWS = 32
+CSV_FLUSH_INTERVAL = 2.0
 
 CSV_LOCK_EXTENSION = ".processing"
 TEMP_FILES_CREATED = []
@@ -76,6 +85,58 @@ def ensure_unique_title(title, image_path):
     title_history[sanitized] = True
     return sanitized
 
+_claimed_names = {}
+_claimed_names_lock = threading.Lock()
+
+def claim_unique_path(directory, base, ext, max_attempts=50):
+    """Reserve the first free 'base ext', 'base (1)ext', ... in directory, or return None.
+
+    Names handed out during the run are remembered per directory, so repeated
+    titles skip straight past them instead of stat'ing every earlier candidate.
+    """
+    with _claimed_names_lock:
+        claimed = _claimed_names.setdefault(os.path.normcase(os.path.abspath(directory)), set())
+        for counter in range(max_attempts):
+            name = f"{base}{ext}" if counter == 0 else f"{base} ({counter}){ext}"
+            key = name.lower()
+            if key in claimed:
+                continue
+            claimed.add(key)
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                return path
+    return None
+
+def clear_claimed_names():
+    with _claimed_names_lock:
+        _claimed_names.clear()
+
+def fast_copy(src, dst):
+    """Copy file contents without copystat; uses CopyFileW on Windows, sendfile/fcopyfile elsewhere."""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            if ctypes.windll.kernel32.CopyFileW(str(src), str(dst), False):
+                return dst
+        except Exception:
+            pass
+    return shutil.copyfile(src, dst)
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst when both are on one volume, else copy contents and stat.
+
+    Only for outputs that are never modified in place: exiftool's
+    -overwrite_original writes a new file, so a linked source stays intact.
+    """
+    try:
+        os.link(src, dst)
+        return dst
+    except OSError:
+        pass
+    fast_copy(src, dst)
+    shutil.copystat(src, dst)
+    return dst
+
 def is_writable_directory(directory):
     if not os.path.exists(directory):
         return False
@@ -123,7 +184,105 @@ def write_to_csv_with_lock(csv_path, header, data_row):
         log_message(f"Error writing CSV with locking: {e}")
         return False
 
+def _append_csv_rows(csv_path, header, rows):
+    # A str header means the rows are preformatted lines written verbatim.
+    csv_dir = os.path.dirname(csv_path)
+    if not os.path.exists(csv_dir):
+        try:
+            os.makedirs(csv_dir)
+            log_message(f"Creating CSV directory: {csv_dir}")
+        except Exception as e:
+            log_message(f"Error: Failed to create CSV directory '{csv_dir}': {e}")
+            return False
+    try:
+        with open(csv_path, 'a', newline='', encoding='utf-8', buffering=64 * 1024) as csvfile:
+            write_header = csvfile.tell() == 0
+            if isinstance(header, str):
+                if write_header:
+                    csvfile.write(header)
+                csvfile.writelines(rows)
+            else:
+                writer = csv.writer(csvfile, quoting=csv.QUOTE_MINIMAL)
+                if write_header:
+                    writer.writerow(header)
+                writer.writerows(rows)
+        return True
+    except Exception as e:
+        log_message(f"Error: Failed to write to CSV file '{os.path.basename(csv_path)}': {e}")
+        return False
+
+def _flush_buffered_rows(csv_path, header, rows):
+    # Caller holds _csv_write_lock
+    global _csv_failed_rows
+    if _append_csv_rows(csv_path, header, rows):
+        return True
+    _csv_failed_rows += len(rows)
+    return False
+
+def _flush_stale_csv_buffers(run):
+    # Background writer: rows never wait more than about two intervals for a
+    # later row, so a crash or kill mid-run loses at most that much.
+    while True:
+        time.sleep(CSV_FLUSH_INTERVAL)
+        with _csv_write_lock:
+            if not _csv_buffering or run != _csv_buffering_run:
+                return
+            now = time.monotonic()
+            for csv_path, (header, rows, first_queued) in list(_csv_buffers.items()):
+                if now - first_queued >= CSV_FLUSH_INTERVAL:
+                    del _csv_buffers[csv_path]
+                    _flush_buffered_rows(csv_path, header, rows)
+
+def start_csv_buffering():
+    global _csv_buffering, _csv_buffering_run, _csv_failed_rows
+    with _csv_write_lock:
+        _csv_buffering = True
+        _csv_buffering_run += 1
+        _csv_failed_rows = 0
+        run = _csv_buffering_run
+    threading.Thread(target=_flush_stale_csv_buffers, args=(run,), name="csv-flush", daemon=True).start()
+
+@atexit.register
+def flush_csv_buffers(stop_buffering=True):
+    """Write out every queued CSV row; returns False if any file failed."""
+    global _csv_buffering
+    with _csv_write_lock:
+        pending = list(_csv_buffers.items())
+        _csv_buffers.clear()
+        if stop_buffering:
+            _csv_buffering = False
+        ok = True
+        for csv_path, (header, rows, _) in pending:
+            ok = _flush_buffered_rows(csv_path, header, rows) and ok
+        return ok
+
+def csv_failed_row_count():
+    """Rows queued since start_csv_buffering that failed to reach their CSV file."""
+    with _csv_write_lock:
+        return _csv_failed_rows
+
+def write_csv_rows(csv_path, header, rows):
+    """Append rows to csv_path, queueing them while buffering is on.
+
+    header is either a list of column names (rows are field lists) or a
+    preformatted header line (rows are preformatted lines).
+    """
+    with _csv_write_lock:
+        if not _csv_buffering:
+            return _append_csv_rows(csv_path, header, rows)
+        now = time.monotonic()
+        entry = _csv_buffers.get(csv_path)
+        if entry is None:
+            entry = _csv_buffers[csv_path] = (header, [], now)
+        entry[1].extend(rows)
+        if len(entry[1]) < CSV_FLUSH_ROWS and now - entry[2] < CSV_FLUSH_INTERVAL:
+            return True
+        del _csv_buffers[csv_path]
+        return _flush_buffered_rows(csv_path, header, entry[1])
+
 def write_to_csv_thread_safe(csv_path, header, data_row):
+    if _csv_buffering:
+        return write_csv_rows(csv_path, header, [data_row])
     with _csv_write_lock:
         csv_dir = os.path.dirname(csv_path)
         if not os.path.exists(csv_dir):
@@ -202,8 +361,6 @@ def is_running_as_executable():
             IS_NUITKA_EXECUTABLE = True
             return True
     try:
-        import os
-        import sys
         exe_path = os.path.realpath(sys.executable).lower()
         if (exe_path.endswith('.exe') and 'python' not in exe_path) or '.exe.' in exe_path:
             IS_NUITKA_EXECUTABLE = True
@@ -212,4 +369,5 @@ def is_running_as_executable():
         pass
     return False
 
-IS_NUITKA_EXECUTABLE = False
\ No newline at end of file
+# Nuitka sets __compiled__ on compiled modules; PyInstaller/cx_Freeze set sys.frozen
+IS_NUITKA_EXECUTABLE = bool(getattr(sys, 'frozen', False) or '__compiled__' in globals())
\ No newline at end of file
@@ -15,13 +15,27 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 # src/utils/logging.py
+import os
+
 _log_handler = None
+# Messages tagged "debug" are dropped unless RJ_DEBUG_LOG=1
+_debug_enabled = os.environ.get("RJ_DEBUG_LOG", "").strip().lower() in ("1", "true", "yes", "on")
 
 def set_log_handler(handler):
     global _log_handler
     _log_handler = handler
 
-def log_message(message, tag=None):
+def log_message(message, tag=None, *args):
+    """Emit a log line.
+
+    Extra args are %-formatted into message only when it is emitted; debug
+    calls use them so a filtered line is never formatted. Lines that are
+    always emitted use f-strings.
+    """
+    if tag == "debug" and not _debug_enabled:
+        return
+    if args:
+        message = message % args
     print(message)
     if _log_handler is not None:
         _log_handler(message, tag)
\ No newline at end of file
@@ -0,0 +1,110 @@
+# RJ Auto Metadata
+# Copyright (C) 2025 Riiicil
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# src/utils/rate_limiter.py
+import time
+import threading
+from email.utils import parsedate_to_datetime
+
+# Server back-off hint from the last rate-limited request on this thread
+_RETRY_HINT = threading.local()
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` acquisitions per `period` seconds.
+
+    A non-positive rate disables limiting. Bursts of up to `rate` are allowed,
+    after which callers are spaced evenly across the period.
+    """
+
+    def __init__(self, rate, period=60.0):
+        self.rate = max(0, int(rate or 0))
+        self.period = float(period)
+        self._tokens = float(self.rate)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        self._tokens = min(float(self.rate), self._tokens + elapsed * self.rate / self.period)
+
+    def acquire(self, stop_event=None):
+        """Block until a token is available. Returns False if stop_event was set while waiting."""
+        if not self.enabled:
+            return True
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+                wait = (1.0 - self._tokens) * self.period / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+def wait_interruptible(duration, stop_event, is_stopped, step=1.0):
+    """Sleep up to `duration` seconds. Returns True as soon as is_stopped() does.
+
+    Blocks on stop_event.wait so setting the event wakes the caller at once;
+    is_stopped (which may also check a provider force-stop flag) is re-checked
+    on every wakeup and at least every `step` seconds.
+    """
+    deadline = time.monotonic() + duration
+    wait = getattr(stop_event, "wait", None) or time.sleep
+    while True:
+        if is_stopped():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        wait(min(remaining, step))
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date) or a
+    Google RetryInfo delay such as "37s". Returns None when absent or unparsable."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return max(0.0, float(text[:-1] if text.endswith("s") else text))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(text).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def note_retry_after(seconds):
+    """Remember a provider's back-off hint for the job running on this thread."""
+    _RETRY_HINT.seconds = seconds
+
+
+def take_retry_after():
+    """Return and clear this thread's back-off hint."""
+    seconds = getattr(_RETRY_HINT, "seconds", None)
+    _RETRY_HINT.seconds = None
+    return seconds